@@ -6,6 +6,16 @@ import {useTheme, ThemeColors} from '../state/ThemeContext';
 
 type Message = {id: number; role: 'user' | 'assistant'; content: string};
 
+// Seconds to wait when the chat Lambda turned the message away: a 429 with Retry-After (AWS_PROXY, or an
+// AWS integration with the 429 integration response), or just retry_after in the body (AWS integration without it)
+function getRetryAfterSeconds(response: Response, result: Record<string, unknown>): number | null {
+  if (response.status !== 429 && result?.retry_after === undefined) return null;
+  const seconds = Number(response.headers.get('Retry-After') ?? result?.retry_after);
+  return Number.isFinite(seconds) && seconds > 0 ? Math.ceil(seconds) : 1;
+}
+
+const plural = (count: number, word: string) => `${count} ${word}${count === 1 ? '' : 's'}`;
+
 export default function AssistantScreen() {
   const {navigate} = useRouter();
   const {colors} = useTheme();
@@ -21,11 +31,22 @@ export default function AssistantScreen() {
   ]);
   const [input, setInput] = useState('');
   const [loading, setLoading] = useState(false);
+  // When the chat Lambda rate-limited us, sending is held until this time (ms since epoch)
+  const [retryAt, setRetryAt] = useState<number | null>(null);
 
   const send = async () => {
     const text = input.trim();
     if (!text || loading) return;
 
+    if (retryAt !== null && Date.now() < retryAt) {
+      const seconds = Math.ceil((retryAt - Date.now()) / 1000);
+      setMessages(prev => [
+        ...prev,
+        {id: prev.length + 1, role: 'assistant', content: `Please wait ${plural(seconds, 'second')} before sending another message.`},
+      ]);
+      return;
+    }
+
     const userMessage: Message = {id: messages.length + 1, role: 'user', content: text};
     setMessages(prev => [...prev, userMessage]);
     setInput('');
@@ -54,11 +75,25 @@ export default function AssistantScreen() {
 
       console.log('✅ API response received:', response.status);
 
+      const result = (await response.json().catch(() => ({}))) as Record<string, unknown>;
+
+      const retryAfter = getRetryAfterSeconds(response, result);
+      if (retryAfter !== null) {
+        setRetryAt(Date.now() + retryAfter * 1000);
+        setInput(text); // Keep the message so it can be sent again
+        const busyMessage: Message = {
+          id: userMessage.id + 1,
+          role: 'assistant',
+          content: `I'm getting a lot of messages right now. Please try again in ${plural(retryAfter, 'second')}.`,
+        };
+        setMessages(prev => [...prev, busyMessage]);
+        return;
+      }
+
       if (!response.ok) {
         throw new Error(`API error: ${response.status} ${response.statusText}`);
       }
 
-      const result = await response.json() as Record<string, unknown>;
       const aiContent =
         typeof result?.response === 'string'
           ? result.response
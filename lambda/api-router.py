@@ -0,0 +1,109 @@
+"""
+Lambda: api-router
+Purpose: Optional single entry point serving every API route from one warm container pool
+Receives: API Gateway AWS_PROXY events (any route), S3 upload notifications and asynchronous
+          self-invocations ({"action": ...}, e.g. record exports)
+Returns: Whatever the existing route handler returns (router errors use the same envelopes)
+Dispatches by method and path to the unchanged per-route handlers, which then share one set of
+AWS clients (aws_clients registry) and in-memory caches. The per-route Lambdas remain deployable on their own.
+Deploy with every route handler file and shared module in the zip, and point each API method's
+integration (e.g. the *LambdaArn template parameters) at this function.
+"""
+
+import importlib.util
+import os
+import threading
+from responses import build_response, error_response
+from tracing import trace_handler
+
+# First path segment -> (handler file, allowed HTTP methods)
+ROUTES = {
+    'medications': ('medication-scheduler.py', {'GET', 'POST', 'PUT', 'DELETE'}),
+    'chat': ('bedrock-chat-handler.py', {'POST'}),
+    'get-upload-url': ('s3-presigner.py', {'POST'}),
+    'analyze-prescription': ('prescription-analyzer.py', {'POST'}),
+    'find-doctors': ('doctor-finder.py', {'POST'}),
+    'doctors': ('doctor-finder.py', {'GET'}),
+    'doses': ('dose-tracker.py', {'GET', 'POST'}),
+    'adherence': ('dose-tracker.py', {'GET'}),
+    'export': ('record-exporter.py', {'GET', 'POST'}),
+    'history': ('conversation-history.py', {'GET'})
+}
+
+# Direct invocation action -> handler file (handlers invoking themselves reach the router when deployed behind it)
+ACTIONS = {
+    'export_records': 'record-exporter.py'
+}
+
+# Route handler modules, imported on first use so a cold start only loads the route it serves
+loaded_handlers = {}
+load_lock = threading.Lock()
+
+
+@trace_handler('api-router')
+def lambda_handler(event, context):
+    """
+    Main Lambda handler: route the event to the matching per-route handler
+    """
+    try:
+        # S3 upload notifications keep the presigner's file index current
+        if event.get('Records'):
+            return get_route_handler('s3-presigner.py')(event, context)
+
+        if event.get('action') in ACTIONS and 'httpMethod' not in event:
+            return get_route_handler(ACTIONS[event['action']])(event, context)
+
+        http_method = event.get('httpMethod', '')
+        segments = get_path_segments(event)
+        route = ROUTES.get(segments[0]) if segments else None
+
+        if route is None:
+            return build_response(event, error_response(404, 'Route not found'))
+
+        handler_file, allowed_methods = route
+        if http_method not in allowed_methods:
+            return build_response(event, error_response(405, 'Method not allowed'))
+
+        # Greedy proxy resources ({proxy+}) don't populate named path parameters
+        if segments[0] == 'medications' and len(segments) > 1:
+            path_parameters = event.get('pathParameters') or {}
+            if 'medicationId' not in path_parameters:
+                event['pathParameters'] = dict(path_parameters, medicationId=segments[1])
+
+        return get_route_handler(handler_file)(event, context)
+
+    except Exception as e:
+        print(f"Router error: {str(e)}")
+        return build_response(event, error_response(500, str(e)))
+
+
+def get_path_segments(event):
+    """
+    Helper: Path segments of the request, without the stage prefix
+    Uses the request path, falling back to the resource template (e.g. /medications/{medicationId})
+    """
+    path = event.get('path') or event.get('resource') or ''
+    stage = (event.get('requestContext') or {}).get('stage')
+    segments = [segment for segment in path.split('/') if segment]
+    if stage and segments and segments[0] == stage:
+        segments = segments[1:]
+    return segments
+
+
+def get_route_handler(handler_file):
+    """
+    Helper: Import a route handler file once per container and return its lambda_handler
+    (handler files have hyphenated names, so they are loaded by path)
+    """
+    handler = loaded_handlers.get(handler_file)
+    if handler is None:
+        with load_lock:
+            handler = loaded_handlers.get(handler_file)
+            if handler is None:
+                path = os.path.join(os.path.dirname(os.path.abspath(__file__)), handler_file)
+                spec = importlib.util.spec_from_file_location(handler_file[:-3].replace('-', '_'), path)
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                handler = module.lambda_handler
+                loaded_handlers[handler_file] = handler
+    return handler
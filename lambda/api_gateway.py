@@ -0,0 +1,46 @@
+"""
+Shared module: api_gateway
+Purpose: API Gateway request parsing shared by every route Lambda
+Handles both AWS (non-proxy, mapping template) and AWS_PROXY integration event shapes
+Package this file alongside lambda_function.py in each deployment zip
+"""
+
+import json
+
+
+def parse_body(event):
+    """
+    Parse request body - handles both direct body and nested body structure
+    """
+    body = event.get('body')
+    if isinstance(body, str):
+        # Body is a JSON string (AWS integration with template or AWS_PROXY)
+        return json.loads(body)
+    elif isinstance(body, dict):
+        # Body is already a dict (AWS integration without template)
+        return body
+    return {}
+
+
+def get_user_id(event):
+    """
+    Get user_id from authorizer context (handles both AWS and AWS_PROXY integration types)
+    """
+    try:
+        # AWS_PROXY integration type
+        return event['requestContext']['authorizer']['claims']['sub']
+    except (KeyError, TypeError):
+        # AWS integration type - authorizer context is in different location
+        authorizer = event['requestContext']['authorizer']
+        return authorizer.get('sub') or authorizer.get('principalId')
+
+
+def get_query_parameters(event):
+    """
+    Get query string parameters (AWS_PROXY), or those passed through by the
+    "Method Request passthrough" mapping template (AWS integration)
+    """
+    params = event.get('queryStringParameters')
+    if params is None:
+        params = (event.get('params') or {}).get('querystring')
+    return params or {}
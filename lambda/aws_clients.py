@@ -0,0 +1,106 @@
+"""
+Shared module: aws_clients
+Purpose: Lazily-created AWS clients and resources shared by every Lambda
+Clients are built on first use (keeping boto3 out of cold-start init) and reused across warm invocations
+Every client is instrumented so its API calls show up as tracing spans
+Package this file alongside lambda_function.py in each deployment zip
+"""
+
+import json
+import threading
+from tracing import instrument_client
+
+# Default region for all BeauMED services
+AWS_REGION = 'us-west-1'
+
+# Registry of the shared session and created clients/resources, keyed by (service, region[, config])
+session = None
+clients = {}
+resources = {}
+registry_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Return the shared boto3 session (one credential resolution per container)
+    """
+    global session
+    if session is None:
+        with registry_lock:
+            if session is None:
+                import boto3
+                session = boto3.session.Session()
+    return session
+
+
+def get_client(service_name, region_name=AWS_REGION, config=None):
+    """
+    Return the shared boto3 client for a service, creating it on first use
+    config: optional botocore Config options as a dict (timeouts, retries), e.g. {'read_timeout': 10}
+    """
+    key = (service_name, region_name) if not config else (service_name, region_name, json.dumps(config, sort_keys=True))
+    client = clients.get(key)
+    if client is None:
+        boto_session = get_session()
+        # Lock so concurrent first calls (e.g. thread pools) build one client
+        with registry_lock:
+            client = clients.get(key)
+            if client is None:
+                client_config = None
+                if config:
+                    from botocore.config import Config
+                    client_config = Config(**config)
+                client = instrument_client(boto_session.client(service_name, region_name=region_name,
+                                                               config=client_config))
+                clients[key] = client
+    return client
+
+
+def get_resource(service_name, region_name=AWS_REGION):
+    """
+    Return the shared boto3 resource for a service, creating it on first use
+    """
+    key = (service_name, region_name)
+    resource = resources.get(key)
+    if resource is None:
+        boto_session = get_session()
+        with registry_lock:
+            resource = resources.get(key)
+            if resource is None:
+                resource = boto_session.resource(service_name, region_name=region_name)
+                instrument_client(resource.meta.client)
+                resources[key] = resource
+    return resource
+
+
+class LazyProxy:
+    """
+    Stand-in for a module-level client or table that is resolved on first attribute access
+    Lets handlers keep `table.query(...)` style calls without paying for boto3 at import time
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            self._target = self._factory()
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+
+def lazy_client(service_name, region_name=AWS_REGION, config=None):
+    """
+    Module-level client placeholder, e.g. `s3 = lazy_client('s3')`
+    """
+    return LazyProxy(lambda: get_client(service_name, region_name, config))
+
+
+def lazy_table(table_name, region_name=AWS_REGION):
+    """
+    Module-level DynamoDB table placeholder, e.g. `medications_table = lazy_table('Medications')`
+    """
+    return LazyProxy(lambda: get_resource('dynamodb', region_name).Table(table_name))
@@ -1,156 +1,429 @@
 """
 Lambda: bedrock-chat-handler
 Purpose: Handle AI chat interactions with Bedrock Nova model
-Receives: user message + chat history
+Receives: user message
 Returns: AI response from Bedrock
 """
 
 import json
-import boto3
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
+from functools import lru_cache
+from api_gateway import get_user_id, parse_body
+from aws_clients import LazyProxy, get_client, lazy_table
+from rate_limits import check_rate_limits
+from responses import api_handler, error_response
+from tracing import log_sampled, record_span, record_value, trace_handler
 
-# Initialize Bedrock client
-bedrock = boto3.client('bedrock-runtime', region_name='us-west-1')
-dynamodb = boto3.resource('dynamodb', region_name='us-west-1')
+# Bedrock Nova models, with the short name used in per-model metrics
+NOVA_PRO = 'us.amazon.nova-pro-v1:0'
+NOVA_LITE = 'us.amazon.nova-lite-v1:0'
+NOVA_MICRO = 'us.amazon.nova-micro-v1:0'
+MODEL_METRIC_NAMES = {NOVA_PRO: 'NovaPro', NOVA_LITE: 'NovaLite', NOVA_MICRO: 'NovaMicro'}
+
+# Routing tiers: models are tried in order, later ones are fallbacks
+MODEL_TIERS = {
+    'complex': {'models': [NOVA_PRO, NOVA_LITE], 'max_new_tokens': 500},  # Nova Pro for better reasoning
+    'simple': {'models': [NOVA_LITE, NOVA_MICRO], 'max_new_tokens': 300}
+}
+
+SYSTEM_PROMPT = 'You are a helpful medical AI assistant for BeauMED. Provide accurate, safe health information. Always recommend consulting a healthcare provider for serious concerns. Keep responses concise and friendly.'
+
+# Bedrock prompt caching: cache points mark prompt prefixes the model can reuse on the next turn
+# (prefixes under the model's minimum cacheable size are simply not cached)
+PROMPT_CACHING = os.environ.get('PROMPT_CACHING', 'true').lower() != 'false'
+PROMPT_CACHE_MODELS = {NOVA_PRO, NOVA_LITE, NOVA_MICRO}
+CACHE_POINT = {'cachePoint': {'type': 'default'}}
+TEMPERATURE = 0.7
+
+# Short messages go to the light tier unless they mention anything clinical
+SIMPLE_MAX_WORDS = 12
+SMALL_TALK = {'hi', 'hello', 'hey', 'thanks', 'thank you', 'thx', 'ok', 'okay', 'got it', 'great', 'cool', 'bye',
+              'goodbye', 'sounds good', 'good morning', 'good night'}
+COMPLEX_PATTERN = re.compile(
+    r'\b(dos(e|es|age|ing)|(\d+\s*)?mg|interact\w*|side effects?|symptoms?|pain|allerg\w*|pregnan\w*|overdose|'
+    r'chest|breath\w*|bleed\w*|emergency|suicid\w*|worried|can i take|should i|mix\w*|combine\w*)\b'
+)
+
+# Latency budget for the whole model call, including fallbacks (API Gateway times out at 29s)
+LATENCY_BUDGET_SECONDS = 20
+# Each attempt is cut off after MODEL_READ_TIMEOUT_SECONDS so a slow model leaves time for the fallback
+MODEL_READ_TIMEOUT_SECONDS = 8
+# Errors that move on to the next model instead of failing the request
+FALLBACK_ERROR_CODES = {'ThrottlingException', 'ServiceUnavailableException', 'ModelTimeoutException',
+                        'ModelNotReadyException', 'InternalServerException'}
+FALLBACK_ERROR_TYPES = {'ReadTimeoutError', 'ConnectTimeoutError', 'EndpointConnectionError'}
+RETRY_AFTER_SECONDS = 2
+
+# Admission control in front of Bedrock: chat requests per minute for each user and across all users
+CHAT_USER_LIMIT_PER_MINUTE = int(os.environ.get('CHAT_USER_LIMIT_PER_MINUTE', '20'))
+CHAT_GLOBAL_LIMIT_PER_MINUTE = int(os.environ.get('CHAT_GLOBAL_LIMIT_PER_MINUTE', '600'))
+
+# Bedrock client configuration
+# Adaptive retry mode backs off and rate-limits client-side when Bedrock throttles; timeouts and connection
+# errors are not retried (see fail_fast_on_timeout), so they fall back to the next model within the budget
+BEDROCK_CLIENT_CONFIG = {
+    'read_timeout': MODEL_READ_TIMEOUT_SECONDS,
+    'connect_timeout': 2,
+    'retries': {'mode': 'adaptive', 'max_attempts': 3}
+}
+
+# Initialize Bedrock client (created on first use)
+bedrock = LazyProxy(lambda: create_bedrock_client())
 
 # DynamoDB table references
-conversation_table = dynamodb.Table('ConversationHistory')
+conversation_table = lazy_table('ConversationHistory')
+
+# Turns of history sent to the model
+# The window's oldest turn stays fixed while it fills up to HISTORY_LIMIT, then restarts from the newest
+# HISTORY_RESET turns, so most turns extend the previous prompt instead of sliding it (keeps the cached prefix)
+HISTORY_LIMIT = 10
+HISTORY_RESET = 4
+
+# Per-container write-through cache of recent turns: user_id -> {'version': timestamp, 'items': [...], 'anchor': timestamp}
+# 'version' is the timestamp of the newest turn this container stored; each request compares it with the
+# user's newest turn in DynamoDB (a key-only read), so a turn stored by another container forces a full read
+CONVERSATION_CACHE_MAX_USERS = 1000
+conversation_cache = OrderedDict()
+conversation_cache_lock = threading.Lock()
 
 
+@trace_handler('bedrock-chat-handler')
+@api_handler
 def lambda_handler(event, context):
     """
     Main Lambda handler for chat requests
     """
     try:
-        # Parse request body - handles both direct body and nested body structure
-        if isinstance(event.get('body'), str):
-            # Body is a JSON string (AWS integration with template or AWS_PROXY)
-            body = json.loads(event.get('body', '{}'))
-        elif isinstance(event.get('body'), dict):
-            # Body is already a dict (AWS integration without template)
-            body = event.get('body', {})
-        else:
-            body = {}
-
-        # Get user_id from authorizer context (handles both AWS and AWS_PROXY integration types)
-        try:
-            # AWS_PROXY integration type
-            user_id = event['requestContext']['authorizer']['claims']['sub']
-        except (KeyError, TypeError):
-            # AWS integration type - authorizer context is in different location
-            user_id = event['requestContext']['authorizer'].get('sub') or event['requestContext']['authorizer'].get('principalId')
+        # Parse request body and user_id (handles both AWS and AWS_PROXY integration types)
+        body = parse_body(event)
+        user_id = get_user_id(event)
 
         if not user_id:
-            return {
-                'statusCode': 401,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Unauthorized - missing user ID'})
-            }
+            return error_response(401, 'Unauthorized - missing user ID')
 
         user_message = body.get('message', '').strip()
         
         if not user_message:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Message cannot be empty'})
-            }
-        
-        # Fetch chat history from DynamoDB
-        response = conversation_table.query(
-            KeyConditionExpression='userId = :uid',
-            ExpressionAttributeValues={':uid': user_id},
-            ScanIndexForward=False,  # Most recent first
-            Limit=10  # Last 10 messages for context
-        )
-        
-        history = response.get('Items', [])
-        
-        # Build message history for Bedrock Nova (converse API format)
-        messages = []
-        for item in reversed(history):  # Reverse to chronological order
-            messages.append({
-                'role': item['role'],
-                'content': [{'text': item['content']}]
-            })
-
-        # Add current user message
-        messages.append({
-            'role': 'user',
-            'content': [{'text': user_message}]
-        })
-        
-        # Call Bedrock Nova model
-        bedrock_response = bedrock.invoke_model(
-            modelId='us.amazon.nova-pro-v1:0',  # Using Nova Pro for better reasoning
-            contentType='application/json',
-            accept='application/json',
-            body=json.dumps({
-                'messages': messages,
-                'system': [{'text': 'You are a helpful medical AI assistant for BeauMED. Provide accurate, safe health information. Always recommend consulting a healthcare provider for serious concerns. Keep responses concise and friendly.'}],
-                'inferenceConfig': {
-                    'max_new_tokens': 500,
-                    'temperature': 0.7
-                }
-            })
-        )
-        
-        # Parse Bedrock response
-        response_body = json.loads(bedrock_response['body'].read().decode('utf-8'))
-        print(f"Bedrock response: {json.dumps(response_body)}")
-
-        # Extract AI message from Nova response structure
-        # Nova returns: {"output": {"message": {"role": "assistant", "content": [{"text": "..."}]}}}
-        if 'output' in response_body and 'message' in response_body['output']:
-            ai_message = response_body['output']['message']['content'][0]['text']
-        elif 'content' in response_body:
-            ai_message = response_body['content'][0]['text']
-        else:
-            raise Exception(f"Unexpected response structure: {json.dumps(response_body)}")
-        
-        # Save user message to DynamoDB
+            return error_response(400, 'Message cannot be empty')
+
+        # Per-user bucket first, so a user over their own limit never spends the shared quota
+        retry_after = check_rate_limits([
+            (f'chat#user#{user_id}', CHAT_USER_LIMIT_PER_MINUTE),
+            ('chat#global', CHAT_GLOBAL_LIMIT_PER_MINUTE)
+        ])
+        if retry_after is not None:
+            return too_many_requests('Too many messages, please wait a moment and try again', retry_after)
+
+        # Fetch chat history, from the container cache when it still holds the user's newest turn
+        latest_timestamp = get_latest_timestamp(user_id)
+        history = get_cached_history(user_id, latest_timestamp)
+        if history is None and latest_timestamp is None:
+            history = []  # First message: nothing stored yet
+        elif history is None:
+            response = conversation_table.query(
+                KeyConditionExpression='userId = :uid',
+                ExpressionAttributeValues={':uid': user_id},
+                ScanIndexForward=False,  # Most recent first
+                Limit=HISTORY_LIMIT  # Last 10 messages for context
+            )
+            history = response.get('Items', [])
+
+        # Build message history for Bedrock Nova (oldest turn of the window kept stable across turns)
+        window, anchor = select_window(history, get_window_anchor(user_id))
+        messages = build_messages(window, user_message)
+
+        # Route to a model tier and call Bedrock, falling back within the latency budget
+        tier = classify_message(user_message)
+        budget_seconds = LATENCY_BUDGET_SECONDS
+        if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+            # Leave a second for the DynamoDB writes
+            budget_seconds = min(budget_seconds, context.get_remaining_time_in_millis() / 1000 - 1)
+
+        ai_message, model_id = invoke_with_fallback(messages, tier, time.monotonic() + budget_seconds)
+        if ai_message is None:
+            return too_many_requests('The assistant is busy right now, please try again shortly', RETRY_AFTER_SECONDS)
+
+        # Save user message to DynamoDB (moved into the S3 archive after the retention period)
         timestamp = str(int(datetime.now().timestamp() * 1000))
-        conversation_table.put_item(
-            Item={
-                'userId': user_id,
-                'timestamp': timestamp,
-                'role': 'user',
-                'content': user_message
-            }
-        )
+        user_item = {
+            'userId': user_id,
+            'timestamp': timestamp,
+            'role': 'user',
+            'content': user_message
+        }
+        conversation_table.put_item(Item=user_item)
 
         # Save AI response to DynamoDB
-        conversation_table.put_item(
-            Item={
-                'userId': user_id,
-                'timestamp': str(int(timestamp) + 1),
-                'role': 'assistant',
-                'content': ai_message
-            }
-        )
+        assistant_item = {
+            'userId': user_id,
+            'timestamp': str(int(timestamp) + 1),
+            'role': 'assistant',
+            'content': ai_message
+        }
+        conversation_table.put_item(Item=assistant_item)
+
+        # Write through to the container cache (newest first, like the query)
+        cache_history(user_id, assistant_item['timestamp'], [assistant_item, user_item] + history, anchor)
         
-        # For AWS integration type, return just the response data
-        # API Gateway handles statusCode and headers via integration response
+        # api_handler wraps this in a proxy envelope for AWS_PROXY; the AWS integration type gets it directly
         response_data = {
             'response': ai_message,
-            'timestamp': timestamp
+            'timestamp': timestamp,
+            'model': model_id
         }
-        print(f"Returning response: {json.dumps(response_data)}")
+        log_sampled('Returning response', response_data)
         return response_data
     
     except Exception as e:
         print(f"Error: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': str(e)})
-        }
+        return error_response(500, str(e))
+
+
+def build_messages(history, user_message):
+    """
+    Build the conversation as (role, text) turns in chronological order from stored history
+    (most recent first) plus the current user message
+    """
+    messages = [(item['role'], item['content']) for item in reversed(history)]
+    messages.append(('user', user_message))
+    return messages
+
+
+def select_window(history, anchor):
+    """
+    Helper: The stored turns to send (most recent first) and the window's anchor timestamp
+    While the anchor turn is still among the latest HISTORY_LIMIT, every newer turn is sent, so the prompt
+    grows by appending and its prefix is unchanged; once it drops out, the window restarts from the newest
+    HISTORY_RESET turns. Without an anchor (new conversation or another container's turn), all are sent
+    """
+    if not history:
+        return history, None
+    if anchor and history[-1]['timestamp'] <= anchor:
+        return [item for item in history if item['timestamp'] >= anchor], anchor
+    window = history if anchor is None else history[:HISTORY_RESET]
+    return window, window[-1]['timestamp']
+
+
+def build_request_body(messages, max_new_tokens, prompt_caching):
+    """
+    Helper: Serialize the Nova request body from cached, pre-serialized fragments
+    Fragments serialize the same way every time, so a turn's prompt is byte-identical to the previous
+    turn's up to the new messages. With prompt caching, cache points follow the system prompt, the last
+    stored turn, and the turn where the previous request's cache point was (an exact prefix to reuse)
+    """
+    head, tail = request_frame(max_new_tokens, prompt_caching)
+    last_stored = len(messages) - 2
+    cache_positions = {last_stored, last_stored - 2} if prompt_caching else ()
+    fragments = [message_fragment(role, text, position in cache_positions)
+                 for position, (role, text) in enumerate(messages)]
+    return head + ','.join(fragments) + tail
+
+
+@lru_cache(maxsize=8)
+def request_frame(max_new_tokens, prompt_caching):
+    """
+    Helper: The serialized request around the messages: (system prompt and messages opener, closing and config)
+    """
+    system = [{'text': SYSTEM_PROMPT}, CACHE_POINT] if prompt_caching else [{'text': SYSTEM_PROMPT}]
+    inference_config = {'max_new_tokens': max_new_tokens, 'temperature': TEMPERATURE}
+    return (
+        '{"system":' + json.dumps(system, separators=(',', ':')) + ',"messages":[',
+        '],"inferenceConfig":' + json.dumps(inference_config, separators=(',', ':')) + '}'
+    )
+
+
+@lru_cache(maxsize=4096)
+def message_fragment(role, text, cache_point=False):
+    """
+    Helper: One serialized message (cached per container; history turns repeat on every request)
+    """
+    content = [{'text': text}, CACHE_POINT] if cache_point else [{'text': text}]
+    return json.dumps({'role': role, 'content': content}, separators=(',', ':'))
+
+
+def too_many_requests(message, retry_after):
+    """
+    Helper: 429 response telling the client when to retry
+    """
+    return {
+        'statusCode': 429,
+        'headers': {'Retry-After': str(retry_after)},
+        'body': json.dumps({'error': message, 'retry_after': retry_after})
+    }
+
+
+def get_latest_timestamp(user_id):
+    """
+    Helper: Timestamp of the user's newest stored turn, or None (a key-only read of one item)
+    """
+    response = conversation_table.query(
+        KeyConditionExpression='userId = :uid',
+        ProjectionExpression='#timestamp',
+        ExpressionAttributeNames={'#timestamp': 'timestamp'},
+        ExpressionAttributeValues={':uid': user_id},
+        ScanIndexForward=False,
+        Limit=1
+    )
+    items = response.get('Items', [])
+    return items[0]['timestamp'] if items else None
+
+
+def get_cached_history(user_id, latest_timestamp):
+    """
+    Helper: Cached history (most recent first) if it is still current, else None
+    Current means the newest turn in DynamoDB is the newest turn this container cached, i.e. no turn
+    for this user was written elsewhere since
+    """
+    if not latest_timestamp:
+        return None
+    with conversation_cache_lock:
+        entry = conversation_cache.get(user_id)
+        if entry is None or entry['version'] != latest_timestamp:
+            return None
+        conversation_cache.move_to_end(user_id)
+        return entry['items']
+
+
+def get_window_anchor(user_id):
+    """
+    Helper: Anchor timestamp of the user's prompt window on this container, if any
+    """
+    with conversation_cache_lock:
+        entry = conversation_cache.get(user_id)
+        return entry.get('anchor') if entry else None
+
+
+def cache_history(user_id, version, items, anchor=None):
+    """
+    Helper: Store the latest turns for a user, evicting the least recently used user when full
+    """
+    with conversation_cache_lock:
+        conversation_cache[user_id] = {'version': version, 'items': items[:HISTORY_LIMIT], 'anchor': anchor}
+        conversation_cache.move_to_end(user_id)
+        while len(conversation_cache) > CONVERSATION_CACHE_MAX_USERS:
+            conversation_cache.popitem(last=False)
+
+
+def classify_message(user_message):
+    """
+    Helper: Pick the model tier for a message
+    Small talk and short non-clinical questions are 'simple'; anything clinical or long is 'complex'
+    """
+    text = user_message.lower().strip(' \t\n!.?')
+    if text in SMALL_TALK:
+        return 'simple'
+    if COMPLEX_PATTERN.search(text):
+        return 'complex'
+    if len(text.split()) <= SIMPLE_MAX_WORDS and '\n' not in text:
+        return 'simple'
+    return 'complex'
+
+
+def invoke_with_fallback(messages, tier, deadline):
+    """
+    Helper: Call the tier's models in order until one answers
+    Throttling is retried with adaptive backoff by the client; once retries are exhausted, a model times out
+    or the budget is spent, the next model is tried. Returns (ai_message, model_id), or (None, None)
+    when every model was unavailable
+    """
+    tier_config = MODEL_TIERS[tier]
+    request_bodies = {}
+
+    for model_id in tier_config['models']:
+        if time.monotonic() >= deadline:
+            print(f"Latency budget exhausted before trying {model_id}")
+            break
+
+        prompt_caching = PROMPT_CACHING and model_id in PROMPT_CACHE_MODELS
+        if prompt_caching not in request_bodies:
+            request_bodies[prompt_caching] = build_request_body(messages, tier_config['max_new_tokens'], prompt_caching)
+        request_body = request_bodies[prompt_caching]
+
+        metric_name = f"Model.{MODEL_METRIC_NAMES.get(model_id, model_id)}"
+        start = time.perf_counter()
+        try:
+            bedrock_response = bedrock.invoke_model(
+                modelId=model_id,
+                contentType='application/json',
+                accept='application/json',
+                body=request_body
+            )
+            response_body = json.loads(bedrock_response['body'].read().decode('utf-8'))
+        except Exception as e:
+            record_span(f'{metric_name}.Failed', (time.perf_counter() - start) * 1000)
+            if not is_fallback_error(e):
+                raise
+            print(f"Model {model_id} unavailable, falling back: {str(e)}")
+            continue
+
+        record_span(metric_name, (time.perf_counter() - start) * 1000)
+        record_token_usage(metric_name, bedrock_response, response_body)
+        log_sampled('Bedrock response', response_body)
+        return extract_message(response_body), model_id
+
+    return None, None
+
+
+def create_bedrock_client():
+    """
+    Helper: Build the shared Bedrock client with timeouts excluded from its retries
+    """
+    client = get_client('bedrock-runtime', config=BEDROCK_CLIENT_CONFIG)
+    # First in line, so it runs before botocore's retry handler decides to retry
+    client.meta.events.register_first('needs-retry.bedrock-runtime.InvokeModel', fail_fast_on_timeout,
+                                      unique_id='bedrock-chat-fail-fast-on-timeout')
+    return client
+
+
+def fail_fast_on_timeout(caught_exception=None, **kwargs):
+    """
+    Helper: botocore needs-retry hook that re-raises timeouts and connection errors instead of retrying them
+    botocore treats them as transient, so adaptive mode would otherwise spend up to max_attempts x
+    MODEL_READ_TIMEOUT_SECONDS on one slow model and leave no budget for the fallback
+    """
+    if caught_exception is not None and type(caught_exception).__name__ in FALLBACK_ERROR_TYPES:
+        raise caught_exception
+
+
+def is_fallback_error(error):
+    """
+    Helper: True for throttling, capacity and timeout errors that another model may not hit
+    """
+    code = (getattr(error, 'response', None) or {}).get('Error', {}).get('Code')
+    return code in FALLBACK_ERROR_CODES or type(error).__name__ in FALLBACK_ERROR_TYPES
+
+
+def record_token_usage(metric_name, bedrock_response, response_body):
+    """
+    Helper: Record input/output (and prompt cache read/write) token counts for a model call
+    Uses the Nova usage block, falling back to Bedrock's token count headers
+    """
+    usage = response_body.get('usage', {})
+    headers = bedrock_response.get('ResponseMetadata', {}).get('HTTPHeaders', {})
+    input_tokens = usage.get('inputTokens', headers.get('x-amzn-bedrock-input-token-count'))
+    output_tokens = usage.get('outputTokens', headers.get('x-amzn-bedrock-output-token-count'))
+    if input_tokens is not None:
+        record_value(f'{metric_name}.InputTokens', int(input_tokens))
+    if output_tokens is not None:
+        record_value(f'{metric_name}.OutputTokens', int(output_tokens))
+    if usage.get('cacheReadInputTokenCount') is not None:
+        record_value(f'{metric_name}.CacheReadTokens', int(usage['cacheReadInputTokenCount']))
+    if usage.get('cacheWriteInputTokenCount') is not None:
+        record_value(f'{metric_name}.CacheWriteTokens', int(usage['cacheWriteInputTokenCount']))
+
+
+def extract_message(response_body):
+    """
+    Helper: Extract the AI message from a Nova response
+    Nova returns: {"output": {"message": {"role": "assistant", "content": [{"text": "..."}]}}}
+    """
+    if 'output' in response_body and 'message' in response_body['output']:
+        return response_body['output']['message']['content'][0]['text']
+    if 'content' in response_body:
+        return response_body['content'][0]['text']
+    raise Exception(f"Unexpected response structure: {json.dumps(response_body)}")
@@ -0,0 +1,1234 @@
+"""
+Local AWS stand-in harness
+Purpose: In-process emulation of the AWS services the Lambdas call, so handlers run without live AWS
+Covers: DynamoDB tables, S3, Textract, Bedrock runtime, Secrets Manager, Lambda Invoke, Cognito JWKS and Yelp (over urllib)
+Each service has configurable latency (mean + jitter) and error injection
+Usage:
+    standin = aws_standin.install(behaviors={'dynamodb': ServiceBehavior(latency_ms=8)})
+    ...call lambda_handler functions...
+    standin.uninstall()
+Requires boto3 (for DynamoDB type handling and ClientError); python-jose + cryptography for JWT issuing
+"""
+
+import base64
+import email.message
+import hashlib
+import io
+import json
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import urllib.response
+import uuid
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from boto3.dynamodb.conditions import ConditionExpressionBuilder
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+import aws_clients
+
+REGION = aws_clients.AWS_REGION
+COGNITO_POOL_URL = 'https://cognito-idp.us-west-1.amazonaws.com/us-west-1_7zPgpiXeY'
+
+# Bedrock prompt cache emulation: checkpoints under the minimum size are ignored; entries expire after
+# the TTL (refreshed on each hit); cached prefix tokens are prefilled at a fraction of the normal cost
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_TTL_SECONDS = 300
+PROMPT_CACHE_READ_LATENCY_FACTOR = 0.1
+
+# Key schema of every BeauMED table: (partition key, sort key, {index name: (partition key, sort key)})
+TABLE_SCHEMAS = {
+    'Medications': ('userId', 'medicationId', {}),
+    'ConversationHistory': ('userId', 'timestamp', {}),
+    'ConversationArchives': ('userId', None, {}),
+    'Doctors': ('userId', 'doctorId', {
+        'userId-rating-index': ('userId', 'rating'),
+        'userId-specialtyRating-index': ('userId', 'specialtyRating')
+    }),
+    'PrescriptionData': ('userId', 'prescriptionId', {}),
+    'UserFiles': ('userId', 's3Key', {}),
+    'RateLimits': ('bucketId', None, {}),
+    'DoseEvents': ('userId', 'eventId', {}),
+    'DoseRollups': ('userId', 'period', {}),
+    'ExportJobs': ('userId', 'jobId', {})
+}
+
+SAMPLE_PRESCRIPTION_LINES = [
+    'Dr. Sarah Chen, MD',
+    'Patient: Jane Doe',
+    'Rx: Metformin 500mg',
+    'Take one tablet twice daily with meals',
+    'Lisinopril 10mg once daily',
+    'Refills: 3'
+]
+
+FrozenCredentials = namedtuple('FrozenCredentials', ['access_key', 'secret_key', 'token'])
+
+
+class ServiceBehavior:
+    """
+    Latency and error injection settings for one stand-in service
+    """
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, error_code='ThrottlingException'):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_code = error_code
+
+    def apply(self, operation_name):
+        """
+        Sleep for the simulated latency, then raise an injected error if one is drawn
+        """
+        delay_ms = self.latency_ms + (random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            raise client_error(self.error_code, f'Injected {self.error_code}', operation_name)
+
+
+def client_error(code, message, operation_name):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation_name)
+
+
+class StandInMeta:
+    """
+    Client .meta stand-in: botocore event hooks are accepted and never fired
+    """
+
+    class Events:
+        def register(self, event_name, handler, **kwargs):
+            pass
+
+        def register_first(self, event_name, handler, **kwargs):
+            pass
+
+    def __init__(self):
+        self.events = self.Events()
+
+
+class StandInService:
+    """
+    Base class: every public operation calls self.call(name) first for latency/error injection
+    """
+
+    def __init__(self, behavior=None):
+        self.behavior = behavior or ServiceBehavior()
+        self.lock = threading.Lock()
+        self.calls = {}
+        # aws_clients instruments every client it builds through meta.events
+        self.meta = StandInMeta()
+
+    def call(self, operation_name):
+        with self.lock:
+            self.calls[operation_name] = self.calls.get(operation_name, 0) + 1
+        self.behavior.apply(operation_name)
+
+
+# ---------------------------------------------------------------------------
+# DynamoDB
+# ---------------------------------------------------------------------------
+
+class ExpressionContext:
+    """
+    Resolves #name / :value placeholders of a DynamoDB expression
+    """
+
+    def __init__(self, names=None, values=None):
+        self.names = names or {}
+        self.values = values or {}
+
+    def path(self, token):
+        return '.'.join(self.names.get(part, part) for part in token.strip().split('.'))
+
+    def value(self, token, item=None):
+        token = token.strip()
+        if token.startswith(':'):
+            return self.values[token]
+        return get_path(item or {}, self.path(token))
+
+
+def get_path(item, path):
+    value = item
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def set_path(item, path, value):
+    parts = path.split('.')
+    target = item
+    for part in parts[:-1]:
+        target = target.setdefault(part, {})
+    target[parts[-1]] = value
+
+
+def remove_path(item, path):
+    parts = path.split('.')
+    target = get_path(item, '.'.join(parts[:-1])) if len(parts) > 1 else item
+    if isinstance(target, dict):
+        target.pop(parts[-1], None)
+
+
+def split_top_level(text, separator=','):
+    """
+    Split on a separator, ignoring separators inside parentheses
+    """
+    parts, depth, current = [], 0, ''
+    for char in text:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        if char == separator and depth == 0:
+            parts.append(current.strip())
+            current = ''
+        else:
+            current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def split_keyword(expression, keyword):
+    """
+    Split on a keyword operator (AND / OR), ignoring keywords inside parentheses
+    """
+    parts, depth, start = [], 0, 0
+    pattern = re.compile(rf'\s+{keyword}\s+|[()]', flags=re.IGNORECASE)
+    for match in pattern.finditer(expression):
+        if match.group() == '(':
+            depth += 1
+        elif match.group() == ')':
+            depth -= 1
+        elif depth == 0:
+            parts.append(expression[start:match.start()])
+            start = match.end()
+    parts.append(expression[start:])
+    return [part.strip() for part in parts]
+
+
+def split_conditions(expression):
+    """
+    Split a condition on top-level AND, keeping `x BETWEEN :a AND :b` together
+    """
+    parts = split_keyword(expression.strip(), 'AND')
+    clauses = []
+    index = 0
+    while index < len(parts):
+        part = parts[index]
+        if re.search(r'\sBETWEEN\s', part, flags=re.IGNORECASE):
+            part = f'{part} AND {parts[index + 1]}'
+            index += 1
+        clauses.append(strip_parentheses(part))
+        index += 1
+    return clauses
+
+
+def strip_parentheses(clause):
+    """
+    Drop parentheses enclosing a whole clause, e.g. `(a = :x OR b > :y)`
+    """
+    clause = clause.strip()
+    while clause.startswith('(') and clause.endswith(')'):
+        depth = 0
+        for index, char in enumerate(clause):
+            depth += {'(': 1, ')': -1}.get(char, 0)
+            if depth == 0:
+                break
+        if index != len(clause) - 1:
+            break
+        clause = clause[1:-1].strip()
+    return clause
+
+
+def evaluate_condition(item, expression, context):
+    """
+    Evaluate the supported subset of DynamoDB condition syntax:
+    comparisons, BETWEEN, begins_with, attribute_exists, attribute_not_exists, joined by AND / OR
+    (OR binds looser than AND, as in DynamoDB; parentheses group)
+    """
+    expression = strip_parentheses(expression)
+    alternatives = split_keyword(expression, 'OR')
+    if len(alternatives) > 1:
+        return any(evaluate_condition(item, alternative, context) for alternative in alternatives)
+
+    for clause in split_conditions(expression):
+        if split_keyword(clause, 'OR')[1:]:
+            if not evaluate_condition(item, clause, context):
+                return False
+            continue
+
+        match = re.match(r'^(attribute_exists|attribute_not_exists)\s*\(\s*([^)]+)\)$', clause)
+        if match:
+            exists = get_path(item, context.path(match.group(2))) is not None
+            if exists != (match.group(1) == 'attribute_exists'):
+                return False
+            continue
+
+        match = re.match(r'^begins_with\s*\(\s*([^,]+),\s*([^)]+)\)$', clause)
+        if match:
+            value = context.value(match.group(1), item)
+            if not isinstance(value, str) or not value.startswith(context.value(match.group(2), item)):
+                return False
+            continue
+
+        match = re.match(r'^(\S+)\s+BETWEEN\s+(\S+)\s+AND\s+(\S+)$', clause, flags=re.IGNORECASE)
+        if match:
+            value = context.value(match.group(1), item)
+            low, high = context.value(match.group(2), item), context.value(match.group(3), item)
+            if value is None or not (low <= value <= high):
+                return False
+            continue
+
+        match = re.match(r'^(\S+)\s*(=|<>|<=|>=|<|>)\s*(\S+)$', clause)
+        if not match:
+            raise ValueError(f'Unsupported condition in stand-in: {clause}')
+        left, operator, right = context.value(match.group(1), item), match.group(2), context.value(match.group(3), item)
+        if operator == '=' and left != right:
+            return False
+        if operator == '<>' and left == right:
+            return False
+        if operator in ('<', '<=', '>', '>=') and left is None:
+            return False
+        if operator == '<' and not left < right:
+            return False
+        if operator == '<=' and not left <= right:
+            return False
+        if operator == '>' and not left > right:
+            return False
+        if operator == '>=' and not left >= right:
+            return False
+    return True
+
+
+def build_expression(condition, names, values, is_key_condition=False):
+    """
+    Convert boto3 condition objects (Key/Attr) to string form; strings pass through
+    """
+    if condition is None or isinstance(condition, str):
+        return condition, names, values
+    built = ConditionExpressionBuilder().build_expression(condition, is_key_condition=is_key_condition)
+    merged_names = dict(names or {}, **built.attribute_name_placeholders)
+    merged_values = dict(values or {}, **built.attribute_value_placeholders)
+    return built.condition_expression, merged_names, merged_values
+
+
+class StandInTable(StandInService):
+    """
+    In-memory DynamoDB Table with the boto3 resource interface
+    Items round-trip through boto3's type serializer, so floats are rejected and numbers come back as Decimal
+    """
+
+    serializer = TypeSerializer()
+    deserializer = TypeDeserializer()
+
+    def __init__(self, name, partition_key, sort_key=None, indexes=None, behavior=None):
+        super().__init__(behavior)
+        self.name = name
+        self.partition_key = partition_key
+        self.sort_key = sort_key
+        self.indexes = indexes or {}
+        self.partitions = {}
+
+    # Storage helpers
+
+    def to_storage(self, item):
+        return {key: self.serializer.serialize(value) for key, value in item.items()}
+
+    def from_storage(self, stored):
+        return {key: self.deserializer.deserialize(value) for key, value in stored.items()}
+
+    def key_of(self, item):
+        return item[self.partition_key], item.get(self.sort_key) if self.sort_key else None
+
+    def check_key(self, key, operation_name):
+        expected = {self.partition_key} | ({self.sort_key} if self.sort_key else set())
+        if set(key) != expected:
+            raise client_error('ValidationException', 'The provided key element does not match the schema', operation_name)
+
+    # Table API
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, ReturnValues='NONE', **kwargs):
+        self.call('PutItem')
+        stored = self.to_storage(Item)
+        partition, sort = self.key_of(Item)
+        with self.lock:
+            existing = self.partitions.get(partition, {}).get(sort)
+            self.check_condition(existing, ConditionExpression, ExpressionAttributeNames,
+                                 ExpressionAttributeValues, 'PutItem')
+            self.partitions.setdefault(partition, {})[sort] = stored
+        if ReturnValues == 'ALL_OLD' and existing:
+            return {'Attributes': self.from_storage(existing)}
+        return {}
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        self.call('GetItem')
+        self.check_key(Key, 'GetItem')
+        partition, sort = self.key_of(Key)
+        with self.lock:
+            stored = self.partitions.get(partition, {}).get(sort)
+        if stored is None:
+            return {}
+        item = self.from_storage(stored)
+        return {'Item': project(item, ProjectionExpression, ExpressionAttributeNames)}
+
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, **kwargs):
+        self.call('DeleteItem')
+        self.check_key(Key, 'DeleteItem')
+        partition, sort = self.key_of(Key)
+        with self.lock:
+            existing = self.partitions.get(partition, {}).get(sort)
+            self.check_condition(existing, ConditionExpression, ExpressionAttributeNames,
+                                 ExpressionAttributeValues, 'DeleteItem')
+            self.partitions.get(partition, {}).pop(sort, None)
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues=None, ExpressionAttributeNames=None,
+                    ConditionExpression=None, ReturnValues='NONE', **kwargs):
+        self.call('UpdateItem')
+        self.check_key(Key, 'UpdateItem')
+        partition, sort = self.key_of(Key)
+        context = ExpressionContext(ExpressionAttributeNames, ExpressionAttributeValues)
+
+        with self.lock:
+            stored = self.partitions.get(partition, {}).get(sort)
+            self.check_condition(stored, ConditionExpression, ExpressionAttributeNames,
+                                 ExpressionAttributeValues, 'UpdateItem')
+            item = self.from_storage(stored) if stored else dict(Key)
+            apply_update(item, UpdateExpression, context)
+            self.partitions.setdefault(partition, {})[sort] = self.to_storage(item)
+
+        if ReturnValues in ('ALL_NEW', 'UPDATED_NEW'):
+            return {'Attributes': item}
+        return {}
+
+    def query(self, KeyConditionExpression, ExpressionAttributeValues=None, ExpressionAttributeNames=None,
+              IndexName=None, ScanIndexForward=True, Limit=None, ExclusiveStartKey=None,
+              FilterExpression=None, ProjectionExpression=None, Select=None, **kwargs):
+        self.call('Query')
+        key_expression, names, values = build_expression(
+            KeyConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, is_key_condition=True)
+        filter_expression, names, values = build_expression(FilterExpression, names, values)
+        context = ExpressionContext(names, values)
+
+        partition_key, sort_key = (self.partition_key, self.sort_key)
+        if IndexName:
+            partition_key, sort_key = self.indexes[IndexName]
+
+        # The partition value is the operand of `<partition key> = :value`
+        partition_value = None
+        for clause in split_conditions(key_expression):
+            match = re.match(r'^(\S+)\s*=\s*(\S+)$', clause)
+            if match and context.path(match.group(1)) == partition_key:
+                partition_value = context.value(match.group(2))
+        if partition_value is None:
+            raise client_error('ValidationException', 'Query condition missed key schema element', 'Query')
+
+        with self.lock:
+            if IndexName:
+                candidates = [stored for partition in self.partitions.values() for stored in partition.values()]
+            else:
+                candidates = list(self.partitions.get(partition_value, {}).values())
+
+        items = [self.from_storage(stored) for stored in candidates]
+        items = [item for item in items
+                 if item.get(partition_key) == partition_value
+                 and (sort_key is None or sort_key in item)
+                 and evaluate_condition(item, key_expression, context)]
+        items.sort(key=lambda item: (item.get(sort_key), item.get(self.sort_key)) if sort_key else 0,
+                   reverse=not ScanIndexForward)
+
+        if ExclusiveStartKey:
+            start_position = None
+            for position, item in enumerate(items):
+                if all(item.get(name) == value for name, value in ExclusiveStartKey.items()):
+                    start_position = position
+                    break
+            items = items[start_position + 1:] if start_position is not None else items
+
+        page = items[:Limit] if Limit else items
+        response = {'Count': 0, 'ScannedCount': len(page)}
+
+        if Limit and len(items) > Limit:
+            last = page[-1]
+            key_names = {self.partition_key, self.sort_key, partition_key, sort_key} - {None}
+            response['LastEvaluatedKey'] = {name: last[name] for name in key_names if name in last}
+
+        if filter_expression:
+            page = [item for item in page if evaluate_condition(item, filter_expression, context)]
+
+        response['Count'] = len(page)
+        if Select != 'COUNT':
+            response['Items'] = [project(item, ProjectionExpression, names) for item in page]
+        return response
+
+    def check_condition(self, stored, expression, names, values, operation_name):
+        if not expression:
+            return
+        expression, names, values = build_expression(expression, names, values)
+        item = self.from_storage(stored) if stored else {}
+        if not evaluate_condition(item, expression, ExpressionContext(names, values)):
+            raise client_error('ConditionalCheckFailedException', 'The conditional request failed', operation_name)
+
+    def scan(self, FilterExpression=None, ExpressionAttributeValues=None, ExpressionAttributeNames=None,
+             Limit=None, ExclusiveStartKey=None, ProjectionExpression=None, **kwargs):
+        self.call('Scan')
+        filter_expression, names, values = build_expression(
+            FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+        context = ExpressionContext(names, values)
+
+        items = sorted(self.all_items(), key=lambda item: (item.get(self.partition_key), item.get(self.sort_key)))
+        if ExclusiveStartKey:
+            start = (ExclusiveStartKey.get(self.partition_key), ExclusiveStartKey.get(self.sort_key))
+            items = [item for item in items if (item.get(self.partition_key), item.get(self.sort_key)) > start]
+
+        page = items[:Limit] if Limit else items
+        response = {'ScannedCount': len(page)}
+        if Limit and len(items) > Limit:
+            response['LastEvaluatedKey'] = {name: page[-1][name] for name in (self.partition_key, self.sort_key) if name}
+
+        if filter_expression:
+            page = [item for item in page if evaluate_condition(item, filter_expression, context)]
+        response['Count'] = len(page)
+        response['Items'] = [project(item, ProjectionExpression, names) for item in page]
+        return response
+
+    # Inspection helpers for harness users
+
+    def all_items(self):
+        with self.lock:
+            return [self.from_storage(stored) for partition in self.partitions.values() for stored in partition.values()]
+
+
+def project(item, projection_expression, names):
+    if not projection_expression:
+        return item
+    context = ExpressionContext(names)
+    projected = {}
+    for token in projection_expression.split(','):
+        path = context.path(token)
+        value = get_path(item, path)
+        if value is not None:
+            set_path(projected, path, value)
+    return projected
+
+
+def apply_update(item, expression, context):
+    """
+    Apply SET / ADD / REMOVE clauses of an UpdateExpression to an item (in place)
+    """
+    sections = re.split(r'\b(SET|ADD|REMOVE|DELETE)\b', expression)
+    action = None
+    for section in sections:
+        if section in ('SET', 'ADD', 'REMOVE', 'DELETE'):
+            action = section
+            continue
+        if not section.strip():
+            continue
+
+        for clause in split_top_level(section):
+            if action == 'SET':
+                target, value_expression = clause.split('=', 1)
+                set_path(item, context.path(target), evaluate_operand(item, value_expression, context))
+            elif action == 'ADD':
+                target, value_token = clause.split()
+                path = context.path(target)
+                current = get_path(item, path)
+                increment = context.value(value_token)
+                if isinstance(increment, set):
+                    set_path(item, path, (current or set()) | increment)
+                else:
+                    set_path(item, path, (current or 0) + increment)
+            elif action == 'REMOVE':
+                remove_path(item, context.path(clause))
+            elif action == 'DELETE':
+                target, value_token = clause.split()
+                path = context.path(target)
+                set_path(item, path, (get_path(item, path) or set()) - context.value(value_token))
+
+
+def evaluate_operand(item, expression, context):
+    """
+    Evaluate a SET value: operand [+|- operand], if_not_exists(path, operand), list_append(a, b)
+    """
+    expression = expression.strip()
+
+    match = re.match(r'^if_not_exists\s*\(\s*([^,]+),\s*(.+)\)$', expression)
+    if match:
+        existing = get_path(item, context.path(match.group(1)))
+        return existing if existing is not None else evaluate_operand(item, match.group(2), context)
+
+    match = re.match(r'^list_append\s*\(\s*(.+)\)$', expression)
+    if match:
+        first, second = split_top_level(match.group(1))
+        return (evaluate_operand(item, first, context) or []) + (evaluate_operand(item, second, context) or [])
+
+    arithmetic = split_top_level(expression.replace(' - ', ' + -'), '+')
+    if len(arithmetic) > 1:
+        total = 0
+        for term in arithmetic:
+            negative = term.startswith('-')
+            value = evaluate_operand(item, term.lstrip('-'), context) or 0
+            total = total - value if negative else total + value
+        return total
+
+    return context.value(expression, item)
+
+
+class StandInDynamoDB:
+    """
+    boto3 DynamoDB resource stand-in: Table(name) returns the shared in-memory table
+    Each table's meta.client is this object, which serves TransactWriteItems across tables
+    """
+
+    def __init__(self, behavior=None, schemas=None):
+        self.behavior = behavior or ServiceBehavior()
+        self.tables = {}
+        self.lock = threading.Lock()
+        self.calls = {}
+        for name, (partition_key, sort_key, indexes) in (schemas or TABLE_SCHEMAS).items():
+            self.tables[name] = StandInTable(name, partition_key, sort_key, indexes, self.behavior)
+            self.tables[name].meta.client = self
+
+    def transact_write_items(self, TransactItems, **kwargs):
+        """
+        All-or-nothing Put / Update / Delete / ConditionCheck: every condition is checked before anything is written
+        """
+        with self.lock:
+            self.calls['TransactWriteItems'] = self.calls.get('TransactWriteItems', 0) + 1
+        self.behavior.apply('TransactWriteItems')
+
+        operations = []
+        for transact_item in TransactItems:
+            (action, params), = transact_item.items()
+            operations.append((action, params, self.Table(params['TableName'])))
+
+        # Lock every table involved (in name order, so concurrent transactions can't deadlock)
+        tables = sorted({table.name: table for _, _, table in operations}.items())
+        for _, table in tables:
+            table.lock.acquire()
+        try:
+            reasons = []
+            staged = []
+            for action, params, table in operations:
+                key = params['Item'] if action == 'Put' else params['Key']
+                partition, sort = table.key_of(key)
+                stored = table.partitions.get(partition, {}).get(sort)
+                try:
+                    table.check_condition(stored, params.get('ConditionExpression'),
+                                          params.get('ExpressionAttributeNames'),
+                                          params.get('ExpressionAttributeValues'), 'TransactWriteItems')
+                    reasons.append({'Code': 'None'})
+                except ClientError:
+                    reasons.append({'Code': 'ConditionalCheckFailed', 'Message': 'The conditional request failed'})
+                staged.append((action, params, table, partition, sort, stored))
+
+            if any(reason['Code'] != 'None' for reason in reasons):
+                error = client_error('TransactionCanceledException', 'Transaction cancelled, please refer '
+                                     'cancellation reasons for specific reasons', 'TransactWriteItems')
+                error.response['CancellationReasons'] = reasons
+                raise error
+
+            for action, params, table, partition, sort, stored in staged:
+                if action == 'Put':
+                    table.partitions.setdefault(partition, {})[sort] = table.to_storage(params['Item'])
+                elif action == 'Update':
+                    item = table.from_storage(stored) if stored else dict(params['Key'])
+                    context = ExpressionContext(params.get('ExpressionAttributeNames'),
+                                                params.get('ExpressionAttributeValues'))
+                    apply_update(item, params['UpdateExpression'], context)
+                    table.partitions.setdefault(partition, {})[sort] = table.to_storage(item)
+                elif action == 'Delete':
+                    table.partitions.get(partition, {}).pop(sort, None)
+        finally:
+            for _, table in tables:
+                table.lock.release()
+        return {}
+
+    def Table(self, name):
+        with self.lock:
+            if name not in self.tables:
+                raise ValueError(f'Stand-in has no schema for table {name}; add it to TABLE_SCHEMAS')
+            return self.tables[name]
+
+
+# ---------------------------------------------------------------------------
+# S3
+# ---------------------------------------------------------------------------
+
+class StandInBody:
+    """
+    Minimal botocore StreamingBody
+    """
+
+    def __init__(self, data):
+        self.stream = io.BytesIO(data)
+
+    def read(self, amount=None):
+        return self.stream.read(amount)
+
+    def iter_chunks(self, chunk_size=1024):
+        while True:
+            chunk = self.stream.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def close(self):
+        self.stream.close()
+
+
+class StandInPaginator:
+    def __init__(self, operation, token_param, token_field):
+        self.operation = operation
+        self.token_param = token_param
+        self.token_field = token_field
+
+    def paginate(self, **kwargs):
+        while True:
+            page = self.operation(**kwargs)
+            yield page
+            token = page.get(self.token_field)
+            if not token:
+                break
+            kwargs[self.token_param] = token
+
+
+class StandInS3(StandInService):
+    """
+    In-memory S3 client: objects, multipart uploads and presigned URL generation
+    """
+
+    def __init__(self, behavior=None):
+        super().__init__(behavior)
+        self.objects = {}
+        self.uploads = {}
+
+    def put_object(self, Bucket, Key, Body=b'', ContentType='binary/octet-stream', **kwargs):
+        self.call('PutObject')
+        data = Body if isinstance(Body, bytes) else Body.read() if hasattr(Body, 'read') else str(Body).encode('utf-8')
+        etag = f'"{uuid.uuid4().hex}"'
+        with self.lock:
+            self.objects[(Bucket, Key)] = {
+                'data': data,
+                'content_type': ContentType,
+                'last_modified': datetime.now(timezone.utc),
+                'etag': etag
+            }
+        return {'ETag': etag}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self.call('GetObject')
+        obj = self.find(Bucket, Key, 'GetObject')
+        return {
+            'Body': StandInBody(obj['data']),
+            'ContentLength': len(obj['data']),
+            'ContentType': obj['content_type'],
+            'LastModified': obj['last_modified']
+        }
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self.call('HeadObject')
+        obj = self.find(Bucket, Key, 'HeadObject')
+        return {
+            'ContentLength': len(obj['data']),
+            'ContentType': obj['content_type'],
+            'LastModified': obj['last_modified']
+        }
+
+    def list_objects_v2(self, Bucket, Prefix='', MaxKeys=1000, ContinuationToken=None, **kwargs):
+        self.call('ListObjectsV2')
+        with self.lock:
+            keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        if ContinuationToken:
+            keys = [key for key in keys if key > ContinuationToken]
+        page = keys[:MaxKeys]
+        response = {
+            'KeyCount': len(page),
+            'Contents': [
+                {
+                    'Key': key,
+                    'Size': len(self.objects[(Bucket, key)]['data']),
+                    'LastModified': self.objects[(Bucket, key)]['last_modified'],
+                    'ETag': self.objects[(Bucket, key)].get('etag', '""')
+                }
+                for key in page
+            ]
+        }
+        if len(keys) > MaxKeys:
+            response['NextContinuationToken'] = page[-1]
+        return response
+
+    def create_multipart_upload(self, Bucket, Key, ContentType='binary/octet-stream', **kwargs):
+        self.call('CreateMultipartUpload')
+        upload_id = uuid.uuid4().hex
+        with self.lock:
+            self.uploads[upload_id] = {'bucket': Bucket, 'key': Key, 'content_type': ContentType, 'parts': {}}
+        return {'UploadId': upload_id, 'Bucket': Bucket, 'Key': Key}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body=b'', **kwargs):
+        """
+        Stand-in for a client PUT to a presigned part URL
+        """
+        self.call('UploadPart')
+        etag = f'"{uuid.uuid4().hex}"'
+        with self.lock:
+            self.upload(UploadId, 'UploadPart')['parts'][PartNumber] = {'data': Body, 'etag': etag}
+        return {'ETag': etag}
+
+    def list_parts(self, Bucket, Key, UploadId, PartNumberMarker=0, MaxParts=1000, **kwargs):
+        self.call('ListParts')
+        with self.lock:
+            parts = sorted(self.upload(UploadId, 'ListParts')['parts'].items())
+        parts = [(number, part) for number, part in parts if number > int(PartNumberMarker)]
+        page = parts[:MaxParts]
+        response = {
+            'Parts': [{'PartNumber': number, 'ETag': part['etag'], 'Size': len(part['data'])} for number, part in page]
+        }
+        if len(parts) > MaxParts:
+            response['IsTruncated'] = True
+            response['NextPartNumberMarker'] = page[-1][0]
+        return response
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        self.call('CompleteMultipartUpload')
+        with self.lock:
+            upload = self.uploads.pop(UploadId, None)
+            if upload is None:
+                raise client_error('NoSuchUpload', 'The specified upload does not exist', 'CompleteMultipartUpload')
+            data = b''.join(upload['parts'][part['PartNumber']]['data'] for part in MultipartUpload['Parts'])
+            self.objects[(Bucket, Key)] = {
+                'data': data,
+                'content_type': upload['content_type'],
+                'last_modified': datetime.now(timezone.utc)
+            }
+        return {'Bucket': Bucket, 'Key': Key}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        self.call('AbortMultipartUpload')
+        with self.lock:
+            self.uploads.pop(UploadId, None)
+        return {}
+
+    def get_paginator(self, operation_name):
+        if operation_name == 'list_parts':
+            return StandInPaginator(self.list_parts, 'PartNumberMarker', 'NextPartNumberMarker')
+        if operation_name == 'list_objects_v2':
+            return StandInPaginator(self.list_objects_v2, 'ContinuationToken', 'NextContinuationToken')
+        raise ValueError(f'Stand-in has no paginator for {operation_name}')
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600, **kwargs):
+        params = Params or {}
+        query = urllib.parse.urlencode({'X-Amz-Expires': ExpiresIn, 'X-Amz-Signature': 'standin'})
+        return f"https://{params.get('Bucket')}.s3.{REGION}.amazonaws.com/{params.get('Key')}?{query}"
+
+    def generate_presigned_post(self, Bucket, Key, Fields=None, Conditions=None, ExpiresIn=3600, **kwargs):
+        fields = dict(Fields or {}, key=Key, policy='standin', **{'x-amz-signature': 'standin'})
+        return {'url': f'https://{Bucket}.s3.{REGION}.amazonaws.com/', 'fields': fields}
+
+    def find(self, bucket, key, operation_name):
+        with self.lock:
+            obj = self.objects.get((bucket, key))
+        if obj is None:
+            raise client_error('NoSuchKey', 'The specified key does not exist.', operation_name)
+        return obj
+
+    def upload(self, upload_id, operation_name):
+        upload = self.uploads.get(upload_id)
+        if upload is None:
+            raise client_error('NoSuchUpload', 'The specified upload does not exist', operation_name)
+        return upload
+
+
+# ---------------------------------------------------------------------------
+# Textract, Bedrock, Secrets Manager
+# ---------------------------------------------------------------------------
+
+class StandInTextract(StandInService):
+    """
+    Returns LINE blocks for a canned prescription (or custom lines per S3 key)
+    """
+
+    def __init__(self, behavior=None, lines=None):
+        super().__init__(behavior)
+        self.lines = lines or SAMPLE_PRESCRIPTION_LINES
+        self.lines_by_key = {}
+
+    def analyze_document(self, Document, FeatureTypes=None, **kwargs):
+        self.call('AnalyzeDocument')
+        key = Document.get('S3Object', {}).get('Name')
+        lines = self.lines_by_key.get(key, self.lines)
+        return {
+            'Blocks': [{'BlockType': 'PAGE'}] + [{'BlockType': 'LINE', 'Text': line} for line in lines]
+        }
+
+
+class StandInBedrockRuntime(StandInService):
+    """
+    Returns Nova-shaped responses; latency can scale with output tokens and uncached input tokens
+    Emulates prompt caching: a cachePoint block caches the prompt prefix before it (per model), and a
+    later request whose prefix up to one of its cache points matches reads those tokens from the cache
+    """
+
+    def __init__(self, behavior=None, reply='Thanks for your question. Please consult your healthcare provider.',
+                 per_token_ms=0.0, model_behaviors=None, per_input_token_ms=0.0):
+        super().__init__(behavior)
+        self.reply = reply
+        self.per_token_ms = per_token_ms
+        self.per_input_token_ms = per_input_token_ms
+        # Extra latency/errors for specific model IDs, applied after the service-wide behavior
+        self.model_behaviors = model_behaviors or {}
+        self.requests = []
+        # (modelId, prefix digest) -> expiry (monotonic seconds)
+        self.prompt_cache = {}
+
+    def invoke_model(self, modelId, body, contentType='application/json', accept='application/json', **kwargs):
+        self.call('InvokeModel')
+        if modelId in self.model_behaviors:
+            self.model_behaviors[modelId].apply('InvokeModel')
+        request = json.loads(body)
+
+        prompt_tokens = estimate_tokens(strip_cache_points(request))
+        cache_read, cache_write = self.use_prompt_cache(modelId, request)
+        cache_read, cache_write = min(cache_read, prompt_tokens), min(cache_write, prompt_tokens - cache_read)
+        input_tokens = prompt_tokens - cache_read - cache_write
+        output_tokens = estimate_tokens(self.reply)
+        delay_ms = output_tokens * self.per_token_ms + self.per_input_token_ms * (
+            input_tokens + cache_write + cache_read * PROMPT_CACHE_READ_LATENCY_FACTOR)
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+
+        usage = {'inputTokens': input_tokens, 'outputTokens': output_tokens,
+                 'totalTokens': prompt_tokens + output_tokens}
+        if cache_read or cache_write:
+            usage.update({'cacheReadInputTokenCount': cache_read, 'cacheWriteInputTokenCount': cache_write})
+        with self.lock:
+            self.requests.append({'modelId': modelId, 'body': request, 'usage': usage})
+
+        response = {
+            'output': {'message': {'role': 'assistant', 'content': [{'text': self.reply}]}},
+            'stopReason': 'end_turn',
+            'usage': usage
+        }
+        return {
+            'body': StandInBody(json.dumps(response).encode('utf-8')),
+            'contentType': 'application/json',
+            'ResponseMetadata': {'HTTPHeaders': {
+                'x-amzn-bedrock-input-token-count': str(input_tokens),
+                'x-amzn-bedrock-output-token-count': str(output_tokens)
+            }}
+        }
+
+    def use_prompt_cache(self, model_id, request):
+        """
+        Look up and store the request's cache point prefixes; returns (cache read tokens, cache write tokens)
+        Prefixes are compared by content (cache point markers are not prompt tokens)
+        """
+        checkpoints = []
+        digest = hashlib.sha256()
+        tokens = 0
+        blocks = [('system', block) for block in request.get('system', [])]
+        blocks += [(message.get('role'), block) for message in request.get('messages', [])
+                   for block in message.get('content', [])]
+        for role, block in blocks:
+            if 'cachePoint' in block:
+                if tokens >= PROMPT_CACHE_MIN_TOKENS:
+                    checkpoints.append(((model_id, digest.hexdigest()), tokens))
+                continue
+            encoded = json.dumps([role, block], sort_keys=True)
+            digest.update(encoded.encode('utf-8'))
+            tokens += estimate_tokens(encoded)
+
+        now = time.monotonic()
+        cache_read = 0
+        with self.lock:
+            for key, prefix_tokens in checkpoints:
+                if self.prompt_cache.get(key, 0) > now:
+                    cache_read = max(cache_read, prefix_tokens)
+            written = 0
+            for key, prefix_tokens in checkpoints:
+                self.prompt_cache[key] = now + PROMPT_CACHE_TTL_SECONDS
+                written = max(written, prefix_tokens)
+        return cache_read, max(0, written - cache_read)
+
+
+def strip_cache_points(request):
+    """
+    The request without cachePoint blocks (for token counts comparable with and without caching)
+    """
+    stripped = dict(request)
+    if 'system' in request:
+        stripped['system'] = [block for block in request['system'] if 'cachePoint' not in block]
+    stripped['messages'] = [
+        dict(message, content=[block for block in message.get('content', []) if 'cachePoint' not in block])
+        for message in request.get('messages', [])
+    ]
+    return stripped
+
+
+def estimate_tokens(payload):
+    """
+    Rough token estimate (~4 characters per token)
+    """
+    text = payload if isinstance(payload, str) else json.dumps(payload)
+    return max(1, len(text) // 4)
+
+
+class StandInSecretsManager(StandInService):
+    def __init__(self, behavior=None, secrets=None):
+        super().__init__(behavior)
+        self.secrets = secrets if secrets is not None else {'beaumed/yelp-api-key': 'standin-yelp-key'}
+
+    def get_secret_value(self, SecretId, **kwargs):
+        self.call('GetSecretValue')
+        if SecretId not in self.secrets:
+            raise client_error('ResourceNotFoundException', 'Secrets Manager can\'t find the specified secret.',
+                               'GetSecretValue')
+        return {'Name': SecretId, 'SecretString': self.secrets[SecretId]}
+
+
+class StandInLambda(StandInService):
+    """
+    Lambda Invoke against handlers registered by function name
+    'Event' invocations run on a background thread, like Lambda's asynchronous invocation; wait() joins them
+    """
+
+    def __init__(self, behavior=None):
+        super().__init__(behavior)
+        self.functions = {}
+        self.pending = []
+
+    def register(self, function_name, handler):
+        self.functions[function_name] = handler
+
+    def invoke(self, FunctionName, InvocationType='RequestResponse', Payload=b'{}', **kwargs):
+        self.call('Invoke')
+        handler = self.functions.get(FunctionName)
+        if handler is None:
+            raise client_error('ResourceNotFoundException', f'Function not found: {FunctionName}', 'Invoke')
+        event = json.loads(Payload)
+
+        if InvocationType == 'Event':
+            thread = threading.Thread(target=handler, args=(event, None), daemon=True)
+            with self.lock:
+                self.pending.append(thread)
+            thread.start()
+            return {'StatusCode': 202}
+
+        result = handler(event, None)
+        return {'StatusCode': 200, 'Payload': StandInBody(json.dumps(result).encode('utf-8'))}
+
+    def wait(self):
+        """
+        Join every asynchronous invocation started so far
+        """
+        while True:
+            with self.lock:
+                if not self.pending:
+                    return
+                thread = self.pending.pop()
+            thread.join()
+
+
+# ---------------------------------------------------------------------------
+# HTTP endpoints reached through urllib: Cognito JWKS and Yelp
+# ---------------------------------------------------------------------------
+
+class StandInCognito:
+    """
+    Local RSA key pair standing in for the Cognito user pool: serves JWKS and issues ID tokens
+    """
+
+    def __init__(self, behavior=None):
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        self.behavior = behavior or ServiceBehavior()
+        self.kid = 'standin-key-1'
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.private_pem = private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+        numbers = private_key.public_key().public_numbers()
+        self.jwks = {'keys': [{
+            'kid': self.kid,
+            'kty': 'RSA',
+            'alg': 'RS256',
+            'use': 'sig',
+            'n': base64url_uint(numbers.n),
+            'e': base64url_uint(numbers.e)
+        }]}
+
+    def issue_token(self, sub, email='user@example.com', name='Test User', expires_in=3600):
+        from jose import jwt
+
+        now = int(time.time())
+        claims = {
+            'sub': sub,
+            'email': email,
+            'name': name,
+            'iss': COGNITO_POOL_URL,
+            'token_use': 'id',
+            'iat': now,
+            'exp': now + expires_in
+        }
+        return jwt.encode(claims, self.private_pem, algorithm='RS256', headers={'kid': self.kid})
+
+
+def base64url_uint(value):
+    raw = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+class StandInYelp:
+    """
+    Yelp business search responses
+    """
+
+    def __init__(self, behavior=None, result_count=10):
+        self.behavior = behavior or ServiceBehavior()
+        self.result_count = result_count
+
+    def search(self, params):
+        location = params.get('location', ['Unknown'])[0]
+        return {'businesses': [
+            {
+                'id': f'yelp-{index}',
+                'name': f'Dr. Standin {index}, MD',
+                'phone': f'+1555000{index:04d}',
+                'location': {'display_address': [f'{index} Clinic Way', location]},
+                'rating': 3.5 + (index % 4) * 0.5,
+                'url': f'https://example.com/doctor/{index}',
+                'coordinates': {'latitude': 37.0 + index / 100, 'longitude': -122.0 - index / 100}
+            }
+            for index in range(self.result_count)
+        ]}
+
+
+class StandInHTTPHandler(urllib.request.BaseHandler):
+    """
+    urllib handler answering Cognito JWKS and Yelp requests in-process
+    Any other HTTPS host raises, so the harness never reaches the network
+    """
+
+    handler_order = 100  # Ahead of the default HTTPSHandler
+
+    def __init__(self, cognito, yelp):
+        self.cognito = cognito
+        self.yelp = yelp
+
+    def https_open(self, request):
+        url = urllib.parse.urlsplit(request.full_url)
+
+        if url.hostname == 'cognito-idp.us-west-1.amazonaws.com' and url.path.endswith('/.well-known/jwks.json'):
+            if self.cognito is None:
+                raise urllib.error.URLError('Cognito stand-in not configured')
+            self.cognito.behavior.apply('GetJwks')
+            return http_response(request.full_url, self.cognito.jwks)
+
+        if url.hostname == 'api.yelp.com':
+            self.yelp.behavior.apply('SearchBusinesses')
+            return http_response(request.full_url, self.yelp.search(urllib.parse.parse_qs(url.query)))
+
+        raise urllib.error.URLError(f'Stand-in blocked request to {url.hostname}')
+
+
+def http_response(url, payload):
+    headers = email.message.Message()
+    headers['Content-Type'] = 'application/json'
+    response = urllib.response.addinfourl(io.BytesIO(json.dumps(payload).encode('utf-8')), headers, url, 200)
+    response.msg = 'OK'
+    return response
+
+
+# ---------------------------------------------------------------------------
+# Installation
+# ---------------------------------------------------------------------------
+
+class StandInSession:
+    """
+    boto3 Session stand-in returning static credentials (used by the presigner's local signer)
+    and the stand-in services for clients built with a custom config
+    """
+
+    class Credentials:
+        def get_frozen_credentials(self):
+            return FrozenCredentials('AKIDSTANDIN', 'standin-secret', None)
+
+    def __init__(self, services=None):
+        self.services = services or {}
+
+    def get_credentials(self):
+        return self.Credentials()
+
+    def client(self, service_name, region_name=None, config=None):
+        return self.services[service_name]
+
+
+class AwsStandIn:
+    """
+    Handle to an installed set of stand-ins
+    """
+
+    def __init__(self, behaviors=None, with_cognito=True):
+        behaviors = behaviors or {}
+        self.dynamodb = StandInDynamoDB(behaviors.get('dynamodb'))
+        self.s3 = StandInS3(behaviors.get('s3'))
+        self.textract = StandInTextract(behaviors.get('textract'))
+        self.bedrock = StandInBedrockRuntime(behaviors.get('bedrock'))
+        self.secrets_manager = StandInSecretsManager(behaviors.get('secretsmanager'))
+        self.lambda_ = StandInLambda(behaviors.get('lambda'))
+        self.cognito = StandInCognito(behaviors.get('cognito')) if with_cognito else None
+        self.yelp = StandInYelp(behaviors.get('yelp'))
+        self.previous_registry = None
+
+    def install(self):
+        """
+        Put the stand-ins into the aws_clients registry and route urllib to them
+        """
+        self.previous_registry = (aws_clients.session, dict(aws_clients.clients), dict(aws_clients.resources))
+        services = {
+            's3': self.s3,
+            'textract': self.textract,
+            'bedrock-runtime': self.bedrock,
+            'secretsmanager': self.secrets_manager,
+            'lambda': self.lambda_
+        }
+        aws_clients.session = StandInSession(services)
+        # Drop clients built before install (e.g. with a custom config) so they resolve to stand-ins
+        aws_clients.clients.clear()
+        aws_clients.clients.update({(service, REGION): client for service, client in services.items()})
+        aws_clients.resources[('dynamodb', REGION)] = self.dynamodb
+        urllib.request.install_opener(urllib.request.build_opener(StandInHTTPHandler(self.cognito, self.yelp)))
+        return self
+
+    def uninstall(self):
+        session, clients, resources = self.previous_registry
+        aws_clients.session = session
+        aws_clients.clients.clear()
+        aws_clients.clients.update(clients)
+        aws_clients.resources.clear()
+        aws_clients.resources.update(resources)
+        urllib.request.install_opener(None)
+
+    def table(self, name):
+        return self.dynamodb.Table(name)
+
+
+def install(behaviors=None, with_cognito=True):
+    """
+    Create and install stand-ins for every service
+    behaviors: {'dynamodb' | 's3' | 'textract' | 'bedrock' | 'secretsmanager' | 'lambda' | 'cognito' | 'yelp': ServiceBehavior}
+    """
+    return AwsStandIn(behaviors, with_cognito).install()
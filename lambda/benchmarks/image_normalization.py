@@ -0,0 +1,113 @@
+"""
+Benchmark: prescription image normalization
+Purpose: Measure bytes saved and latency of the prescription-analyzer OCR preprocessing stage
+Usage: python lambda/benchmarks/image_normalization.py [image paths...] [--textract]
+  - With no paths, synthetic phone-camera sized images are generated
+  - --textract also times Textract on the original vs normalized bytes (needs AWS credentials)
+"""
+
+import argparse
+import importlib.util
+import io
+import os
+import random
+import statistics
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, LAMBDA_DIR)  # Shared modules (aws_clients) live next to the handlers
+
+
+def load_analyzer():
+    """
+    Import prescription-analyzer.py (hyphenated file name, so not importable directly)
+    """
+    path = os.path.join(LAMBDA_DIR, 'prescription-analyzer.py')
+    spec = importlib.util.spec_from_file_location('prescription_analyzer', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_images():
+    """
+    Generate colour photos of a printed label at common phone resolutions
+    """
+    rng = random.Random(42)
+    samples = []
+    for width, height, fmt in [(4032, 3024, 'JPEG'), (3024, 4032, 'PNG'), (4000, 3000, 'WEBP')]:
+        image = Image.new('RGB', (width, height), (235, 228, 210))
+        draw = ImageDraw.Draw(image)
+        for line in range(40):
+            y = 200 + line * 80
+            draw.text((200, y), f'Metformin 500mg take twice daily #{rng.randint(0, 9999)}', fill=(20, 20, 20))
+        for _ in range(2000):
+            x, y = rng.randrange(width), rng.randrange(height)
+            draw.point((x, y), fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+
+        output = io.BytesIO()
+        image.save(output, format=fmt, quality=92)
+        samples.append((f'synthetic-{width}x{height}.{fmt.lower()}', output.getvalue()))
+    return samples
+
+
+def time_textract(analyzer, image_bytes):
+    """
+    Time one synchronous Textract call on raw bytes
+    """
+    start = time.perf_counter()
+    analyzer.textract.analyze_document(Document={'Bytes': image_bytes}, FeatureTypes=['FORMS', 'TABLES'])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('images', nargs='*', help='Sample image files')
+    parser.add_argument('--repeat', type=int, default=5, help='Normalization runs per image')
+    parser.add_argument('--textract', action='store_true', help='Also time Textract on both versions')
+    args = parser.parse_args()
+
+    analyzer = load_analyzer()
+
+    if args.images:
+        samples = []
+        for path in args.images:
+            with open(path, 'rb') as f:
+                samples.append((os.path.basename(path), f.read()))
+    else:
+        samples = synthetic_images()
+
+    total_original = 0
+    total_normalized = 0
+
+    print(f"{'image':<32} {'original':>10} {'normalized':>11} {'saved':>7} {'median ms':>10}")
+    for name, original in samples:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            normalized = analyzer.normalize_image(original)
+            timings.append(time.perf_counter() - start)
+
+        total_original += len(original)
+        total_normalized += len(normalized)
+        saved = 1 - len(normalized) / len(original)
+        print(f"{name:<32} {len(original):>10} {len(normalized):>11} {saved:>6.1%} {statistics.median(timings) * 1000:>10.1f}")
+
+        if args.textract:
+            # Textract rejects WebP, so compare against whatever the original format allows
+            try:
+                original_latency = f'{time_textract(analyzer, original) * 1000:.0f} ms'
+            except Exception as e:
+                original_latency = f'failed ({type(e).__name__})'
+            normalized_latency = time_textract(analyzer, normalized) * 1000
+            print(f"  textract: original {original_latency}, normalized {normalized_latency:.0f} ms "
+                  f"(+{statistics.median(timings) * 1000:.0f} ms preprocessing)")
+
+    print(f"\nTotal: {total_original} -> {total_normalized} bytes ({1 - total_normalized / total_original:.1%} saved)")
+
+
+if __name__ == '__main__':
+    main()
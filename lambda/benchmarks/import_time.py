@@ -0,0 +1,114 @@
+"""
+Benchmark: Lambda import-time budget
+Purpose: Report the cold-start init (module import) cost of every handler and fail when one exceeds its budget
+Usage: python lambda/benchmarks/import_time.py [--repeat N] [--budget-ms MS] [--verbose]
+  - Each handler is imported in a fresh interpreter, like a new Lambda container
+  - Exits non-zero if any handler's median import time is over budget (use as a CI check)
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HANDLERS = [
+    'api-router.py',
+    'bedrock-chat-handler.py',
+    'cognito-jwt-authorizer.py',
+    'conversation-archiver.py',
+    'conversation-history.py',
+    'doctor-finder.py',
+    'dose-tracker.py',
+    'medication-scheduler.py',
+    'prescription-analyzer.py',
+    'record-exporter.py',
+    's3-presigner.py'
+]
+
+# Default per-handler import budget; handlers should only import the standard library at init
+DEFAULT_BUDGET_MS = 100
+BUDGET_OVERRIDES_MS = {}
+
+IMPORT_SCRIPT = '''
+import importlib.util, sys, time
+sys.path.insert(0, {lambda_dir!r})
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location('handler', {path!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print(time.perf_counter() - start)
+'''
+
+
+def measure_import(handler):
+    """
+    Import one handler in a fresh interpreter
+    Returns: (seconds, stderr from -X importtime)
+    """
+    path = os.path.join(LAMBDA_DIR, handler)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', IMPORT_SCRIPT.format(lambda_dir=LAMBDA_DIR, path=path)],
+        capture_output=True,
+        text=True,
+        cwd=LAMBDA_DIR
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'{handler} failed to import:\n{result.stderr[-2000:]}')
+    return float(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def top_level_imports(importtime_output, count=5):
+    """
+    Parse -X importtime output into the most expensive top-level imports
+    Returns: [(cumulative_ms, module_name), ...]
+    """
+    imports = []
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace('import time:', '|', 1).split('|')]
+        # Top-level modules have no indentation in the name column
+        if not line.rsplit('|', 1)[1].startswith('  '):
+            imports.append((int(cumulative_us) / 1000, name))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh-interpreter imports per handler')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS, help='Default import budget')
+    parser.add_argument('--verbose', action='store_true', help='Show the most expensive imports per handler')
+    args = parser.parse_args()
+
+    over_budget = []
+
+    print(f"{'handler':<28} {'median ms':>10} {'max ms':>8} {'budget ms':>10}")
+    for handler in HANDLERS:
+        timings = []
+        importtime_output = ''
+        for _ in range(args.repeat):
+            seconds, importtime_output = measure_import(handler)
+            timings.append(seconds * 1000)
+
+        median_ms = statistics.median(timings)
+        budget_ms = BUDGET_OVERRIDES_MS.get(handler, args.budget_ms)
+        status = 'OVER' if median_ms > budget_ms else 'ok'
+        print(f"{handler:<28} {median_ms:>10.1f} {max(timings):>8.1f} {budget_ms:>10.0f}  {status}")
+
+        if args.verbose or median_ms > budget_ms:
+            for cumulative_ms, name in top_level_imports(importtime_output):
+                print(f"    {cumulative_ms:>8.1f} ms  {name}")
+
+        if median_ms > budget_ms:
+            over_budget.append(handler)
+
+    if over_budget:
+        print(f"\nImport budget exceeded: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+"""
+Benchmark: end-to-end load test against the local AWS stand-in
+Purpose: Replay synthetic user sessions through every lambda_handler and report latency and throughput per route
+Usage: python lambda/benchmarks/load_test.py [--users N] [--sessions N] [--concurrency N]
+                                              [--latency service=ms[:jitter]] [--error-rate service=rate]
+                                              [--no-latency] [--router] [--json results.json]
+  - Services: dynamodb, s3, textract, bedrock, secretsmanager, lambda, cognito, yelp
+  - Responses are JSON-serialized like the Lambda runtime does; failures count as errors and 429s
+    (rate-limited) are counted separately
+  - Chat admission limits default to BENCHMARK_CHAT_LIMIT_PER_MINUTE, far above what synthetic sessions
+    send; export CHAT_USER_LIMIT_PER_MINUTE / CHAT_GLOBAL_LIMIT_PER_MINUTE to load-test the limits themselves
+  - --router sends every API route through the single api-router entry point instead of per-route handlers
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, LAMBDA_DIR)
+
+import aws_standin  # noqa: E402 (needs LAMBDA_DIR on sys.path)
+from aws_standin import ServiceBehavior  # noqa: E402
+
+# Typical in-region latencies (ms) used unless overridden
+DEFAULT_LATENCY_MS = {
+    'dynamodb': 5,
+    's3': 10,
+    'textract': 300,
+    'bedrock': 400,
+    'secretsmanager': 20,
+    'lambda': 20,
+    'cognito': 50,
+    'yelp': 150
+}
+
+CHAT_MESSAGES = [
+    'thanks!',
+    'What are the common side effects of metformin?',
+    'Can I take ibuprofen with lisinopril?',
+    'I have had a mild headache for two days, should I be worried?',
+    'How should I store insulin when travelling?'
+]
+
+MEDICATIONS = [
+    {'name': 'Metformin', 'dosage': '500mg', 'frequency': 'twice daily', 'reminders': ['08:00', '20:00']},
+    {'name': 'Lisinopril', 'dosage': '10mg', 'frequency': 'once daily', 'reminders': ['09:00']},
+    {'name': 'Atorvastatin', 'dosage': '20mg', 'frequency': 'once daily at night', 'reminders': ['21:00']}
+]
+
+
+# Chat admission limit unless set in the environment (sessions replay turns back to back, far above real users)
+BENCHMARK_CHAT_LIMIT_PER_MINUTE = 1000000
+
+# Export job polling (the stand-in runs the job on a background thread)
+EXPORT_POLL_SECONDS = 0.05
+EXPORT_MAX_POLLS = 200
+
+
+def load_handler(file_name):
+    """
+    Import a handler file (hyphenated names are not importable directly)
+    """
+    path = os.path.join(LAMBDA_DIR, file_name)
+    spec = importlib.util.spec_from_file_location(file_name.replace('-', '_')[:-3], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def api_event(user_id, path, method='POST', body=None, path_parameters=None, query_parameters=None):
+    """
+    API Gateway AWS_PROXY event with Cognito claims
+    """
+    return {
+        'httpMethod': method,
+        'path': path,
+        'headers': {'Content-Type': 'application/json'},
+        'queryStringParameters': query_parameters,
+        'body': json.dumps(body) if body is not None else None,
+        'isBase64Encoded': False,
+        'pathParameters': path_parameters,  # API Gateway sends null when the route has none
+        'requestContext': {'authorizer': {'claims': {'sub': user_id}}}
+    }
+
+
+class Recorder:
+    """
+    Thread-safe per-route latency and error collection
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.limited = {}
+
+    def call(self, route, handler, event):
+        start = time.perf_counter()
+        try:
+            response = handler(event, None)
+            # The Lambda runtime serializes the return value; unserializable responses fail in production
+            json.dumps(response)
+            limited = isinstance(response, dict) and response.get('statusCode') == 429
+            failed = is_error(response) and not limited
+            if isinstance(response, dict) and isinstance(response.get('body'), str):
+                # Hand the session the payload the client would see
+                response = json.loads(response['body'])
+        except Exception:
+            response = None
+            limited = False
+            failed = True
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self.lock:
+            self.latencies.setdefault(route, []).append(elapsed_ms)
+            if failed:
+                self.errors[route] = self.errors.get(route, 0) + 1
+            if limited:
+                self.limited[route] = self.limited.get(route, 0) + 1
+        return response
+
+    def record_error(self, route):
+        with self.lock:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+
+def is_error(response):
+    if not isinstance(response, dict):
+        return False
+    if 'error' in response:
+        return True
+    if response.get('statusCode', 200) >= 400:
+        return True
+    return response.get('policyDocument', {}).get('Statement', [{}])[0].get('Effect') == 'Deny'
+
+
+def run_session(handlers, standin, recorder, user_id, rng):
+    """
+    One synthetic user session touching every route
+    """
+    token = standin.cognito.issue_token(user_id)
+    recorder.call('authorize', handlers['authorizer'].lambda_handler, {
+        'authorizationToken': f'Bearer {token}',
+        'methodArn': 'arn:aws:execute-api:us-west-1:123456789012:api-id/dev/POST/chat'
+    })
+
+    medication_ids = []
+    for medication in rng.sample(MEDICATIONS, 2):
+        response = recorder.call('medications.create', handlers['medications'].lambda_handler,
+                                 api_event(user_id, '/medications', 'POST', medication))
+        if response and 'medicationId' in response:
+            medication_ids.append(response['medicationId'])
+
+    recorder.call('medications.list', handlers['medications'].lambda_handler,
+                  api_event(user_id, '/medications', 'GET'))
+
+    for message in rng.sample(CHAT_MESSAGES, 3):
+        recorder.call('chat', handlers['chat'].lambda_handler, api_event(user_id, '/chat', 'POST', {'message': message}))
+
+    # Scroll back through the conversation a page at a time, like the Assistant screen
+    cursor = None
+    for _ in range(2):
+        params = {'limit': '4', 'before': cursor} if cursor else {'limit': '4'}
+        response = recorder.call('history', handlers['history'].lambda_handler,
+                                 api_event(user_id, '/history', 'GET', query_parameters=params))
+        cursor = response.get('next_cursor') if isinstance(response, dict) else None
+        if not cursor:
+            break
+
+    response = recorder.call('presign', handlers['presigner'].lambda_handler, api_event(user_id, '/get-upload-url', 'POST', {
+        'file_name': 'prescription.pdf', 'content_type': 'application/pdf', 'file_type': 'document'
+    }))
+    s3_key = response.get('s3_key') if response else None
+    if s3_key:
+        # Simulate the client's direct upload to S3
+        standin.s3.objects[('beaumed-prescriptions', s3_key)] = {
+            'data': b'%PDF-1.4 stand-in', 'content_type': 'application/pdf',
+            'last_modified': aws_standin.datetime.now(aws_standin.timezone.utc)
+        }
+        recorder.call('prescription.analyze', handlers['analyzer'].lambda_handler,
+                      api_event(user_id, '/analyze-prescription', 'POST', {'s3_key': s3_key}))
+
+    for medication_id in medication_ids:
+        recorder.call('doses.log', handlers['doses'].lambda_handler, api_event(user_id, '/doses', 'POST', {
+            'medicationId': medication_id, 'status': rng.choice(['taken', 'taken', 'taken', 'skipped'])
+        }))
+    recorder.call('adherence', handlers['doses'].lambda_handler, api_event(user_id, '/adherence', 'GET'))
+
+    recorder.call('doctors.find', handlers['doctors'].lambda_handler,
+                  api_event(user_id, '/find-doctors', 'POST', {'location': 'San Francisco, CA', 'specialty': 'cardiology'}))
+    recorder.call('doctors.saved', handlers['doctors'].lambda_handler,
+                  api_event(user_id, '/doctors', 'GET', query_parameters={'specialty': 'cardiology', 'limit': '3'}))
+
+    if medication_ids:
+        recorder.call('medications.get', handlers['medications'].lambda_handler,
+                      api_event(user_id, f'/medications/{medication_ids[0]}', 'GET',
+                                path_parameters={'medicationId': medication_ids[0]}))
+        recorder.call('medications.update', handlers['medications'].lambda_handler,
+                      api_event(user_id, f'/medications/{medication_ids[0]}', 'PUT',
+                                {'dosage': '1000mg', 'active': True}, {'medicationId': medication_ids[0]}))
+        recorder.call('medications.delete', handlers['medications'].lambda_handler,
+                      api_event(user_id, f'/medications/{medication_ids[-1]}', 'DELETE',
+                                path_parameters={'medicationId': medication_ids[-1]}))
+
+    # Exports run as async jobs: start one, then poll for the download link like the client does
+    response = recorder.call('export.start', handlers['exporter'].lambda_handler, api_event(user_id, '/export', 'POST'))
+    job_id = response.get('job_id') if isinstance(response, dict) else None
+    status = None
+    for _ in range(EXPORT_MAX_POLLS if job_id else 0):
+        time.sleep(EXPORT_POLL_SECONDS)
+        response = recorder.call('export.poll', handlers['exporter'].lambda_handler,
+                                 api_event(user_id, '/export', 'GET', query_parameters={'job_id': job_id}))
+        status = response.get('status') if isinstance(response, dict) else None
+        if status in ('complete', 'failed'):
+            break
+    if status != 'complete':
+        recorder.record_error('export.poll')
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def parse_service_values(pairs, name):
+    values = {}
+    for pair in pairs or []:
+        service, _, value = pair.partition('=')
+        if service not in DEFAULT_LATENCY_MS or not value:
+            raise SystemExit(f'Invalid --{name} {pair!r}; services: {", ".join(DEFAULT_LATENCY_MS)}')
+        values[service] = value
+    return values
+
+
+def build_behaviors(args):
+    latencies = {service: (float(ms), 0.0) for service, ms in DEFAULT_LATENCY_MS.items()}
+    if args.no_latency:
+        latencies = {service: (0.0, 0.0) for service in DEFAULT_LATENCY_MS}
+    for service, value in parse_service_values(args.latency, 'latency').items():
+        ms, _, jitter = value.partition(':')
+        latencies[service] = (float(ms), float(jitter or 0))
+
+    error_rates = {service: float(rate) for service, rate in parse_service_values(args.error_rate, 'error-rate').items()}
+
+    return {
+        service: ServiceBehavior(latency_ms=ms, jitter_ms=jitter, error_rate=error_rates.get(service, 0.0))
+        for service, (ms, jitter) in latencies.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20, help='Distinct synthetic users')
+    parser.add_argument('--sessions', type=int, default=3, help='Sessions per user')
+    parser.add_argument('--concurrency', type=int, default=10, help='Concurrent sessions')
+    parser.add_argument('--latency', action='append', help='Override latency, e.g. bedrock=800:200')
+    parser.add_argument('--error-rate', action='append', help='Inject errors, e.g. dynamodb=0.01')
+    parser.add_argument('--no-latency', action='store_true', help='Zero simulated latency (pure handler CPU cost)')
+    parser.add_argument('--router', action='store_true', help='Route API traffic through api-router.py')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', help='Write per-route results to this file')
+    args = parser.parse_args()
+
+    # Read by the chat handler at import, so set before the handlers load
+    for name in ('CHAT_USER_LIMIT_PER_MINUTE', 'CHAT_GLOBAL_LIMIT_PER_MINUTE'):
+        os.environ.setdefault(name, str(BENCHMARK_CHAT_LIMIT_PER_MINUTE))
+
+    standin = aws_standin.install(build_behaviors(args))
+    handlers = {
+        'authorizer': load_handler('cognito-jwt-authorizer.py'),
+        'medications': load_handler('medication-scheduler.py'),
+        'chat': load_handler('bedrock-chat-handler.py'),
+        'presigner': load_handler('s3-presigner.py'),
+        'analyzer': load_handler('prescription-analyzer.py'),
+        'doctors': load_handler('doctor-finder.py'),
+        'doses': load_handler('dose-tracker.py'),
+        'exporter': load_handler('record-exporter.py'),
+        'history': load_handler('conversation-history.py')
+    }
+    export_function_name = handlers['exporter'].EXPORT_FUNCTION_NAME
+    if args.router:
+        router = load_handler('api-router.py')
+        for route in ('medications', 'chat', 'presigner', 'analyzer', 'doctors', 'doses', 'exporter', 'history'):
+            handlers[route] = router
+    # The exporter invokes itself for async jobs; behind the router that is the router function
+    standin.lambda_.register(export_function_name, handlers['exporter'].lambda_handler)
+
+    recorder = Recorder()
+    sessions = [(f'user-{user:04d}', random.Random(args.seed * 100003 + user * 31 + session))
+                for user in range(args.users) for session in range(args.sessions)]
+
+    # Handler logs (metrics lines, errors) would dominate the output; keep them out of the report
+    handler_output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(handler_output):
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            futures = [executor.submit(run_session, handlers, standin, recorder, user_id, rng)
+                       for user_id, rng in sessions]
+            for future in futures:
+                future.result()
+        standin.lambda_.wait()
+    wall_seconds = time.perf_counter() - start
+    standin.uninstall()
+
+    results = {}
+    total_requests = 0
+    print(f"{'route':<22} {'count':>6} {'errors':>7} {'limited':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    for route, latencies in sorted(recorder.latencies.items()):
+        latencies.sort()
+        total_requests += len(latencies)
+        results[route] = {
+            'count': len(latencies),
+            'errors': recorder.errors.get(route, 0),
+            'limited': recorder.limited.get(route, 0),
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'throughput_rps': round(len(latencies) / wall_seconds, 2)
+        }
+        row = results[route]
+        print(f"{route:<22} {row['count']:>6} {row['errors']:>7} {row['limited']:>8} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+              f"{row['p99_ms']:>8.1f} {row['throughput_rps']:>8.1f}")
+
+    print(f"\n{total_requests} requests in {wall_seconds:.2f}s ({total_requests / wall_seconds:.1f} req/s, "
+          f"{len(sessions)} sessions, concurrency {args.concurrency})")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'wall_seconds': wall_seconds, 'routes': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
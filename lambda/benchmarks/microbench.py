@@ -0,0 +1,339 @@
+"""
+Benchmark: micro-benchmarks for pure hot-path functions
+Purpose: Reproducible timings with tracked baselines; fails on statistically significant slowdowns
+Usage: python lambda/benchmarks/microbench.py [--save] [--case NAME ...] [--samples N] [--processes N]
+  - Samples are split across --processes fresh interpreters, each with its own fixed PYTHONHASHSEED, so
+    between-process variance (hash seed, memory layout) is in both the baseline and the check
+  - Compares against baselines.json (one-sided Mann-Whitney U test on the per-process medians: samples from
+    one process are correlated, so each process counts once)
+  - Exits non-zero when a case is significantly slower AND its median regressed beyond --min-slowdown
+  - --save records the current run as the new baseline (regenerate on the machine that runs the check)
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import load_test
+import aws_standin
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+# OCR text shaped like a Textract LINE dump of a pharmacy label
+PRESCRIPTION_TEXT = ' '.join([
+    'BAYVIEW COMMUNITY PHARMACY', '1200 Market Street, San Francisco, CA 94103', 'Tel (415) 555-0134',
+    'Rx# 4471829-03', 'Date Filled: 03/14/2025', 'Patient: JANE A DOE', 'DOB: 07/22/1961',
+    'Prescriber: Dr. Sarah Chen, MD', 'METFORMIN HCL 500 MG TABLET', 'Take 1 tablet by mouth twice daily with meals',
+    'Qty: 60', 'Refills: 3 remaining', 'LISINOPRIL 10MG TABLET', 'Take one tablet once daily in the morning',
+    'Qty: 30', 'ATORVASTATIN 20 mg', 'Take 1 tablet at bedtime', 'Do not take with grapefruit juice',
+    'Caution: may cause dizziness', 'Keep out of reach of children', 'Store at room temperature',
+    'NDC 00093-1048-01', 'Discard after: 03/14/2026'
+] * 2)
+
+LONG_ASSISTANT_REPLY = (
+    'Metformin is generally well tolerated, but common side effects include nausea, diarrhoea, stomach upset '
+    'and a metallic taste, especially when you first start or increase the dose. Taking it with meals usually '
+    'helps. Rarely it can cause lactic acidosis, so seek care urgently if you notice unusual muscle pain, '
+    'trouble breathing or severe fatigue. Please check with your healthcare provider before changing your dose.'
+)
+
+
+def proxy_event():
+    """
+    AWS_PROXY event of realistic size (headers, request context, claims)
+    """
+    headers = {
+        'Accept': 'application/json', 'Accept-Encoding': 'gzip, deflate, br', 'Accept-Language': 'en-US,en;q=0.9',
+        'Authorization': 'Bearer ' + 'x' * 900, 'CloudFront-Forwarded-Proto': 'https',
+        'CloudFront-Is-Mobile-Viewer': 'true', 'CloudFront-Viewer-Country': 'US', 'Content-Type': 'application/json',
+        'Host': 'dchf2ja7ti.execute-api.us-east-1.amazonaws.com', 'User-Agent': 'Expo/1017565 CFNetwork/1494 Darwin/23.4.0',
+        'Via': '2.0 0f1c4a.cloudfront.net (CloudFront)', 'X-Amz-Cf-Id': 'aB3dE5fG7hI9jK1lM3nO5pQ7rS9tU1vW3xY5zA==',
+        'X-Amzn-Trace-Id': 'Root=1-65f3c2a1-0123456789abcdef01234567', 'X-Forwarded-For': '203.0.113.42, 130.176.1.1',
+        'X-Forwarded-Port': '443', 'X-Forwarded-Proto': 'https'
+    }
+    return {
+        'resource': '/medications/{medicationId}',
+        'path': '/medications/med-1742000000000000',
+        'httpMethod': 'PUT',
+        'headers': headers,
+        'multiValueHeaders': {name: [value] for name, value in headers.items()},
+        'queryStringParameters': None,
+        'pathParameters': {'medicationId': 'med-1742000000000000'},
+        'stageVariables': None,
+        'requestContext': {
+            'resourcePath': '/medications/{medicationId}', 'httpMethod': 'PUT', 'stage': 'dev',
+            'requestId': 'c6af9ac6-7b61-11e6-9a41-93e8deadbeef', 'requestTimeEpoch': 1742000000000,
+            'identity': {'sourceIp': '203.0.113.42', 'userAgent': headers['User-Agent']},
+            'authorizer': {'claims': {
+                'sub': '8f3c2a1e-5b7d-4c9e-a1f2-3b4c5d6e7f80', 'email': 'jane@example.com', 'email_verified': 'true',
+                'name': 'Jane Doe', 'phone_number': '+14155550134', 'token_use': 'id',
+                'iss': aws_standin.COGNITO_POOL_URL, 'auth_time': '1742000000', 'exp': 'Sat Mar 15 01:33:20 UTC 2025'
+            }}
+        },
+        'body': json.dumps({'name': 'Metformin XR', 'dosage': '1000mg', 'frequency': 'once daily',
+                            'reminders': ['08:00'], 'active': True, 'notes': 'Take with breakfast'}),
+        'isBase64Encoded': False
+    }
+
+
+def integration_event():
+    """
+    AWS (non-proxy) integration event: dict body and flat authorizer context
+    """
+    return {
+        'httpMethod': 'POST',
+        'body': {'message': 'Can I take ibuprofen with lisinopril?'},
+        'requestContext': {'authorizer': {'principalId': '8f3c2a1e-5b7d-4c9e-a1f2-3b4c5d6e7f80',
+                                          'sub': '8f3c2a1e-5b7d-4c9e-a1f2-3b4c5d6e7f80', 'email': 'jane@example.com'}}
+    }
+
+
+def chat_history():
+    """
+    Ten stored turns, most recent first, as returned by the ConversationHistory query
+    """
+    history = []
+    for index in range(10):
+        role = 'assistant' if index % 2 == 0 else 'user'
+        content = LONG_ASSISTANT_REPLY if role == 'assistant' else 'What are the common side effects of metformin?'
+        history.append({'userId': 'u', 'timestamp': str(1742000000000 - index), 'role': role, 'content': content})
+    return history
+
+
+def build_cases():
+    """
+    Returns: {case name: zero-argument callable}
+    """
+    standin = aws_standin.install()
+    analyzer = load_test.load_handler('prescription-analyzer.py')
+    authorizer = load_test.load_handler('cognito-jwt-authorizer.py')
+    chat = load_test.load_handler('bedrock-chat-handler.py')
+    scheduler = load_test.load_handler('medication-scheduler.py')
+    import api_gateway
+    import drug_interactions
+
+    # Warm the JWKS cache through the stand-in so only validation is timed
+    token = standin.cognito.issue_token('8f3c2a1e-5b7d-4c9e-a1f2-3b4c5d6e7f80', email='jane@example.com')
+    authorizer.get_cognito_jwk_keys()
+
+    event_proxy = proxy_event()
+    event_integration = integration_event()
+    history = chat_history()
+    update_body = {'name': 'Metformin XR', 'dosage': '1000mg', 'frequency': 'once daily',
+                   'reminders': ['08:00', '20:00'], 'active': True}
+    # A prescription import of 3 medications checked against 20 active ones
+    imported_medications = [{'name': 'ADVIL 200 MG TABLET'}, {'name': 'Lisinopril 10mg'}, {'name': 'Metformin HCl ER'}]
+    active_medications = [{'medicationId': f'med-{index}', 'name': name} for index, name in enumerate(
+        ['Warfarin 5mg', 'Atorvastatin', 'Omeprazole', 'Vitamin D3', 'Levothyroxine 50 mcg'] * 4)]
+    drug_interactions.get_index()
+
+    def bedrock_request_assembly():
+        messages = chat.build_messages(history, 'Is it safe to drink alcohol with metformin?')
+        return chat.build_request_body(messages, 500, True)
+
+    return {
+        'parse_medications': lambda: analyzer.parse_medications(PRESCRIPTION_TEXT),
+        'validate_jwt': lambda: authorizer.validate_jwt(token),
+        'parse_event.proxy': lambda: (api_gateway.parse_body(event_proxy), api_gateway.get_user_id(event_proxy)),
+        'parse_event.integration': lambda: (api_gateway.parse_body(event_integration),
+                                            api_gateway.get_user_id(event_integration)),
+        'bedrock_request_assembly': bedrock_request_assembly,
+        'build_update_expression': lambda: scheduler.build_update_expression(update_body, 1742000000000),
+        'find_interactions': lambda: drug_interactions.find_interactions(imported_medications, active_medications)
+    }
+
+
+def measure(function, samples, target_seconds):
+    """
+    Per-call time samples (ns): loops are calibrated so each sample takes about target_seconds
+    """
+    loops = 1
+    while True:
+        elapsed = time_loops(function, loops)
+        if elapsed >= target_seconds / 5:
+            break
+        loops *= 2
+    loops = max(1, int(loops * target_seconds / max(elapsed, 1e-9)))
+
+    time_loops(function, loops)  # Warm-up
+    return [time_loops(function, loops) / loops * 1e9 for _ in range(samples)]
+
+
+def measure_in_processes(names, samples, processes, target_seconds):
+    """
+    Per-call time samples (ns) for each case, collected from `processes` worker interpreters run one
+    after another (worker i runs with PYTHONHASHSEED=i, so runs are comparable with each other)
+    Returns: {case name: [samples of each worker]}
+    """
+    results = {name: [] for name in names}
+    for worker in range(processes):
+        # Spread the samples evenly; earlier workers take the remainder
+        worker_samples = samples // processes + (1 if worker < samples % processes else 0)
+        if worker_samples == 0:
+            continue
+        command = [sys.executable, os.path.abspath(__file__), '--worker', '--samples', str(worker_samples),
+                   '--sample-time', str(target_seconds)]
+        for name in names:
+            command += ['--case', name]
+        output = subprocess.run(command, env=dict(os.environ, PYTHONHASHSEED=str(worker)), check=True,
+                                capture_output=True, text=True).stdout
+        for name, values in json.loads(output).items():
+            results[name].append(values)
+    return results
+
+
+def run_worker(names, samples, target_seconds):
+    """
+    Worker mode: measure the cases in this interpreter and print {case name: samples} as JSON
+    """
+    # Handlers log while the cases are built; keep stdout for the result
+    with contextlib.redirect_stdout(io.StringIO()):
+        cases = build_cases()
+        results = {name: measure(cases[name], samples, target_seconds) for name in names or list(cases)}
+    print(json.dumps(results))
+
+
+def time_loops(function, loops):
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        return time.perf_counter() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def mann_whitney_greater(current, baseline):
+    """
+    One-sided Mann-Whitney U test (normal approximation, tie-corrected)
+    Returns: p-value for "current samples are larger than baseline samples"
+    """
+    combined = sorted([(value, 0) for value in current] + [(value, 1) for value in baseline])
+    ranks = [0.0] * len(combined)
+    tie_term = 0
+    index = 0
+    while index < len(combined):
+        end = index
+        while end + 1 < len(combined) and combined[end + 1][0] == combined[index][0]:
+            end += 1
+        average_rank = (index + end) / 2 + 1
+        for position in range(index, end + 1):
+            ranks[position] = average_rank
+        tie_count = end - index + 1
+        tie_term += tie_count ** 3 - tie_count
+        index = end + 1
+
+    n1, n2 = len(current), len(baseline)
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    mean = n1 * n2 / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - mean - 0.5) / math.sqrt(variance)  # Continuity correction
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def load_baselines():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--case', action='append', help='Run only these cases')
+    parser.add_argument('--samples', type=int, default=60, help='Samples per case (across all processes)')
+    parser.add_argument('--processes', type=int, default=10, help='Worker interpreters to spread samples over')
+    parser.add_argument('--sample-time', type=float, default=0.05, help='Target seconds per sample')
+    parser.add_argument('--alpha', type=float, default=0.01, help='Significance level for regressions')
+    parser.add_argument('--min-slowdown', type=float, default=0.25,
+                        help='Ignore median regressions below this ratio (shared runners vary ~20%%)')
+    parser.add_argument('--save', action='store_true', help='Save this run as the baseline')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.case, args.samples, args.sample_time)
+        return
+
+    case_names = list(build_cases())
+    selected = args.case or case_names
+    unknown = [name for name in selected if name not in case_names]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+    baselines = load_baselines()
+    baseline_cases = baselines.get('cases', {})
+
+    results = {}
+    regressions = []
+
+    measured = measure_in_processes(selected, args.samples, max(1, args.processes), args.sample_time)
+
+    print(f"{'case':<28} {'median':>12} {'baseline':>12} {'change':>8} {'p-value':>8}")
+    for name in selected:
+        samples = [value for worker_samples in measured[name] for value in worker_samples]
+        median = statistics.median(samples)
+        process_medians = [statistics.median(worker_samples) for worker_samples in measured[name]]
+        results[name] = {'median_ns': round(median, 1),
+                         'process_medians_ns': [round(value, 1) for value in process_medians],
+                         'samples_ns': [round(value, 1) for value in samples]}
+
+        baseline = baseline_cases.get(name)
+        if not baseline:
+            print(f"{name:<28} {format_ns(median):>12} {'-':>12} {'-':>8} {'-':>8}")
+            continue
+
+        change = median / baseline['median_ns'] - 1
+        # Baselines recorded before per-process medians were kept only have pooled samples
+        p_value = mann_whitney_greater(process_medians, baseline.get('process_medians_ns', baseline['samples_ns']))
+        regressed = p_value < args.alpha and change > args.min_slowdown
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{name:<28} {format_ns(median):>12} {format_ns(baseline['median_ns']):>12} {change:>+7.1%} "
+              f"{p_value:>8.4f}{flag}")
+        if regressed:
+            regressions.append(name)
+
+    if args.save:
+        baseline_cases.update(results)
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump({
+                'environment': {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+                                'machine': platform.machine(), 'system': platform.system(),
+                                'processes': max(1, args.processes)},
+                'cases': baseline_cases
+            }, f, indent=2)
+            f.write('\n')
+        print(f"\nBaseline saved to {BASELINE_PATH}")
+    elif baselines and baselines.get('environment', {}).get('python') != platform.python_version():
+        print(f"\nNote: baseline was recorded on Python {baselines['environment']['python']}")
+
+    if regressions and not args.save:
+        print(f"\nSignificant slowdowns: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+def format_ns(value):
+    if value >= 1e6:
+        return f'{value / 1e6:.2f} ms'
+    if value >= 1e3:
+        return f'{value / 1e3:.2f} us'
+    return f'{value:.0f} ns'
+
+
+if __name__ == '__main__':
+    main()
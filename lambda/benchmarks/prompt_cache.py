@@ -0,0 +1,104 @@
+"""
+Benchmark: Bedrock prompt caching in the chat handler
+Purpose: Compare billed input tokens and model latency with prompt caching on and off, replaying multi-turn
+         conversations through bedrock-chat-handler against the stand-in's prompt cache emulation
+Usage: python lambda/benchmarks/prompt_cache.py [--users N] [--turns N] [--prefill-ms MS]
+  - Each user holds one conversation on one container, so warm turns hit the history cache
+  - Billed input = uncached + cache write + cache read x CACHE_READ_PRICE_FACTOR (Nova bills cache writes at
+    the normal input rate and cache reads at a 75% discount)
+  - Latency comes from the stand-in: --prefill-ms per uncached input token, a tenth of that per cached one
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, LAMBDA_DIR)
+
+import aws_standin  # noqa: E402 (needs LAMBDA_DIR on sys.path)
+from load_test import CHAT_MESSAGES, api_event, load_handler  # noqa: E402
+
+CACHE_READ_PRICE_FACTOR = 0.25
+
+# Replies long enough that a few turns of history pass the minimum cacheable prefix
+ASSISTANT_REPLY = ' '.join([
+    'Metformin is generally well tolerated, but common side effects include nausea, diarrhoea, stomach upset',
+    'and a metallic taste, especially when you first start or increase the dose. Taking it with meals usually',
+    'helps. Rarely it can cause lactic acidosis, so seek care urgently if you notice unusual muscle pain,',
+    'trouble breathing or severe fatigue. Please check with your healthcare provider before changing your dose.'
+] * 2)
+
+
+def run_conversations(chat, standin, prompt_caching, users, turns):
+    """
+    Replay the conversations with caching on or off
+    Returns: {'input', 'cache_read', 'cache_write', 'billed', 'latencies'} summed over every model call
+    """
+    chat.PROMPT_CACHING = prompt_caching
+    chat.conversation_cache.clear()
+    standin.bedrock.prompt_cache.clear()
+    first_request = len(standin.bedrock.requests)
+    latencies = []
+
+    for user in range(users):
+        user_id = f"{'cached' if prompt_caching else 'uncached'}-user-{user:03d}"
+        for turn in range(turns):
+            body = {'message': CHAT_MESSAGES[(user + turn) % len(CHAT_MESSAGES)]}
+            start = time.perf_counter()
+            chat.lambda_handler(api_event(user_id, '/chat', 'POST', body), None)
+            latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.002)  # Conversation timestamps are milliseconds; keep turns distinct
+
+    totals = {'calls': 0, 'input': 0, 'cache_read': 0, 'cache_write': 0}
+    for request in standin.bedrock.requests[first_request:]:
+        usage = request['usage']
+        totals['calls'] += 1
+        totals['input'] += usage['inputTokens']
+        totals['cache_read'] += usage.get('cacheReadInputTokenCount', 0)
+        totals['cache_write'] += usage.get('cacheWriteInputTokenCount', 0)
+    totals['billed'] = totals['input'] + totals['cache_write'] + totals['cache_read'] * CACHE_READ_PRICE_FACTOR
+    totals['latencies'] = sorted(latencies)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--turns', type=int, default=12)
+    parser.add_argument('--prefill-ms', type=float, default=0.2, help='Simulated ms per uncached input token')
+    args = parser.parse_args()
+
+    standin = aws_standin.install()
+    standin.bedrock.reply = ASSISTANT_REPLY
+    standin.bedrock.per_input_token_ms = args.prefill_ms
+
+    chat = load_handler('bedrock-chat-handler.py')
+    # Admission control isn't under test
+    chat.CHAT_USER_LIMIT_PER_MINUTE = chat.CHAT_GLOBAL_LIMIT_PER_MINUTE = 10 ** 6
+
+    results = {}
+    # Handler logs (metrics lines) would dominate the output; keep them out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        for prompt_caching in (False, True):
+            results[prompt_caching] = run_conversations(chat, standin, prompt_caching, args.users, args.turns)
+
+    print(f"{args.users} conversations x {args.turns} turns, {args.prefill_ms} ms per uncached input token\n")
+    print(f"{'prompt caching':<16} {'calls':>6} {'uncached':>10} {'cache read':>11} {'cache write':>12} "
+          f"{'billed input':>13} {'p50 ms':>8} {'p95 ms':>8}")
+    for prompt_caching, totals in results.items():
+        latencies = totals['latencies']
+        print(f"{'on' if prompt_caching else 'off':<16} {totals['calls']:>6} {totals['input']:>10} "
+              f"{totals['cache_read']:>11} {totals['cache_write']:>12} {totals['billed']:>13.0f} "
+              f"{statistics.median(latencies):>8.1f} {latencies[int(0.95 * (len(latencies) - 1))]:>8.1f}")
+
+    off, on = results[False]['billed'], results[True]['billed']
+    print(f"\nBilled input tokens with caching: {on / off:.1%} of uncached")
+
+
+if __name__ == '__main__':
+    main()
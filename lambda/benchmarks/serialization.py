@@ -0,0 +1,115 @@
+"""
+Benchmark: response serialization of DynamoDB items
+Purpose: Compare encoding strategies for large Decimal-heavy lists (e.g. list_medications) at thousands of items
+Usage: python lambda/benchmarks/serialization.py [--items 1000 5000 10000] [--repeat N]
+  - item_by_item: convert every item to native types in Python, then json.dumps (the obvious fix)
+  - responses.*: the shared responses module, with the stdlib backend and with orjson when installed
+  - body = JSON string for AWS_PROXY envelopes; native = plain objects for the AWS integration type
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, LAMBDA_DIR)
+
+import responses  # noqa: E402 (needs LAMBDA_DIR on sys.path)
+
+
+def medication_items(count):
+    """
+    Medications items as boto3 returns them (round-tripped through the DynamoDB type system)
+    """
+    serializer, deserializer = TypeSerializer(), TypeDeserializer()
+    items = []
+    for index in range(count):
+        item = {
+            'userId': '8f3c2a1e-5b7d-4c9e-a1f2-3b4c5d6e7f80',
+            'medicationId': f'med-{1742000000000000 + index}',
+            'name': ['Metformin', 'Lisinopril', 'Atorvastatin', 'Aspirin'][index % 4],
+            'dosage': '500mg',
+            'frequency': 'twice daily',
+            'startDate': '2025-03-14T08:00:00',
+            'endDate': '',
+            'reminders': ['08:00', '20:00'],
+            'notes': 'Take with meals',
+            'active': True,
+            'createdAt': Decimal(1742000000000 + index),
+            'updatedAt': Decimal(1742000000000 + index),
+            'refillsRemaining': Decimal(3),
+            'pillsPerDose': Decimal('1.5'),
+            'tags': {'chronic', 'morning'}
+        }
+        items.append({key: deserializer.deserialize(serializer.serialize(value)) for key, value in item.items()})
+    return items
+
+
+def replace_decimals(value):
+    """
+    Per-item recursive conversion, as typically written by hand
+    """
+    if isinstance(value, list):
+        return [replace_decimals(element) for element in value]
+    if isinstance(value, dict):
+        return {key: replace_decimals(element) for key, element in value.items()}
+    if isinstance(value, set):
+        return [replace_decimals(element) for element in value]
+    if isinstance(value, Decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    return value
+
+
+def strategies():
+    """
+    Returns: {name: (backend, function)}; backend None means orjson is switched off
+    """
+    cases = {
+        'item_by_item.body': (None, lambda payload: json.dumps(replace_decimals(payload))),
+        'item_by_item.native': (None, lambda payload: replace_decimals(payload)),
+        'responses[json].body': (None, responses.dumps),
+        'responses[json].native': (None, responses.to_json_native)
+    }
+    if responses.orjson is not None:
+        cases['responses[orjson].body'] = (responses.orjson, responses.dumps)
+        cases['responses[orjson].native'] = (responses.orjson, responses.to_json_native)
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, nargs='+', default=[1000, 5000, 10000])
+    parser.add_argument('--repeat', type=int, default=15)
+    args = parser.parse_args()
+
+    installed_orjson = responses.orjson
+    if installed_orjson is None:
+        print('orjson not installed; comparing the standard library backend only\n')
+
+    print(f"{'strategy':<26} " + ' '.join(f"{f'{count} items':>14}" for count in args.items))
+    rows = {}
+    for count in args.items:
+        payload = {'medications': medication_items(count), 'count': count}
+        for name, (backend, function) in strategies().items():
+            responses.orjson = backend
+            function(payload)  # Warm up
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                function(payload)
+                timings.append((time.perf_counter() - start) * 1000)
+            rows.setdefault(name, []).append(statistics.median(timings))
+    responses.orjson = installed_orjson
+
+    for name, medians in rows.items():
+        print(f"{name:<26} " + ' '.join(f"{median:>11.2f} ms" for median in medians))
+
+
+if __name__ == '__main__':
+    main()
@@ -6,10 +6,9 @@ Returns: IAM policy (Allow/Deny) + context with user info
 """
 
 import json
-import boto3
 import urllib.request
 import time
-from jose import jwt, JWTError
+from tracing import span, trace_handler
 
 # Cognito configuration
 COGNITO_REGION = 'us-west-1'
@@ -21,6 +20,7 @@ keys_cache = {}
 keys_cache_time = 0
 
 
+@trace_handler('cognito-jwt-authorizer')
 def lambda_handler(event, context):
     """
     Main Lambda handler for JWT authorization
@@ -89,6 +89,9 @@ def validate_jwt(token):
     """
     Validate JWT token against Cognito public keys
     """
+    # Imported on first validation so python-jose stays out of cold-start init
+    from jose import jwt, JWTError
+
     try:
         # Get JWT header to extract kid (key ID)
         unverified_header = jwt.get_unverified_header(token)
@@ -151,7 +154,7 @@ def get_cognito_jwk_keys():
         jwk_url = f'https://cognito-idp.{COGNITO_REGION}.amazonaws.com/{COGNITO_USER_POOL_ID}/.well-known/jwks.json'
 
         # Fetch JWK set from Cognito
-        with urllib.request.urlopen(jwk_url, timeout=5) as response:
+        with span('Cognito.JWKS'), urllib.request.urlopen(jwk_url, timeout=5) as response:
             jwk_set = json.loads(response.read().decode('utf-8'))
 
         # Create kid -> JWK mapping
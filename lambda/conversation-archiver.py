@@ -0,0 +1,133 @@
+"""
+Lambda: conversation-archiver
+Purpose: Move old chat history out of ConversationHistory into compressed per-user S3 archives
+Receives: A scheduled (EventBridge) invocation, or {action: 'archive_turns', start_key} to continue a run
+Returns: Counts of archived, failed and skipped turns, and the start_key a continuation resumes from
+Turns are written without a TTL. Once a turn is older than HISTORY_RETENTION_DAYS, this function merges it
+into the user's monthly archive, marks the user as having archives and only then sets expiresAt, so a turn
+never leaves the table before it is in S3. A user-month that fails to archive (e.g. an S3 error) keeps its
+turns untouched for the next run, and a malformed turn is logged and skipped, so neither blocks the others
+"""
+
+import os
+import time
+from aws_clients import lazy_client, lazy_table
+from conversation_archive import HISTORY_RETENTION_DAYS, archive_month, mark_archived, merge_into_archive
+from responses import dumps
+from tracing import trace_handler
+
+# Initialize AWS clients (created on first use)
+lambda_client = lazy_client('lambda')
+
+# DynamoDB table reference (created on first use)
+conversation_table = lazy_table('ConversationHistory')
+
+# Scan: stop with this much invocation time left and continue in a new invocation from start_key
+ARCHIVE_RESERVE_MS = 30000
+ARCHIVE_PAGE_SIZE = 500
+
+# Continuations invoke this function again by name
+ARCHIVER_FUNCTION_NAME = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'conversation-archiver')
+
+
+@trace_handler('conversation-archiver')
+def lambda_handler(event, context):
+    """
+    Main Lambda handler for conversation archival
+    """
+    start_key = event.get('start_key') if event.get('action') == 'archive_turns' else None
+    return archive_old_turns(start_key, context)
+
+
+def archive_old_turns(start_key, context):
+    """
+    Archive every turn past the retention period that isn't archived yet (resumable)
+    Turns written with a TTL before archiving came first are included, so they are archived before they expire
+    Returns: {'archived', 'failed', 'skipped', 'start_key'} - start_key is set when a continuation was started
+    """
+    cutoff = str(int((time.time() - HISTORY_RETENTION_DAYS * 86400) * 1000))
+    scan_args = {
+        'FilterExpression': 'attribute_not_exists(archivedAt) AND (#timestamp < :cutoff OR attribute_exists(expiresAt))',
+        'ExpressionAttributeNames': {'#timestamp': 'timestamp'},
+        'ExpressionAttributeValues': {':cutoff': cutoff},
+        'Limit': ARCHIVE_PAGE_SIZE
+    }
+    totals = {'archived': 0, 'failed': 0, 'skipped': 0}
+
+    while True:
+        if start_key:
+            scan_args['ExclusiveStartKey'] = start_key
+        response = conversation_table.scan(**scan_args)
+
+        for name, count in archive_turns(response.get('Items', [])).items():
+            totals[name] += count
+
+        start_key = response.get('LastEvaluatedKey')
+        if not start_key:
+            break
+        if context is not None and context.get_remaining_time_in_millis() < ARCHIVE_RESERVE_MS:
+            continue_run(start_key)
+            break
+
+    print(f"Archived {totals['archived']} turns ({totals['failed']} failed, {totals['skipped']} skipped)")
+    return dict(totals, start_key=start_key)
+
+
+def archive_turns(items):
+    """
+    Merge one page of turns into their per-user, per-month archives, then let them expire
+    Returns: {'archived', 'failed', 'skipped'} turn counts
+    """
+    counts = {'archived': 0, 'failed': 0, 'skipped': 0}
+    groups = {}
+    for item in items:
+        try:
+            month = archive_month(item['timestamp'])
+        except Exception as e:
+            print(f"Skipping turn {item.get('userId')} {item.get('timestamp')}: {str(e)}")
+            counts['skipped'] += 1
+            continue
+        groups.setdefault((item['userId'], month), []).append(item)
+
+    for (user_id, month), turns in groups.items():
+        try:
+            merge_into_archive(user_id, month, turns)
+            mark_archived(user_id, max(turn['timestamp'] for turn in turns))
+            for turn in turns:
+                expire_archived_turn(turn)
+            counts['archived'] += len(turns)
+        except Exception as e:
+            # Left without archivedAt (and without a new TTL), so the next run retries the group
+            print(f"Archive error for {user_id} {month}: {str(e)}")
+            counts['failed'] += len(turns)
+
+    return counts
+
+
+def expire_archived_turn(turn):
+    """
+    Helper: Mark an archived turn and let TTL delete it (it is already in the archive)
+    """
+    now = time.time()
+    try:
+        conversation_table.update_item(
+            Key={'userId': turn['userId'], 'timestamp': turn['timestamp']},
+            UpdateExpression='SET archivedAt = :archived_at, expiresAt = :expires_at',
+            ConditionExpression='attribute_exists(userId)',
+            ExpressionAttributeValues={':archived_at': int(now * 1000), ':expires_at': int(now)}
+        )
+    except Exception as e:
+        # Deleted since the scan: nothing left to expire
+        if (getattr(e, 'response', None) or {}).get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            raise
+
+
+def continue_run(start_key):
+    """
+    Helper: Continue the scan from start_key in a new asynchronous invocation
+    """
+    lambda_client.invoke(
+        FunctionName=ARCHIVER_FUNCTION_NAME,
+        InvocationType='Event',
+        Payload=dumps({'action': 'archive_turns', 'start_key': start_key})
+    )
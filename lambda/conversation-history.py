@@ -0,0 +1,120 @@
+"""
+Lambda: conversation-history
+Purpose: Page back through a user's chat history for the Assistant screen
+Receives: GET /history?before=&limit=&fields=
+Returns: One page of turns (newest first) and a cursor for the next, older page
+Each page is one key-condition query on (userId, timestamp) with a Limit, so it reads at most
+`limit` items no matter how long the conversation is. Past the retention period, pages are
+rehydrated from the S3 conversation archives of users who have them (ConversationArchives marker)
+"""
+
+from api_gateway import get_query_parameters, get_user_id
+from aws_clients import lazy_table
+from conversation_archive import has_archives, read_archived_history
+from responses import api_handler, error_response
+from tracing import trace_handler
+
+# DynamoDB table reference (created on first use)
+conversation_table = lazy_table('ConversationHistory')
+
+# Pagination
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Attributes a client may request with ?fields= (timestamp is always returned: it is the cursor)
+HISTORY_FIELDS = ['timestamp', 'role', 'content']
+
+
+@trace_handler('conversation-history')
+@api_handler
+def lambda_handler(event, context):
+    """
+    Main Lambda handler for conversation history reads
+    """
+    try:
+        user_id = get_user_id(event)
+
+        if not user_id:
+            return error_response(401, 'Unauthorized - missing user ID')
+
+        if event.get('httpMethod', 'GET') != 'GET':
+            return error_response(405, 'Method not allowed')
+
+        return list_history(user_id, get_query_parameters(event))
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return error_response(500, str(e))
+
+
+def list_history(user_id, params):
+    """
+    List one page of conversation turns, newest first
+    Query parameters:
+      before: timestamp cursor - only turns older than it (omit for the latest page)
+      limit: page size (default 20, max 100)
+      fields: comma-separated subset of timestamp, role, content
+    next_cursor is None once the oldest turn has been returned
+    """
+    try:
+        try:
+            page_size = min(max(int(params.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        except (TypeError, ValueError):
+            return {'error': 'limit must be a number'}
+
+        fields = parse_fields(params.get('fields'))
+        if fields is None:
+            return {'error': f'fields must be a comma-separated subset of: {", ".join(HISTORY_FIELDS)}'}
+
+        before = params.get('before')
+        if before and not before.isdigit():
+            return {'error': 'before must be a timestamp cursor'}
+
+        key_condition = 'userId = :uid'
+        expr_values = {':uid': user_id}
+        if before:
+            key_condition += ' AND #timestamp < :before'
+            expr_values[':before'] = before
+
+        response = conversation_table.query(
+            KeyConditionExpression=key_condition,
+            ProjectionExpression=', '.join(f'#{field}' for field in fields),
+            ExpressionAttributeNames={f'#{field}': field for field in fields},
+            ExpressionAttributeValues=expr_values,
+            ScanIndexForward=False,  # Most recent first
+            Limit=page_size
+        )
+        items = response.get('Items', [])
+
+        # DynamoDB returns LastEvaluatedKey when the Limit stopped the query (there may be older turns)
+        last_key = response.get('LastEvaluatedKey')
+        next_cursor = last_key['timestamp'] if last_key else None
+
+        # Scrolled back past the table: fill the page from the archives (turns past the retention period)
+        if not last_key and len(items) < page_size and has_archives(user_id):
+            older_than = items[-1]['timestamp'] if items else before
+            archived, has_more = read_archived_history(user_id, older_than, page_size - len(items))
+            items.extend({field: turn.get(field, '') for field in fields} for turn in archived)
+            next_cursor = items[-1]['timestamp'] if has_more else None
+
+        return {
+            'messages': items,
+            'count': len(items),
+            'next_cursor': next_cursor
+        }
+
+    except Exception as e:
+        print(f"List history error: {str(e)}")
+        return error_response(500, str(e))
+
+
+def parse_fields(value):
+    """
+    Helper: Attributes to project from a ?fields= value; None if any field isn't allowed
+    """
+    if not value:
+        return HISTORY_FIELDS
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    if any(field not in HISTORY_FIELDS for field in fields):
+        return None
+    return ['timestamp'] + [field for field in fields if field != 'timestamp']
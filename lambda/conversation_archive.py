@@ -0,0 +1,162 @@
+"""
+Shared module: conversation_archive
+Purpose: Compressed per-user, per-month archives of ConversationHistory turns in S3
+Turns older than the retention period are merged into archives/conversations/{userId}/{YYYY-MM}.ndjson.gz,
+one {"timestamp", "role", "content"} object per line, oldest first, before they are given a TTL; merges
+are idempotent (deduplicated by timestamp), so a retried run rewrites the same archive. Users with archives
+have a ConversationArchives marker item, so readers only go to S3 for them. Reads are cached per container by ETag
+Package this file alongside lambda_function.py in each deployment zip
+"""
+
+import gzip
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from aws_clients import lazy_client, lazy_table
+from responses import dumps
+
+# Initialize AWS clients (created on first use)
+s3 = lazy_client('s3')
+
+# DynamoDB table reference: one marker item per user with archives (created on first use)
+archive_index_table = lazy_table('ConversationArchives')
+
+ARCHIVE_BUCKET = 'beaumed-prescriptions'
+ARCHIVE_PREFIX = 'archives/conversations'
+ARCHIVE_FIELDS = ['timestamp', 'role', 'content']
+
+# Turns stay in ConversationHistory for this long, then are archived and expire (TTL on expiresAt)
+HISTORY_RETENTION_DAYS = int(os.environ.get('HISTORY_RETENTION_DAYS', '90'))
+
+# Per-container cache of decoded archives: (s3_key, etag) -> turns, oldest first
+# Scrolling back reads consecutive pages from the same month, so each archive is fetched once
+ARCHIVE_CACHE_MAX_OBJECTS = 32
+archive_cache = OrderedDict()
+archive_cache_lock = threading.Lock()
+
+
+def archive_month(timestamp):
+    """
+    Archive month (UTC, YYYY-MM) of a millisecond timestamp string
+    """
+    return datetime.fromtimestamp(int(timestamp) / 1000, tz=timezone.utc).strftime('%Y-%m')
+
+
+def archive_key(user_id, month):
+    return f'{ARCHIVE_PREFIX}/{user_id}/{month}.ndjson.gz'
+
+
+def list_archives(user_id):
+    """
+    A user's archives, newest month first: [(month, s3_key, etag)]
+    """
+    prefix = f'{ARCHIVE_PREFIX}/{user_id}/'
+    archives = []
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=ARCHIVE_BUCKET, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            month = obj['Key'][len(prefix):].split('.', 1)[0]
+            archives.append((month, obj['Key'], obj.get('ETag')))
+    archives.sort(reverse=True)
+    return archives
+
+
+def read_archive(s3_key, etag=None):
+    """
+    Turns in an archive, oldest first ([] if it doesn't exist); cached when the ETag is known
+    """
+    cache_key = (s3_key, etag)
+    if etag:
+        with archive_cache_lock:
+            if cache_key in archive_cache:
+                archive_cache.move_to_end(cache_key)
+                return archive_cache[cache_key]
+
+    try:
+        data = s3.get_object(Bucket=ARCHIVE_BUCKET, Key=s3_key)['Body'].read()
+    except Exception as e:
+        if (getattr(e, 'response', None) or {}).get('Error', {}).get('Code') == 'NoSuchKey':
+            return []
+        raise
+    turns = [json.loads(line) for line in gzip.decompress(data).decode('utf-8').splitlines() if line]
+
+    if etag:
+        with archive_cache_lock:
+            archive_cache[cache_key] = turns
+            while len(archive_cache) > ARCHIVE_CACHE_MAX_OBJECTS:
+                archive_cache.popitem(last=False)
+    return turns
+
+
+def merge_into_archive(user_id, month, turns):
+    """
+    Merge turns into a user's archive for one month (read, deduplicate by timestamp, rewrite)
+    Callers must not merge the same user's month concurrently (stream shards keep a user's records in order)
+    Returns: number of turns in the archive
+    """
+    s3_key = archive_key(user_id, month)
+    merged = {turn['timestamp']: turn for turn in read_archive(s3_key)}
+    for turn in turns:
+        merged[turn['timestamp']] = {field: turn.get(field, '') for field in ARCHIVE_FIELDS}
+
+    lines = ''.join(dumps(merged[timestamp]) + '\n' for timestamp in sorted(merged))
+    s3.put_object(
+        Bucket=ARCHIVE_BUCKET,
+        Key=s3_key,
+        Body=gzip.compress(lines.encode('utf-8')),
+        ContentType='application/gzip'
+    )
+    return len(merged)
+
+
+def mark_archived(user_id, archived_through):
+    """
+    Record that a user has archives, up to the newest archived turn's timestamp
+    (a marker that is already further along is left as it is)
+    """
+    try:
+        archive_index_table.update_item(
+            Key={'userId': user_id},
+            UpdateExpression='SET archivedThrough = :through',
+            ConditionExpression='attribute_not_exists(archivedThrough) OR archivedThrough < :through',
+            ExpressionAttributeValues={':through': archived_through}
+        )
+    except Exception as e:
+        if (getattr(e, 'response', None) or {}).get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            raise
+
+
+def has_archives(user_id):
+    """
+    True if any of the user's turns have been archived (a key-only read of their marker item)
+    """
+    response = archive_index_table.get_item(Key={'userId': user_id}, ProjectionExpression='userId')
+    return 'Item' in response
+
+
+def read_archived_history(user_id, before, limit):
+    """
+    Rehydrate archived turns older than `before` (a timestamp; None for the newest), newest first
+    Returns: (turns, has_more) - has_more is True when older archived turns remain
+    """
+    turns = []
+    before_month = archive_month(before) if before else None
+    for month, s3_key, etag in list_archives(user_id):
+        if before_month and month > before_month:
+            continue
+        for turn in reversed(read_archive(s3_key, etag)):
+            if before and turn['timestamp'] >= before:
+                continue
+            if len(turns) == limit:
+                return turns, True
+            turns.append(turn)
+    return turns, False
+
+
+def iter_archived_turns(user_id):
+    """
+    Yield every archived turn for a user, oldest first, one archive in memory at a time
+    """
+    for _, s3_key, _ in reversed(list_archives(user_id)):
+        yield from read_archive(s3_key)
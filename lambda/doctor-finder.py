@@ -1,39 +1,62 @@
 """
 Lambda: doctor-finder
-Purpose: Find doctors near user location using Yelp API
-Receives: location, specialty (optional)
+Purpose: Find doctors near user location using Yelp API, and list the user's saved doctors
+Receives: POST /find-doctors {location, specialty (optional)}, GET /doctors?specialty=&min_rating=&limit=&cursor=
 Returns: List of doctors with details (name, phone, address, rating)
+Saved doctors are read through two sparse indexes on the user's partition - by rating, and by a
+composite specialty#rating key - so top-N and filtered lists are each one key-condition query
 """
 
+import base64
 import json
-import boto3
-import requests
+import urllib.parse
+import urllib.request
 from datetime import datetime
+from decimal import Decimal
+from api_gateway import get_query_parameters, get_user_id, parse_body
+from aws_clients import lazy_client, lazy_table
+from responses import api_handler, error_response
+from tracing import span, trace_handler
 
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb', region_name='us-west-1')
-secrets_manager = boto3.client('secretsmanager', region_name='us-west-1')
+# Initialize AWS clients (created on first use)
+secrets_manager = lazy_client('secretsmanager')
 
 # DynamoDB table reference
-doctors_table = dynamodb.Table('Doctors')
+doctors_table = lazy_table('Doctors')
 
+# Doctors global secondary indexes (partition key userId, all attributes projected)
+RATING_INDEX = 'userId-rating-index'  # Sort key: rating (N)
+SPECIALTY_RATING_INDEX = 'userId-specialtyRating-index'  # Sort key: specialtyRating (S), e.g. 'cardiology#4.80'
 
+# Saved doctor listing
+DEFAULT_SAVED_LIMIT = 10
+MAX_SAVED_LIMIT = 50
+MAX_RATING = Decimal('5')
+SAVED_DOCTOR_FIELDS = ['doctorId', 'name', 'specialty', 'phone', 'address', 'rating', 'website', 'timestamp']
+
+
+@trace_handler('doctor-finder')
+@api_handler
 def lambda_handler(event, context):
     """
     Main Lambda handler for doctor discovery
     """
     try:
-        # Parse request body
-        body = json.loads(event.get('body', '{}'))
-        user_id = event['requestContext']['authorizer']['claims']['sub']  # From Cognito JWT
+        # Parse request body and user_id (from Cognito JWT)
+        body = parse_body(event)
+        user_id = get_user_id(event)
+
+        if not user_id:
+            return error_response(401, 'Unauthorized - missing user ID')
+
+        if event.get('httpMethod') == 'GET':
+            return list_saved_doctors(user_id, get_query_parameters(event))
+
         location = body.get('location', '').strip()
         specialty = body.get('specialty', 'doctor').strip()
         
         if not location:
-            return {
-                'statusCode': 400,
-                'body': json.dumps({'error': 'Location is required'})
-            }
+            return error_response(400, 'Location is required')
         
         # Retrieve Yelp API key from Secrets Manager
         try:
@@ -55,6 +78,8 @@ def lambda_handler(event, context):
         # Save doctors to user's Doctors table (bookmarking)
         timestamp = int(datetime.now().timestamp() * 1000)
         for doctor in doctors[:5]:  # Save top 5
+            # DynamoDB rejects floats; Yelp ratings are floats like 4.5
+            rating = Decimal(str(doctor.get('rating') or 0))
             doctors_table.put_item(
                 Item={
                     'userId': user_id,
@@ -63,32 +88,120 @@ def lambda_handler(event, context):
                     'specialty': specialty,
                     'phone': doctor.get('phone', 'N/A'),
                     'address': doctor.get('address', 'N/A'),
-                    'rating': doctor.get('rating', 0),
+                    'rating': rating,
+                    'specialtyRating': specialty_rating_key(specialty, rating),
                     'website': doctor.get('website', ''),
                     'timestamp': timestamp
                 }
             )
         
         return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'doctors': doctors,
-                'count': len(doctors),
-                'message': f'Found {len(doctors)} doctors in {location}'
-            })
+            'doctors': doctors,
+            'count': len(doctors),
+            'message': f'Found {len(doctors)} doctors in {location}'
         }
     
     except Exception as e:
         print(f"Error: {str(e)}")
+        return error_response(500, str(e))
+
+
+def list_saved_doctors(user_id, params):
+    """
+    List a user's saved doctors, highest rated first
+    Query parameters:
+      specialty: only doctors saved under this specialty (served by the specialty#rating index)
+      min_rating: only doctors rated at least this (0-5)
+      limit: page size / top N (default 10, max 50)
+      cursor: opaque cursor from the previous page
+    """
+    try:
+        try:
+            limit = min(max(int(params.get('limit', DEFAULT_SAVED_LIMIT)), 1), MAX_SAVED_LIMIT)
+        except (TypeError, ValueError):
+            return {'error': 'limit must be a number'}
+
+        try:
+            min_rating = Decimal(str(params.get('min_rating') or 0))
+            valid_rating = 0 <= min_rating <= MAX_RATING
+        except ArithmeticError:
+            valid_rating = False
+        if not valid_rating:
+            return {'error': f'min_rating must be a number between 0 and {MAX_RATING}'}
+
+        specialty = (params.get('specialty') or '').strip()
+        if specialty:
+            index_name, sort_key = SPECIALTY_RATING_INDEX, 'specialtyRating'
+            key_condition = 'userId = :uid AND specialtyRating BETWEEN :low AND :high'
+            expr_values = {
+                ':uid': user_id,
+                ':low': specialty_rating_key(specialty, min_rating),
+                ':high': specialty_rating_key(specialty, MAX_RATING)
+            }
+        else:
+            index_name, sort_key = RATING_INDEX, 'rating'
+            key_condition = 'userId = :uid AND rating >= :low'
+            expr_values = {':uid': user_id, ':low': min_rating}
+
+        query_args = {
+            'IndexName': index_name,
+            'KeyConditionExpression': key_condition,
+            'ProjectionExpression': ', '.join(f'#{field}' for field in SAVED_DOCTOR_FIELDS),
+            'ExpressionAttributeNames': {f'#{field}': field for field in SAVED_DOCTOR_FIELDS},
+            'ExpressionAttributeValues': expr_values,
+            'ScanIndexForward': False,  # Highest rating first
+            'Limit': limit
+        }
+
+        if params.get('cursor'):
+            start_key = decode_cursor(params['cursor'], sort_key)
+            if start_key is None:
+                return {'error': 'Invalid cursor'}
+            query_args['ExclusiveStartKey'] = dict(start_key, userId=user_id)
+
+        response = doctors_table.query(**query_args)
+        doctors = response.get('Items', [])
+
+        last_key = response.get('LastEvaluatedKey')
         return {
-            'statusCode': 500,
-            'body': json.dumps({'error': str(e)})
+            'doctors': doctors,
+            'count': len(doctors),
+            'cursor': encode_cursor(last_key, sort_key) if last_key else None
         }
 
+    except Exception as e:
+        print(f"List saved doctors error: {str(e)}")
+        return error_response(500, str(e))
+
+
+def specialty_rating_key(specialty, rating):
+    """
+    Helper: Composite index key 'specialty#rating' (ratings are 0-5, so a fixed two-decimal
+    format sorts the same as a string and as a number)
+    """
+    return f"{specialty.strip().lower().replace('#', ' ')}#{Decimal(rating):.2f}"
+
+
+def encode_cursor(last_key, sort_key):
+    """
+    Helper: Opaque pagination cursor for the client (the index and table sort keys of the last item)
+    """
+    cursor = {'doctorId': last_key['doctorId'], sort_key: str(last_key[sort_key])}
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode('utf-8')).decode('utf-8')
+
+
+def decode_cursor(cursor, sort_key):
+    """
+    Helper: Decode a pagination cursor into an ExclusiveStartKey (without userId); None if malformed
+    """
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8')))
+        start_key = {'doctorId': str(decoded['doctorId'])}
+        start_key[sort_key] = Decimal(decoded[sort_key]) if sort_key == 'rating' else str(decoded[sort_key])
+        return start_key
+    except Exception:
+        return None
+
 
 def search_yelp_doctors(api_key, location, specialty):
     """
@@ -105,10 +218,11 @@ def search_yelp_doctors(api_key, location, specialty):
             "limit": 10
         }
         
-        response = requests.get(url, headers=headers, params=params, timeout=5)
-        response.raise_for_status()
-        
-        data = response.json()
+        # Standard library HTTP keeps the requests package out of the deployment and cold start
+        request = urllib.request.Request(f"{url}?{urllib.parse.urlencode(params)}", headers=headers)
+        with span('Yelp.Search'), urllib.request.urlopen(request, timeout=5) as response:
+            data = json.loads(response.read().decode('utf-8'))
+
         doctors = []
         
         for business in data.get('businesses', []):
@@ -0,0 +1,355 @@
+"""
+Lambda: dose-tracker
+Purpose: Log medication dose events and report adherence
+Receives: POST /doses {medicationId, status, scheduledTime, takenAt}, GET /doses?from=&to=,
+          GET /adherence?days=&period=
+Returns: Logged event, dose events, or adherence (percentages and streaks)
+Each dose event incrementally updates a daily and a weekly rollup item, so adherence over months
+reads one small item per day instead of every raw event
+"""
+
+from datetime import date, datetime, timedelta
+from api_gateway import get_query_parameters, get_user_id, parse_body
+from aws_clients import lazy_table
+from responses import api_handler, error_response
+from tracing import trace_handler
+
+# DynamoDB table references (created on first use)
+dose_events_table = lazy_table('DoseEvents')
+dose_rollups_table = lazy_table('DoseRollups')
+
+DOSE_STATUSES = ['taken', 'skipped', 'missed']
+
+# Logging a dose retries when another write to the same dose lands between the read and the transaction
+LOG_DOSE_ATTEMPTS = 3
+WRITE_CONFLICT_CODES = {'ConditionalCheckFailedException', 'TransactionCanceledException'}
+
+# Query windows
+DEFAULT_EVENT_DAYS = 7
+MAX_EVENTS = 500
+DEFAULT_ADHERENCE_DAYS = 90
+MAX_ADHERENCE_DAYS = 366
+
+
+@trace_handler('dose-tracker')
+@api_handler
+def lambda_handler(event, context):
+    """
+    Main Lambda handler for dose logging and adherence
+    Routes based on HTTP method and path
+    """
+    try:
+        http_method = event.get('httpMethod', 'GET')
+
+        # Parse request body and user_id (handles both AWS and AWS_PROXY integration types)
+        body = parse_body(event)
+        user_id = get_user_id(event)
+
+        if not user_id:
+            return error_response(401, 'Unauthorized - missing user ID')
+
+        path = (event.get('path') or event.get('resource') or '').rstrip('/')
+
+        if http_method == 'POST':
+            return log_dose(user_id, body)
+        elif http_method == 'GET' and path.endswith('/adherence'):
+            return get_adherence(user_id, get_query_parameters(event))
+        elif http_method == 'GET':
+            return list_dose_events(user_id, get_query_parameters(event))
+        else:
+            return error_response(405, 'Method not allowed')
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return error_response(500, str(e))
+
+
+def log_dose(user_id, body):
+    """
+    Record a dose event and update the daily/weekly rollups
+    Expected body: {medicationId, status: taken|skipped|missed, scheduledTime, takenAt}
+    Times are the user's local time (ISO 8601); one event per medication per scheduled minute,
+    so re-logging a dose (e.g. skipped -> taken) replaces it and moves its rollup counts
+    """
+    try:
+        medication_id = body.get('medicationId')
+        status = body.get('status', 'taken')
+
+        if not medication_id:
+            return {'error': 'medicationId is required'}
+        if status not in DOSE_STATUSES:
+            return {'error': f'status must be one of: {", ".join(DOSE_STATUSES)}'}
+
+        try:
+            scheduled_at = parse_time(body.get('scheduledTime') or body.get('takenAt')) or datetime.now()
+        except ValueError:
+            return {'error': 'scheduledTime and takenAt must be ISO 8601 timestamps'}
+
+        scheduled_time = scheduled_at.strftime('%Y-%m-%dT%H:%M')
+        event_id = f"{scheduled_time}#{medication_id}"
+        item = {
+            'userId': user_id,
+            'eventId': event_id,
+            'medicationId': medication_id,
+            'status': status,
+            'scheduledTime': scheduled_time,
+            'takenAt': body.get('takenAt', '') if status == 'taken' else '',
+            'loggedAt': datetime.now().isoformat()
+        }
+
+        for attempt in range(LOG_DOSE_ATTEMPTS):
+            existing = dose_events_table.get_item(
+                Key={'userId': user_id, 'eventId': event_id},
+                ProjectionExpression='#status',
+                ExpressionAttributeNames={'#status': 'status'},
+                ConsistentRead=True
+            ).get('Item')
+            try:
+                write_dose_event(item, scheduled_at.date(), existing)
+                break
+            except Exception as e:
+                code = (getattr(e, 'response', None) or {}).get('Error', {}).get('Code')
+                if code not in WRITE_CONFLICT_CODES or attempt == LOG_DOSE_ATTEMPTS - 1:
+                    raise
+                print(f"Dose {event_id} changed concurrently, retrying: {str(e)}")
+
+        return {
+            'eventId': event_id,
+            'status': status,
+            'message': 'Dose logged successfully'
+        }
+
+    except Exception as e:
+        print(f"Log dose error: {str(e)}")
+        return error_response(500, str(e))
+
+
+def write_dose_event(item, day, existing):
+    """
+    Helper: Store a dose event and adjust its rollups in one transaction
+    The put is conditioned on the status read beforehand (`existing`, None for a new dose), so the event
+    and the rollup counts either all change or none do - a failed write can be retried without
+    skipping or double-counting the rollups
+    """
+    if existing is None:
+        condition = {'ConditionExpression': 'attribute_not_exists(eventId)'}
+    else:
+        condition = {
+            'ConditionExpression': '#status = :previous',
+            'ExpressionAttributeNames': {'#status': 'status'},
+            'ExpressionAttributeValues': {':previous': existing['status']}
+        }
+
+    previous_status = existing['status'] if existing else None
+    if previous_status == item['status']:
+        # Same status re-logged: the counts don't change
+        dose_events_table.put_item(Item=item, **condition)
+        return
+
+    put = dict(condition, TableName=dose_events_table.name, Item=item)
+    updates = rollup_updates(item['userId'], day, item['status'], previous_status)
+    dose_events_table.meta.client.transact_write_items(
+        TransactItems=[{'Put': put}] + [{'Update': update} for update in updates]
+    )
+
+
+def rollup_updates(user_id, day, status, previous_status=None):
+    """
+    Helper: TransactWriteItems updates adjusting the day and ISO-week rollup counters for one dose
+    A new dose adds to `doses` and its status; a changed dose moves one count between statuses
+    """
+    update_expr = 'ADD #status :one'
+    expr_names = {'#status': status}
+    expr_values = {':one': 1}
+
+    if previous_status:
+        update_expr += ', #previous :minus_one'
+        expr_names['#previous'] = previous_status
+        expr_values[':minus_one'] = -1
+    else:
+        update_expr += ', doses :one'
+
+    iso_year, iso_week, _ = day.isocalendar()
+    return [
+        {
+            'TableName': dose_rollups_table.name,
+            'Key': {'userId': user_id, 'period': period},
+            'UpdateExpression': update_expr,
+            'ExpressionAttributeNames': expr_names,
+            'ExpressionAttributeValues': expr_values
+        }
+        for period in (f'day#{day.isoformat()}', f'week#{iso_year}-W{iso_week:02d}')
+    ]
+
+
+def list_dose_events(user_id, params):
+    """
+    List dose events between two dates (inclusive, YYYY-MM-DD); defaults to the last 7 days
+    """
+    try:
+        try:
+            end = date.fromisoformat(params['to']) if params.get('to') else date.today()
+            start = date.fromisoformat(params['from']) if params.get('from') else end - timedelta(days=DEFAULT_EVENT_DAYS - 1)
+        except ValueError:
+            return {'error': 'from and to must be dates (YYYY-MM-DD)'}
+
+        response = dose_events_table.query(
+            KeyConditionExpression='userId = :uid AND eventId BETWEEN :start AND :end',
+            ExpressionAttributeValues={
+                ':uid': user_id,
+                ':start': start.isoformat(),
+                ':end': f'{end.isoformat()}T99'  # After every time on the end date
+            },
+            Limit=MAX_EVENTS
+        )
+        items = response.get('Items', [])
+
+        return {
+            'events': items,
+            'count': len(items),
+            'truncated': 'LastEvaluatedKey' in response
+        }
+
+    except Exception as e:
+        print(f"List doses error: {str(e)}")
+        return error_response(500, str(e))
+
+
+def get_adherence(user_id, params):
+    """
+    Adherence over the last `days` days (default 90) from the daily rollups, in one query
+    Returns overall and weekly percentages plus current and longest streaks of fully adherent days
+    With period=week, returns the weekly rollup items instead
+    """
+    try:
+        # NumPy comes from a Lambda layer; imported here to keep it out of cold-start init for dose logging
+        import numpy as np
+
+        try:
+            days = min(max(int(params.get('days', DEFAULT_ADHERENCE_DAYS)), 1), MAX_ADHERENCE_DAYS)
+        except (TypeError, ValueError):
+            return {'error': 'days must be a number'}
+
+        end = date.today()
+        start = end - timedelta(days=days - 1)
+
+        if params.get('period') == 'week':
+            return list_weekly_rollups(user_id, start, end)
+
+        items = query_rollups(user_id, f'day#{start.isoformat()}', f'day#{end.isoformat()}')
+
+        # One slot per calendar day; days without a rollup item have no scheduled doses
+        taken = np.zeros(days, dtype=np.int64)
+        doses = np.zeros(days, dtype=np.int64)
+        for item in items:
+            offset = (date.fromisoformat(item['period'][4:]) - start).days
+            taken[offset] = int(item.get('taken', 0))
+            doses[offset] = int(item.get('doses', 0))
+
+        adherent = (doses > 0) & (taken >= doses)
+        run_starts, run_lengths = find_runs(adherent)
+
+        # Today isn't over: doses not logged yet shouldn't break the current streak
+        last_day = days - 1 if doses[-1] > 0 else days - 2
+        current_streak = 0
+        if run_lengths.size and run_starts[-1] + run_lengths[-1] - 1 == last_day:
+            current_streak = int(run_lengths[-1])
+
+        # Weekly totals: sum the daily counters over each ISO week in the range
+        week_labels = np.array([
+            '{0}-W{1:02d}'.format(*(start + timedelta(days=offset)).isocalendar()[:2]) for offset in range(days)
+        ])
+        week_starts = np.flatnonzero(np.r_[True, week_labels[1:] != week_labels[:-1]])
+        weekly_taken = np.add.reduceat(taken, week_starts)
+        weekly_doses = np.add.reduceat(doses, week_starts)
+
+        return {
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'days': days,
+            'taken': int(taken.sum()),
+            'doses': int(doses.sum()),
+            'adherencePercent': percent(taken.sum(), doses.sum()),
+            'currentStreak': current_streak,
+            'longestStreak': int(run_lengths.max()) if run_lengths.size else 0,
+            'weekly': [
+                {
+                    'week': str(week_labels[index]),
+                    'taken': int(week_taken),
+                    'doses': int(week_doses),
+                    'adherencePercent': percent(week_taken, week_doses)
+                }
+                for index, week_taken, week_doses in zip(week_starts, weekly_taken, weekly_doses)
+            ]
+        }
+
+    except Exception as e:
+        print(f"Adherence error: {str(e)}")
+        return error_response(500, str(e))
+
+
+def list_weekly_rollups(user_id, start, end):
+    """
+    Helper: Weekly rollup items covering a date range
+    """
+    start_year, start_week, _ = start.isocalendar()
+    end_year, end_week, _ = end.isocalendar()
+    items = query_rollups(user_id, f'week#{start_year}-W{start_week:02d}', f'week#{end_year}-W{end_week:02d}')
+    weeks = [
+        {
+            'week': item['period'][5:],
+            'taken': int(item.get('taken', 0)),
+            'skipped': int(item.get('skipped', 0)),
+            'missed': int(item.get('missed', 0)),
+            'doses': int(item.get('doses', 0)),
+            'adherencePercent': percent(item.get('taken', 0), item.get('doses', 0))
+        }
+        for item in items
+    ]
+    return {'weeks': weeks, 'count': len(weeks)}
+
+
+def query_rollups(user_id, start_period, end_period):
+    """
+    Helper: All rollup items for a user between two period keys (inclusive)
+    """
+    query_args = {
+        'KeyConditionExpression': 'userId = :uid AND #period BETWEEN :start AND :end',
+        'ExpressionAttributeNames': {'#period': 'period'},
+        'ExpressionAttributeValues': {':uid': user_id, ':start': start_period, ':end': end_period}
+    }
+    items = []
+    while True:
+        response = dose_rollups_table.query(**query_args)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def find_runs(mask):
+    """
+    Helper: Start indexes and lengths of the runs of True in a boolean array
+    """
+    import numpy as np
+
+    edges = np.flatnonzero(np.diff(np.r_[0, mask.astype(np.int8), 0]))
+    starts, ends = edges[::2], edges[1::2]
+    return starts, ends - starts
+
+
+def percent(part, whole):
+    """
+    Helper: Percentage rounded to 0.1, or None when nothing was scheduled
+    """
+    whole = int(whole)
+    return round(int(part) * 100 / whole, 1) if whole else None
+
+
+def parse_time(value):
+    """
+    Helper: Parse an ISO 8601 timestamp (a trailing Z is accepted); None when empty
+    """
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
@@ -0,0 +1,139 @@
+"""
+Shared module: drug_interactions
+Purpose: Check new medications against a user's active medications using a precomputed interaction index
+The index (drug_interactions.json) is keyed by 'drug_a|drug_b' with both names normalized and sorted,
+so each check is one dict lookup per (new, existing) pair - linear in the user's active medications.
+It is loaded once per container, on the first check
+Package this file and drug_interactions.json alongside lambda_function.py in each deployment zip
+"""
+
+import json
+import os
+import re
+import threading
+from functools import lru_cache
+
+INDEX_PATH = os.environ.get(
+    'DRUG_INTERACTIONS_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'drug_interactions.json')
+)
+
+# Words dropped during normalization: strengths, dosage forms and release/salt suffixes
+IGNORED_NAME_WORDS = {'mg', 'mcg', 'ml', 'g', 'iu', 'tablet', 'tablets', 'tab', 'tabs', 'capsule', 'capsules',
+                      'cap', 'caps', 'oral', 'solution', 'suspension', 'er', 'xr', 'sr', 'dr', 'xl', 'cr',
+                      'hcl', 'hydrochloride', 'extended', 'release', 'delayed'}
+
+# Container state: the loaded index
+index = None
+index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Return the interaction index, loading it on first use
+    Shape: {'aliases': {brand: generic}, 'pairs': {'a|b': (severity, description)}, 'drugs': {generic, ...}}
+    """
+    global index
+    if index is None:
+        with index_lock:
+            if index is None:
+                with open(INDEX_PATH) as f:
+                    data = json.load(f)
+                pairs = {key: tuple(value) for key, value in data['pairs'].items()}
+                index = {
+                    'aliases': data.get('aliases', {}),
+                    'pairs': pairs,
+                    'drugs': {drug for key in pairs for drug in key.split('|')}
+                }
+    return index
+
+
+@lru_cache(maxsize=4096)
+def normalize_drug_name(name):
+    """
+    Normalize a medication name to the index's generic form (cached per container)
+    e.g. 'Metformin HCl ER 500mg' -> 'metformin', 'Advil' -> 'ibuprofen'
+    """
+    interaction_index = get_index()
+    aliases, drugs = interaction_index['aliases'], interaction_index['drugs']
+
+    words = [word for word in re.split(r'[^a-z0-9]+', (name or '').lower())
+             if word and word not in IGNORED_NAME_WORDS and not any(char.isdigit() for char in word)]
+    full_name = ' '.join(words)
+    if full_name in aliases:
+        return aliases[full_name]
+    if full_name in drugs or not words:
+        return full_name
+    # Fall back to the first word for names with extra qualifiers, e.g. 'Advil Liqui-Gels'
+    if words[0] in aliases:
+        return aliases[words[0]]
+    if words[0] in drugs:
+        return words[0]
+    return full_name
+
+
+def find_interactions(new_medications, active_medications):
+    """
+    Check new medications against active ones (and against each other, for bulk imports)
+    new_medications / active_medications: dicts with at least 'name' (active ones may carry 'medicationId')
+    Returns a list of warnings: {medication, interactsWith, medicationId, severity, description}
+    """
+    interaction_index = get_index()
+    pairs, drugs = interaction_index['pairs'], interaction_index['drugs']
+
+    checked = [(normalize_drug_name(med.get('name')), med) for med in active_medications]
+    warnings = []
+    for new_med in new_medications:
+        drug = normalize_drug_name(new_med.get('name'))
+        if drug in drugs:
+            for other_drug, other_med in checked:
+                interaction = pairs.get('|'.join(sorted((drug, other_drug))))
+                if interaction:
+                    severity, description = interaction
+                    warnings.append({
+                        'medication': new_med.get('name'),
+                        'interactsWith': other_med.get('name'),
+                        'medicationId': other_med.get('medicationId'),
+                        'severity': severity,
+                        'description': description
+                    })
+        checked.append((drug, new_med))
+    return warnings
+
+
+def has_known_interactions(names):
+    """
+    True if any of the names appears in the index (lets callers skip loading active medications)
+    """
+    drugs = get_index()['drugs']
+    return any(normalize_drug_name(name) in drugs for name in names)
+
+
+def get_active_medications(medications_table, user_id):
+    """
+    Load the name and ID of every active medication for a user
+    """
+    query_args = {
+        'KeyConditionExpression': 'userId = :uid',
+        'FilterExpression': 'active = :active',
+        'ProjectionExpression': 'medicationId, #name',
+        'ExpressionAttributeNames': {'#name': 'name'},
+        'ExpressionAttributeValues': {':uid': user_id, ':active': True}
+    }
+    medications = []
+    while True:
+        response = medications_table.query(**query_args)
+        medications.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return medications
+        query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def check_interactions(medications_table, user_id, new_medications):
+    """
+    Interaction warnings for medications about to be added for a user
+    Skips the DynamoDB read when none of the new medications has a known interaction
+    """
+    if not has_known_interactions(med.get('name') for med in new_medications):
+        return []
+    return find_interactions(new_medications, get_active_medications(medications_table, user_id))
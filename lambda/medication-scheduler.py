@@ -4,17 +4,19 @@ Purpose: CRUD operations for user medications (create, read, update, delete)
 Handles reminders, scheduling, and medication tracking
 """
 
-import json
-import boto3
-from datetime import datetime, timedelta
+from datetime import datetime
+from api_gateway import get_user_id, parse_body
+from aws_clients import lazy_table
+from drug_interactions import check_interactions
+from responses import api_handler, error_response
+from tracing import trace_handler
 
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb', region_name='us-west-1')
-
-# DynamoDB table reference
-medications_table = dynamodb.Table('Medications')
+# DynamoDB table reference (created on first use)
+medications_table = lazy_table('Medications')
 
 
+@trace_handler('medication-scheduler')
+@api_handler
 def lambda_handler(event, context):
     """
     Main Lambda handler for medication operations
@@ -24,52 +26,34 @@ def lambda_handler(event, context):
         # Get HTTP method - handle both direct and nested structures
         http_method = event.get('httpMethod', 'GET')
 
-        # Parse request body - handles both direct body and nested body structure
-        if isinstance(event.get('body'), str):
-            body = json.loads(event.get('body', '{}'))
-        elif isinstance(event.get('body'), dict):
-            body = event.get('body', {})
-        else:
-            body = {}
-
-        # Get user_id from authorizer context (handles both AWS and AWS_PROXY integration types)
-        try:
-            # AWS_PROXY integration type
-            user_id = event['requestContext']['authorizer']['claims']['sub']
-        except (KeyError, TypeError):
-            # AWS integration type - authorizer context is in different location
-            user_id = event['requestContext']['authorizer'].get('sub') or event['requestContext']['authorizer'].get('principalId')
+        # Parse request body and user_id (handles both AWS and AWS_PROXY integration types)
+        body = parse_body(event)
+        user_id = get_user_id(event)
 
         if not user_id:
-            return {'error': 'Unauthorized - missing user ID'}
+            return error_response(401, 'Unauthorized - missing user ID')
         
         # Route to appropriate handler
         if http_method == 'POST':
             return create_medication(user_id, body)
         elif http_method == 'GET':
-            medication_id = event.get('pathParameters', {}).get('medicationId')
+            medication_id = (event.get('pathParameters') or {}).get('medicationId')
             if medication_id:
                 return get_medication(user_id, medication_id)
             else:
                 return list_medications(user_id)
         elif http_method == 'PUT':
-            medication_id = event.get('pathParameters', {}).get('medicationId')
+            medication_id = (event.get('pathParameters') or {}).get('medicationId')
             return update_medication(user_id, medication_id, body)
         elif http_method == 'DELETE':
-            medication_id = event.get('pathParameters', {}).get('medicationId')
+            medication_id = (event.get('pathParameters') or {}).get('medicationId')
             return delete_medication(user_id, medication_id)
         else:
-            return {
-                'statusCode': 405,
-                'body': json.dumps({'error': 'Method not allowed'})
-            }
+            return error_response(405, 'Method not allowed')
     
     except Exception as e:
         print(f"Error: {str(e)}")
-        return {
-            'statusCode': 500,
-            'body': json.dumps({'error': str(e)})
-        }
+        return error_response(500, str(e))
 
 
 def create_medication(user_id, body):
@@ -80,10 +64,7 @@ def create_medication(user_id, body):
     try:
         required_fields = ['name', 'dosage', 'frequency']
         if not all(field in body for field in required_fields):
-            return {
-                'statusCode': 400,
-                'body': json.dumps({'error': f'Required fields: {", ".join(required_fields)}'})
-            }
+            return error_response(400, f'Required fields: {", ".join(required_fields)}')
         
         medication_id = f"med-{int(datetime.now().timestamp() * 1000000)}"
         timestamp = int(datetime.now().timestamp() * 1000)
@@ -103,17 +84,31 @@ def create_medication(user_id, body):
             'updatedAt': timestamp
         }
         
+        # Check against the user's other active medications before adding this one
+        interaction_warnings = get_interaction_warnings(user_id, [item])
+
         medications_table.put_item(Item=item)
 
-        # For AWS integration type, return data directly
         return {
             'medicationId': medication_id,
-            'message': f'Medication "{item["name"]}" created successfully'
+            'message': f'Medication "{item["name"]}" created successfully',
+            'interactionWarnings': interaction_warnings
         }
 
     except Exception as e:
         print(f"Create error: {str(e)}")
-        return {'error': str(e)}
+        return error_response(500, str(e))
+
+
+def get_interaction_warnings(user_id, new_medications):
+    """
+    Helper: Drug-interaction warnings for new medications; a failed check never blocks the write
+    """
+    try:
+        return check_interactions(medications_table, user_id, new_medications)
+    except Exception as e:
+        print(f"Interaction check error: {str(e)}")
+        return []
 
 
 def list_medications(user_id):
@@ -128,7 +123,6 @@ def list_medications(user_id):
 
         items = response.get('Items', [])
 
-        # For AWS integration type, return data directly
         return {
             'medications': items,
             'count': len(items)
@@ -136,7 +130,7 @@ def list_medications(user_id):
 
     except Exception as e:
         print(f"List error: {str(e)}")
-        return {'error': str(e)}
+        return error_response(500, str(e))
 
 
 def get_medication(user_id, medication_id):
@@ -152,14 +146,13 @@ def get_medication(user_id, medication_id):
         )
 
         if 'Item' not in response:
-            return {'error': 'Medication not found'}
+            return error_response(404, 'Medication not found')
 
-        # For AWS integration type, return data directly
         return response['Item']
 
     except Exception as e:
         print(f"Get error: {str(e)}")
-        return {'error': str(e)}
+        return error_response(500, str(e))
 
 
 def update_medication(user_id, medication_id, body):
@@ -168,50 +161,27 @@ def update_medication(user_id, medication_id, body):
     """
     try:
         if not medication_id:
-            return {
-                'statusCode': 400,
-                'body': json.dumps({'error': 'medicationId is required'})
-            }
+            return error_response(400, 'medicationId is required')
         
         timestamp = int(datetime.now().timestamp() * 1000)
         
         # Build update expression
-        update_expr = "SET updatedAt = :ts"
-        expr_values = {':ts': timestamp}
-        
-        # Only update provided fields
-        if 'name' in body:
-            update_expr += ", #name = :name"
-            expr_values[':name'] = body['name']
-            expr_values['#name'] = 'name'  # name is reserved keyword
-        
-        if 'dosage' in body:
-            update_expr += ", dosage = :dosage"
-            expr_values[':dosage'] = body['dosage']
-        
-        if 'frequency' in body:
-            update_expr += ", frequency = :freq"
-            expr_values[':freq'] = body['frequency']
-        
-        if 'reminders' in body:
-            update_expr += ", reminders = :reminders"
-            expr_values[':reminders'] = body['reminders']
-        
-        if 'active' in body:
-            update_expr += ", active = :active"
-            expr_values[':active'] = body['active']
-        
-        response = medications_table.update_item(
-            Key={
+        update_expr, expr_names, expr_values = build_update_expression(body, timestamp)
+
+        update_args = {
+            'Key': {
                 'userId': user_id,
                 'medicationId': medication_id
             },
-            UpdateExpression=update_expr,
-            ExpressionAttributeValues=expr_values,
-            ReturnValues='ALL_NEW'
-        )
+            'UpdateExpression': update_expr,
+            'ExpressionAttributeValues': expr_values,
+            'ReturnValues': 'ALL_NEW'
+        }
+        if expr_names:
+            update_args['ExpressionAttributeNames'] = expr_names
+
+        response = medications_table.update_item(**update_args)
 
-        # For AWS integration type, return data directly
         return {
             'medication': response['Attributes'],
             'message': 'Medication updated successfully'
@@ -219,7 +189,41 @@ def update_medication(user_id, medication_id, body):
 
     except Exception as e:
         print(f"Update error: {str(e)}")
-        return {'error': str(e)}
+        return error_response(500, str(e))
+
+
+def build_update_expression(body, timestamp):
+    """
+    Helper: Build the SET expression for the fields present in an update body
+    Returns: (update_expression, attribute_names, attribute_values)
+    """
+    update_expr = "SET updatedAt = :ts"
+    expr_names = {}
+    expr_values = {':ts': timestamp}
+
+    # Only update provided fields
+    if 'name' in body:
+        update_expr += ", #name = :name"
+        expr_values[':name'] = body['name']
+        expr_names['#name'] = 'name'  # name is reserved keyword
+
+    if 'dosage' in body:
+        update_expr += ", dosage = :dosage"
+        expr_values[':dosage'] = body['dosage']
+
+    if 'frequency' in body:
+        update_expr += ", frequency = :freq"
+        expr_values[':freq'] = body['frequency']
+
+    if 'reminders' in body:
+        update_expr += ", reminders = :reminders"
+        expr_values[':reminders'] = body['reminders']
+
+    if 'active' in body:
+        update_expr += ", active = :active"
+        expr_values[':active'] = body['active']
+
+    return update_expr, expr_names, expr_values
 
 
 def delete_medication(user_id, medication_id):
@@ -228,7 +232,7 @@ def delete_medication(user_id, medication_id):
     """
     try:
         if not medication_id:
-            return {'error': 'medicationId is required'}
+            return error_response(400, 'medicationId is required')
 
         medications_table.delete_item(
             Key={
@@ -237,9 +241,8 @@ def delete_medication(user_id, medication_id):
             }
         )
 
-        # For AWS integration type, return data directly
         return {'message': 'Medication deleted successfully'}
 
     except Exception as e:
         print(f"Delete error: {str(e)}")
-        return {'error': str(e)}
+        return error_response(500, str(e))
@@ -1,75 +1,91 @@
 """
 Lambda: prescription-analyzer
 Purpose: Extract medication data from prescription images using AWS Textract
-Receives: S3 image path
-Returns: Extracted medication data (name, dosage, frequency, etc.)
+Receives: S3 image path, or a list of S3 image paths for multi-page prescriptions
+Returns: Extracted medication data (name, dosage, frequency, etc.) and drug-interaction warnings
 """
 
-import json
-import boto3
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from api_gateway import get_user_id, parse_body
+from aws_clients import lazy_client, lazy_table
+from drug_interactions import check_interactions
+from responses import api_handler, error_response
+from tracing import trace_handler
 
-# Initialize AWS clients
-textract = boto3.client('textract', region_name='us-west-1')
-dynamodb = boto3.resource('dynamodb', region_name='us-west-1')
-s3 = boto3.client('s3', region_name='us-west-1')
+# Initialize AWS clients (created on first use)
+textract = lazy_client('textract')
+s3 = lazy_client('s3')
 
 # DynamoDB table references
-prescription_table = dynamodb.Table('PrescriptionData')
-medications_table = dynamodb.Table('Medications')
+prescription_table = lazy_table('PrescriptionData')
+medications_table = lazy_table('Medications')
 
+# Multi-document analysis limits
+MAX_DOCUMENTS = 10  # Max pages per request
+MAX_TEXTRACT_WORKERS = 5  # Concurrent Textract calls per invocation
 
+# OCR image normalization settings
+NORMALIZED_CONTENT_TYPES = ['image/jpeg', 'image/png', 'image/webp']
+OCR_MAX_DIMENSION = 2048  # Longest side in pixels - enough detail for printed labels
+OCR_JPEG_QUALITY = 85
+S3_READ_CHUNK_SIZE = 256 * 1024
+
+# Decoding is bounded so a 5MB upload can't expand into an image that exhausts the Lambda's memory:
+# at most OCR_MAX_IMAGE_PIXELS decoded pixels per image (6000x6000 - 24MP cameras and 600dpi scans;
+# larger JPEGs pass once draft() has reduced them), and at most MAX_NORMALIZE_WORKERS images decoding
+# at once while the other Textract workers wait or send their S3 reference
+OCR_MAX_IMAGE_PIXELS = 36_000_000
+MAX_NORMALIZE_WORKERS = 2
+normalize_slots = threading.BoundedSemaphore(MAX_NORMALIZE_WORKERS)
+
+
+@trace_handler('prescription-analyzer')
+@api_handler
 def lambda_handler(event, context):
     """
     Main Lambda handler for prescription image analysis
     """
     try:
-        # Parse request body - handles both direct body and nested body structure
-        if isinstance(event.get('body'), str):
-            body = json.loads(event.get('body', '{}'))
-        elif isinstance(event.get('body'), dict):
-            body = event.get('body', {})
-        else:
-            body = {}
-
-        # Get user_id from authorizer context (handles both AWS and AWS_PROXY integration types)
-        try:
-            # AWS_PROXY integration type
-            user_id = event['requestContext']['authorizer']['claims']['sub']
-        except (KeyError, TypeError):
-            # AWS integration type - authorizer context is in different location
-            user_id = event['requestContext']['authorizer'].get('sub') or event['requestContext']['authorizer'].get('principalId')
+        # Parse request body and user_id (handles both AWS and AWS_PROXY integration types)
+        body = parse_body(event)
+        user_id = get_user_id(event)
 
         if not user_id:
-            return {'error': 'Unauthorized - missing user ID'}
+            return error_response(401, 'Unauthorized - missing user ID')
 
-        s3_key = body.get('s3_key', '').strip()  # e.g., 'prescriptions/user123/image.jpg'
+        # Accept a list of keys for multi-page prescriptions, or a single key
+        s3_keys = body.get('s3_keys') or [body.get('s3_key', '')]
+        if not isinstance(s3_keys, list):
+            return {'error': 's3_keys must be a list'}
+        s3_keys = [key.strip() for key in s3_keys if isinstance(key, str) and key.strip()]
 
-        if not s3_key:
+        if not s3_keys:
             return {'error': 'S3 key is required'}
-        
-        # Call Textract to analyze the prescription image
-        textract_response = textract.analyze_document(
-            Document={
-                'S3Object': {
-                    'Bucket': 'beaumed-prescriptions',
-                    'Name': s3_key
-                }
-            },
-            FeatureTypes=['FORMS', 'TABLES']
+        if len(s3_keys) > MAX_DOCUMENTS:
+            return {'error': f'Too many documents. Maximum is {MAX_DOCUMENTS}'}
+        # Every key is OCR'd (and downloaded) with the Lambda's role, so it must be under the user's prefix
+        if not all(verify_file_ownership(user_id, key) for key in s3_keys):
+            return error_response(403, 'Forbidden - file does not belong to user')
+
+        # Analyze all documents concurrently - total latency tracks the slowest page
+        documents = analyze_documents(s3_keys)
+        succeeded = [doc for doc in documents if doc['status'] == 'success']
+        if not succeeded:
+            return {
+                'error': 'Could not analyze any of the provided documents',
+                'documents': [strip_document_text(doc) for doc in documents]
+            }
+
+        full_text = ' '.join(doc['text'] for doc in succeeded)
+
+        # Merge medications across pages, keeping the first occurrence of each
+        medications = dedupe_medications(
+            med for doc in succeeded for med in doc['medications']
         )
         
-        # Extract text from Textract response
-        extracted_text = []
-        for block in textract_response['Blocks']:
-            if block['BlockType'] == 'LINE':
-                extracted_text.append(block.get('Text', ''))
-        
-        full_text = ' '.join(extracted_text)
-        
-        # Simple parsing (in production, use more sophisticated NLP)
-        medications = parse_medications(full_text)
-        
         # Store prescription data in DynamoDB
         prescription_id = f"rx-{int(datetime.now().timestamp() * 1000)}"
         timestamp = int(datetime.now().timestamp() * 1000)
@@ -79,12 +95,20 @@ def lambda_handler(event, context):
                 'userId': user_id,
                 'prescriptionId': prescription_id,
                 'timestamp': timestamp,
-                's3_key': s3_key,
+                's3_key': s3_keys[0],
+                's3_keys': s3_keys,
                 'extracted_text': full_text,
                 'medications': medications
             }
         )
         
+        # Check the imported medications against the user's active ones (and each other) before adding them
+        try:
+            interaction_warnings = check_interactions(medications_table, user_id, medications)
+        except Exception as e:
+            print(f"Interaction check error: {str(e)}")
+            interaction_warnings = []
+
         # Add medications to Medications table
         for med in medications:
             medications_table.put_item(
@@ -106,12 +130,180 @@ def lambda_handler(event, context):
         return {
             'prescriptionId': prescription_id,
             'medications': medications,
+            'documents': [strip_document_text(doc) for doc in documents],
+            'interactionWarnings': interaction_warnings,
             'message': f'Successfully extracted {len(medications)} medications from prescription'
         }
 
     except Exception as e:
         print(f"Error: {str(e)}")
-        return {'error': str(e)}
+        return error_response(500, str(e))
+
+
+def analyze_documents(s3_keys):
+    """
+    Run Textract over several S3 documents in a bounded thread pool
+    Returns one result per key, in request order
+    """
+    if len(s3_keys) == 1:
+        return [analyze_document(s3_keys[0])]
+
+    with ThreadPoolExecutor(max_workers=min(len(s3_keys), MAX_TEXTRACT_WORKERS)) as executor:
+        return list(executor.map(analyze_document, s3_keys))
+
+
+def analyze_document(s3_key):
+    """
+    Extract text and medications from a single prescription document
+    Failures are reported per document instead of failing the whole request
+    """
+    try:
+        # Downscaled greyscale images are faster and more accurate to OCR
+        document, normalized = build_textract_document(s3_key)
+
+        textract_response = textract.analyze_document(
+            Document=document,
+            FeatureTypes=['FORMS', 'TABLES']
+        )
+
+        # Extract text from Textract response
+        extracted_text = []
+        for block in textract_response['Blocks']:
+            if block['BlockType'] == 'LINE':
+                extracted_text.append(block.get('Text', ''))
+
+        text = ' '.join(extracted_text)
+
+        # Simple parsing (in production, use more sophisticated NLP)
+        medications = parse_medications(text)
+
+        return {
+            's3_key': s3_key,
+            'status': 'success',
+            'normalized': normalized,
+            'text': text,
+            'medications': medications
+        }
+
+    except Exception as e:
+        print(f"Textract error for {s3_key}: {str(e)}")
+        return {
+            's3_key': s3_key,
+            'status': 'error',
+            'error': str(e),
+            'text': '',
+            'medications': []
+        }
+
+
+def build_textract_document(s3_key):
+    """
+    Build the Textract Document argument for an S3 object
+    Images are normalized and sent as bytes; PDFs (and any failure) fall back to the S3 reference
+    Returns: (document, normalized)
+    """
+    s3_document = {
+        'S3Object': {
+            'Bucket': 'beaumed-prescriptions',
+            'Name': s3_key
+        }
+    }
+
+    # Without the Pillow layer images go to Textract unmodified
+    if load_pillow() is None:
+        return s3_document, False
+
+    try:
+        response = s3.get_object(Bucket='beaumed-prescriptions', Key=s3_key)
+        body = response['Body']
+
+        if response.get('ContentType') not in NORMALIZED_CONTENT_TYPES:
+            body.close()
+            return s3_document, False
+
+        # Stream the object in chunks rather than one large read
+        raw = io.BytesIO()
+        for chunk in body.iter_chunks(chunk_size=S3_READ_CHUNK_SIZE):
+            raw.write(chunk)
+
+        with normalize_slots:
+            return {'Bytes': normalize_image(raw.getvalue())}, True
+
+    except Exception as e:
+        print(f"Image normalization error for {s3_key}: {str(e)}")
+        return s3_document, False
+
+
+def normalize_image(image_bytes):
+    """
+    Prepare a phone photo for OCR: convert to greyscale, downscale to OCR_MAX_DIMENSION,
+    fix EXIF rotation and re-encode as JPEG (also converts WebP, which Textract does not accept)
+    Raises ValueError for images over OCR_MAX_IMAGE_PIXELS (the caller sends the S3 reference instead)
+    """
+    Image, ImageOps = load_pillow()
+    image = Image.open(io.BytesIO(image_bytes))
+
+    # Let the JPEG decoder skip full-resolution decoding where possible
+    image.draft('L', (OCR_MAX_DIMENSION, OCR_MAX_DIMENSION))
+
+    # Size is known from the header (after draft's reduction), before any pixels are decoded
+    if image.width * image.height > OCR_MAX_IMAGE_PIXELS:
+        raise ValueError(f'Image too large to normalize ({image.width}x{image.height})')
+
+    # Greyscale and downscale first, so only the small image is copied by the rotation
+    # (convert and thumbnail keep the EXIF orientation in image.info)
+    image = image.convert('L')
+    image.thumbnail((OCR_MAX_DIMENSION, OCR_MAX_DIMENSION), Image.LANCZOS)
+    image = ImageOps.exif_transpose(image)
+
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=OCR_JPEG_QUALITY, optimize=True)
+    return output.getvalue()
+
+
+def load_pillow():
+    """
+    Helper: Pillow's (Image, ImageOps), or None without the Pillow layer
+    Imported on first use to keep Pillow out of cold-start init for requests that never normalize an image
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+    # Pillow refuses images over twice this at open (decompression bombs)
+    Image.MAX_IMAGE_PIXELS = OCR_MAX_IMAGE_PIXELS
+    return Image, ImageOps
+
+
+def verify_file_ownership(user_id, s3_key):
+    """
+    Helper: Verify that an S3 key belongs to the requesting user
+    (prevents users from analyzing each other's prescriptions)
+    """
+    expected_prefix = f"prescriptions/{user_id}/"
+    return s3_key.startswith(expected_prefix)
+
+
+def strip_document_text(document):
+    """
+    Helper: Per-document status for the response (without the raw OCR text)
+    """
+    return {key: value for key, value in document.items() if key != 'text'}
+
+
+def dedupe_medications(medications):
+    """
+    Helper: Drop repeated medications found on multiple pages (matched by name)
+    """
+    seen = set()
+    unique = []
+    for med in medications:
+        key = med.get('name', '').lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(med)
+    return unique
 
 
 def parse_medications(text):
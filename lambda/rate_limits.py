@@ -0,0 +1,87 @@
+"""
+Shared module: rate_limits
+Purpose: Per-user and global token buckets in front of expensive downstream calls (e.g. Bedrock)
+Each bucket holds `limit` tokens per window. A request takes one token with a conditional atomic ADD
+on the RateLimits item for the bucket's current window, so every container draws from the same count.
+In-container fast path: once this container has seen a bucket run dry (or has itself admitted `limit`
+requests) in the current window, further requests are rejected without a DynamoDB call
+Package this file alongside lambda_function.py in each deployment zip
+"""
+
+import threading
+import time
+from aws_clients import lazy_table
+
+# DynamoDB table reference (bucketId partition key, expiresAt TTL attribute)
+rate_limits_table = lazy_table('RateLimits')
+
+# Buckets refill at the start of every window
+WINDOW_SECONDS = 60
+# Window items outlive their window briefly, then DynamoDB TTL removes them
+EXPIRY_GRACE_SECONDS = 300
+
+# Container state, keyed by (bucket_id, window_start)
+local_counts = {}
+exhausted_windows = set()
+local_lock = threading.Lock()
+
+
+def check_rate_limits(buckets):
+    """
+    Take one token from each (bucket_id, limit) in order, stopping at the first empty bucket
+    List per-user buckets before shared ones so a user over their own limit never spends shared quota
+    Returns None when admitted, otherwise the seconds until the blocking bucket refills (for Retry-After)
+    """
+    now = time.time()
+    window_start = int(now // WINDOW_SECONDS) * WINDOW_SECONDS
+    prune_local_state(window_start)
+
+    for bucket_id, limit in buckets:
+        if not take_token(bucket_id, limit, window_start):
+            return max(1, int(window_start + WINDOW_SECONDS - now + 0.999))
+    return None
+
+
+def take_token(bucket_id, limit, window_start):
+    """
+    Helper: Take one token from a bucket for the current window; False when it is empty
+    DynamoDB errors other than an empty bucket fail open so an outage here doesn't take the API down
+    """
+    key = (bucket_id, window_start)
+    with local_lock:
+        if key in exhausted_windows or local_counts.get(key, 0) >= limit:
+            return False
+
+    try:
+        rate_limits_table.update_item(
+            Key={'bucketId': f'{bucket_id}#{window_start}'},
+            UpdateExpression='ADD tokensUsed :one SET expiresAt = :expires_at',
+            ConditionExpression='attribute_not_exists(tokensUsed) OR tokensUsed < :limit',
+            ExpressionAttributeValues={
+                ':one': 1,
+                ':limit': limit,
+                ':expires_at': window_start + WINDOW_SECONDS + EXPIRY_GRACE_SECONDS
+            }
+        )
+    except Exception as e:
+        if (getattr(e, 'response', None) or {}).get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            with local_lock:
+                exhausted_windows.add(key)
+            return False
+        print(f"Rate limit check failed for {bucket_id}: {str(e)}")
+        return True
+
+    with local_lock:
+        local_counts[key] = local_counts.get(key, 0) + 1
+    return True
+
+
+def prune_local_state(window_start):
+    """
+    Helper: Forget container state for windows that have ended
+    """
+    with local_lock:
+        for key in [key for key in local_counts if key[1] < window_start]:
+            del local_counts[key]
+        for key in [key for key in exhausted_windows if key[1] < window_start]:
+            exhausted_windows.discard(key)
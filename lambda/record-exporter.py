@@ -0,0 +1,330 @@
+"""
+Lambda: record-exporter
+Purpose: Export a user's medications, prescriptions, saved doctors and chat history as one download
+Receives: POST /export (start a job), GET /export?job_id= (poll it)
+Returns: A job ID (202), then the job status - once complete, a presigned GET URL for a gzip-compressed
+NDJSON file in S3 (one {"table", "item"} object per line)
+Exports can outlast API Gateway's 29s integration timeout, so POST only records a pending job in
+ExportJobs and invokes this function again asynchronously ({"action": "export_records"}) to run it.
+Items are paged out of DynamoDB with generators and streamed through gzip into an S3 multipart upload,
+so memory stays bounded by one upload part regardless of how much history a user has
+"""
+
+import os
+import time
+import zlib
+from datetime import datetime
+from api_gateway import get_query_parameters, get_user_id
+from aws_clients import lazy_client, lazy_table
+from conversation_archive import has_archives, iter_archived_turns
+from responses import api_handler, dumps, error_response
+from s3_signing import create_signer
+from tracing import trace_handler
+
+# Initialize AWS clients (created on first use)
+s3 = lazy_client('s3')
+lambda_client = lazy_client('lambda')
+
+# DynamoDB table reference for export job status
+export_jobs_table = lazy_table('ExportJobs')
+
+# Exported tables, in file order (every table is keyed by userId)
+EXPORT_TABLES = [
+    ('Medications', lazy_table('Medications')),
+    ('PrescriptionData', lazy_table('PrescriptionData')),
+    ('Doctors', lazy_table('Doctors')),
+    ('ConversationHistory', lazy_table('ConversationHistory'))
+]
+
+# S3 configuration
+BUCKET_NAME = 'beaumed-prescriptions'
+S3_REGION = 'us-west-1'
+EXPORT_PREFIX = 'exports'
+URL_EXPIRY_SECONDS = 3600  # 1 hour
+
+# Multipart upload: buffer compressed output up to one part (S3 minimum is 5MB for every part but the last)
+EXPORT_PART_SIZE = 8 * 1024 * 1024
+GZIP_WBITS = 31  # zlib window with a gzip header and trailer
+
+# Async jobs: the function invokes itself by name (the api-router's name when deployed behind it)
+EXPORT_FUNCTION_NAME = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'record-exporter')
+EXPORT_JOB_TTL_SECONDS = 7 * 24 * 3600  # Job records expire (TTL on expiresAt) after a week
+
+
+@trace_handler('record-exporter')
+@api_handler
+def lambda_handler(event, context):
+    """
+    Main Lambda handler for record exports
+    """
+    try:
+        # Asynchronous self-invocation started by POST /export (never reachable through API Gateway)
+        if event.get('action') == 'export_records' and 'httpMethod' not in event:
+            return run_export_job(event.get('userId'), event.get('jobId'))
+
+        user_id = get_user_id(event)
+
+        if not user_id:
+            return error_response(401, 'Unauthorized - missing user ID')
+
+        http_method = event.get('httpMethod', 'POST')
+        if http_method == 'POST':
+            return start_export_job(user_id)
+        if http_method == 'GET':
+            return get_export_job(user_id, get_query_parameters(event).get('job_id'))
+        return error_response(405, 'Method not allowed')
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return error_response(500, str(e))
+
+
+def start_export_job(user_id):
+    """
+    Record a pending export job and start it asynchronously
+    Returns 202 with the job_id to poll with GET /export?job_id=
+    """
+    now = datetime.utcnow()
+    job_id = f"export-{int(now.timestamp() * 1000)}"
+
+    export_jobs_table.put_item(
+        Item={
+            'userId': user_id,
+            'jobId': job_id,
+            'status': 'pending',
+            'createdAt': int(now.timestamp() * 1000),
+            'expiresAt': int(now.timestamp()) + EXPORT_JOB_TTL_SECONDS
+        }
+    )
+
+    try:
+        lambda_client.invoke(
+            FunctionName=EXPORT_FUNCTION_NAME,
+            InvocationType='Event',
+            Payload=dumps({'action': 'export_records', 'userId': user_id, 'jobId': job_id})
+        )
+    except Exception:
+        update_job_status(user_id, job_id, 'failed', {'message': 'Export could not be started'})
+        raise
+
+    return {
+        'statusCode': 202,
+        'body': dumps({'job_id': job_id, 'status': 'pending'})
+    }
+
+
+def run_export_job(user_id, job_id):
+    """
+    Run a pending export job and record its outcome
+    Claiming the job (pending -> running) makes a duplicate async delivery a no-op, and failures are
+    recorded instead of raised so Lambda's async retries don't start the export again
+    """
+    try:
+        export_jobs_table.update_item(
+            Key={'userId': user_id, 'jobId': job_id},
+            UpdateExpression='SET #status = :running',
+            ConditionExpression='#status = :pending',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':running': 'running', ':pending': 'pending'}
+        )
+    except Exception as e:
+        print(f"Export job {job_id} not started: {str(e)}")
+        return {'job_id': job_id, 'status': 'skipped'}
+
+    try:
+        result = export_user_records(user_id)
+        update_job_status(user_id, job_id, 'complete', result)
+        return dict(result, job_id=job_id, status='complete')
+
+    except Exception as e:
+        print(f"Export error: {str(e)}")
+        update_job_status(user_id, job_id, 'failed', {'message': str(e)})
+        return {'job_id': job_id, 'status': 'failed'}
+
+
+def get_export_job(user_id, job_id):
+    """
+    Status of one of the user's export jobs: pending, running, failed or complete
+    Complete jobs include a freshly presigned download link, so polling late still gets a working URL
+    """
+    if not job_id:
+        return {'error': 'job_id is required'}
+
+    job = export_jobs_table.get_item(Key={'userId': user_id, 'jobId': job_id}).get('Item')
+    if not job:
+        return error_response(404, 'Export job not found')
+
+    response = {'job_id': job_id, 'status': job['status']}
+    if job['status'] == 'failed':
+        response['message'] = job.get('message', 'Export failed')
+    elif job['status'] == 'complete':
+        response.update({
+            'download_url': presign_download(job['s3Key'], job['fileName']),
+            'expires_in': URL_EXPIRY_SECONDS,
+            'size': job['size'],
+            'counts': job['counts']
+        })
+    return response
+
+
+def export_user_records(user_id):
+    """
+    Stream every exported table for a user into S3
+    Returns: the file's S3 key, download file name, compressed size and item counts per table
+    """
+    exported_at = datetime.utcnow()
+    s3_key = f"{EXPORT_PREFIX}/{user_id}/{exported_at.strftime('%Y%m%dT%H%M%SZ')}.ndjson.gz"
+    counts = {table_name: 0 for table_name, _ in EXPORT_TABLES}
+
+    lines = iter_export_lines(user_id, counts)
+    size = upload_stream(s3_key, iter_gzip_chunks(lines))
+
+    return {
+        's3Key': s3_key,
+        'fileName': f"beaumed-export-{exported_at.strftime('%Y-%m-%d')}.ndjson.gz",
+        'size': size,
+        'counts': counts
+    }
+
+
+def update_job_status(user_id, job_id, status, attributes):
+    """
+    Helper: Set a job's status along with result attributes (e.g. s3Key and counts, or a failure message)
+    """
+    names = {'#status': 'status'}
+    values = {':status': status}
+    assignments = ['#status = :status']
+    for index, (name, value) in enumerate(attributes.items()):
+        names[f'#a{index}'] = name
+        values[f':a{index}'] = value
+        assignments.append(f'#a{index} = :a{index}')
+
+    export_jobs_table.update_item(
+        Key={'userId': user_id, 'jobId': job_id},
+        UpdateExpression='SET ' + ', '.join(assignments),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values
+    )
+
+
+def presign_download(s3_key, file_name):
+    """
+    Helper: Presigned GET URL that downloads the export under its file name
+    """
+    return create_signer(BUCKET_NAME, S3_REGION, URL_EXPIRY_SECONDS).presign_get(
+        s3_key, {'response-content-disposition': f'attachment; filename="{file_name}"'}
+    )
+
+
+def iter_table_items(table, user_id):
+    """
+    Helper: Yield a user's items from a table one DynamoDB page at a time
+    """
+    query_args = {
+        'KeyConditionExpression': 'userId = :uid',
+        'ExpressionAttributeValues': {':uid': user_id}
+    }
+    while True:
+        response = table.query(**query_args)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def iter_export_lines(user_id, counts):
+    """
+    Helper: Yield one encoded NDJSON line per exported item, counting items per table
+    """
+    for table_name, table in EXPORT_TABLES:
+        if table_name == 'ConversationHistory':
+            items = iter_conversation_items(table, user_id)
+        else:
+            items = iter_table_items(table, user_id)
+        for item in items:
+            counts[table_name] += 1
+            yield (dumps({'table': table_name, 'item': item}) + '\n').encode('utf-8')
+
+
+def iter_conversation_items(table, user_id):
+    """
+    Helper: Yield a user's chat turns, archived (oldest, so they go first) then in the table
+    Archived turns stay in the table until TTL deletes them; those archived before the export started
+    are already in the archives that were read, so they are skipped
+    """
+    started_at = int(time.time() * 1000)
+    if has_archives(user_id):
+        for turn in iter_archived_turns(user_id):
+            yield dict(turn, userId=user_id)
+
+    for item in iter_table_items(table, user_id):
+        if 'archivedAt' in item and item['archivedAt'] < started_at:
+            continue
+        yield item
+
+
+def iter_gzip_chunks(chunks):
+    """
+    Helper: Gzip-compress a stream of byte chunks, yielding compressed output as zlib produces it
+    """
+    compressor = zlib.compressobj(wbits=GZIP_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def upload_stream(s3_key, chunks):
+    """
+    Helper: Upload a stream of byte chunks to S3 as a multipart upload, one part per EXPORT_PART_SIZE
+    Aborts the upload if the stream or any part fails, so no orphaned parts are billed
+    Returns: total bytes uploaded
+    """
+    upload_id = s3.create_multipart_upload(
+        Bucket=BUCKET_NAME,
+        Key=s3_key,
+        ContentType='application/gzip'
+    )['UploadId']
+
+    try:
+        parts = []
+        buffer = bytearray()
+        size = 0
+        for chunk in chunks:
+            buffer.extend(chunk)
+            if len(buffer) >= EXPORT_PART_SIZE:
+                parts.append(upload_part(s3_key, upload_id, len(parts) + 1, bytes(buffer)))
+                size += len(buffer)
+                buffer.clear()
+
+        # Last part (may be smaller than the minimum; also covers an empty export)
+        if buffer or not parts:
+            parts.append(upload_part(s3_key, upload_id, len(parts) + 1, bytes(buffer)))
+            size += len(buffer)
+
+        s3.complete_multipart_upload(
+            Bucket=BUCKET_NAME,
+            Key=s3_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+        return size
+
+    except Exception:
+        s3.abort_multipart_upload(Bucket=BUCKET_NAME, Key=s3_key, UploadId=upload_id)
+        raise
+
+
+def upload_part(s3_key, upload_id, part_number, data):
+    """
+    Helper: Upload one part and return its completion entry
+    """
+    response = s3.upload_part(
+        Bucket=BUCKET_NAME,
+        Key=s3_key,
+        UploadId=upload_id,
+        PartNumber=part_number,
+        Body=data
+    )
+    return {'PartNumber': part_number, 'ETag': response['ETag']}
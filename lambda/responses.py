@@ -0,0 +1,134 @@
+"""
+Shared module: responses
+Purpose: JSON encoding of handler results and consistent API Gateway response envelopes
+Handles DynamoDB Decimals, string/number sets and datetimes in a single encoding pass, using orjson
+when it is packaged (e.g. from a Lambda layer) and the standard library json module otherwise
+Package this file alongside lambda_function.py in each deployment zip
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from functools import wraps
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+NATIVE_TYPES = (str, int, float, bool, type(None))
+
+JSON_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*'
+}
+
+
+def encode_default(value):
+    """
+    Encode the types boto3 returns that JSON can't represent natively
+    Decimal -> int when integral, else float; set -> list; date/datetime -> ISO 8601
+    """
+    if isinstance(value, Decimal):
+        integer = int(value)
+        return integer if integer == value else float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(payload):
+    """
+    Serialize a payload to a JSON string
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, default=encode_default).decode('utf-8')
+    return json.dumps(payload, default=encode_default, separators=(',', ':'))
+
+
+def to_json_native(payload):
+    """
+    Convert a payload to plain JSON types (for the AWS integration type, where the Lambda
+    runtime serializes the returned object with the standard json module)
+    """
+    if orjson is not None:
+        return orjson.loads(orjson.dumps(payload, default=encode_default))
+    return convert_native(payload)
+
+
+def convert_native(value):
+    """
+    Recursively replace non-JSON types (faster than a stdlib json dumps/loads round trip)
+    """
+    value_type = type(value)
+    if value_type is dict:
+        return {key: convert_native(element) for key, element in value.items()}
+    if value_type is list:
+        return [convert_native(element) for element in value]
+    if value_type in NATIVE_TYPES:
+        return value
+    return convert_native(encode_default(value))
+
+
+def is_proxy_event(event):
+    """
+    True for AWS_PROXY integration events (mapping-template events don't carry isBase64Encoded)
+    """
+    return 'isBase64Encoded' in event
+
+
+def error_response(status_code, message, headers=None):
+    """
+    Error envelope for early returns; api_handler adapts it to the integration type
+    """
+    response = {
+        'statusCode': status_code,
+        'body': json.dumps({'error': message})
+    }
+    if headers:
+        response['headers'] = headers
+    return response
+
+
+def build_response(event, result):
+    """
+    Build the response for the event's integration type from a handler result
+    result: a payload dict, or an envelope {statusCode, body[, headers]} from an early return
+    AWS_PROXY: {statusCode, headers, body} - payloads with an 'error' key get status 400
+    AWS: the payload itself as plain JSON types (status codes come from integration responses)
+    """
+    if not isinstance(result, dict):
+        return result
+
+    headers = JSON_HEADERS
+    if 'statusCode' in result:
+        status_code = result['statusCode']
+        body = result.get('body')
+        if result.get('headers'):
+            headers = dict(JSON_HEADERS, **result['headers'])
+        if is_proxy_event(event) and isinstance(body, str):
+            return {'statusCode': status_code, 'headers': headers, 'body': body}
+        payload = json.loads(body) if isinstance(body, str) and body else body or {}
+    else:
+        status_code = 400 if 'error' in result else 200
+        payload = result
+
+    if is_proxy_event(event):
+        return {'statusCode': status_code, 'headers': headers, 'body': dumps(payload)}
+    return to_json_native(payload)
+
+
+def api_handler(handler):
+    """
+    Decorator for API Gateway lambda_handlers: returns consistent, serializable responses
+    Non-API events (e.g. S3 notifications, without httpMethod) get the handler's result unchanged
+    """
+    @wraps(handler)
+    def wrapper(event, context):
+        result = handler(event, context)
+        if not isinstance(event, dict) or 'httpMethod' not in event:
+            return result
+        return build_response(event, result)
+    return wrapper
@@ -5,37 +5,83 @@ Provides secure, time-limited upload access without exposing AWS credentials
 """
 
 import json
-import boto3
-from datetime import datetime
+import base64
+import math
+from urllib.parse import unquote_plus
 import uuid
+from api_gateway import get_user_id, parse_body
+from aws_clients import lazy_client, lazy_table
+from responses import api_handler, error_response
+from s3_signing import create_signer
+from tracing import trace_handler
 
-# Initialize AWS clients
-s3 = boto3.client('s3', region_name='us-west-1')
+# Initialize AWS clients (created on first use)
+s3 = lazy_client('s3')
 
+# DynamoDB table reference (file metadata index, kept current by S3 upload events)
+user_files_table = lazy_table('UserFiles')
 
+# S3 configuration
+BUCKET_NAME = 'beaumed-prescriptions'
+S3_REGION = 'us-west-1'
+ALLOWED_CONTENT_TYPES = ['image/jpeg', 'image/png', 'application/pdf', 'image/webp']
+MAX_UPLOAD_SIZE = 5 * 1024 * 1024  # 5MB max
+URL_EXPIRY_SECONDS = 3600  # 1 hour
+MAX_BATCH_FILES = 10
+
+# Multipart uploads (large multi-page PDFs)
+MULTIPART_PART_SIZE = 8 * 1024 * 1024  # S3 minimum is 5MB for every part but the last
+MAX_MULTIPART_UPLOAD_SIZE = 100 * 1024 * 1024  # 100MB max
+
+# File listing pagination
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+# Index backfill: stop listing with this much invocation time left and return a start_token to resume from
+BACKFILL_RESERVE_MS = 10000
+BACKFILL_PAGE_SIZE = 1000
+
+
+@trace_handler('s3-presigner')
+@api_handler
 def lambda_handler(event, context):
     """
     Main Lambda handler for presigned URL generation
     """
     try:
-        # Parse request body - handles both direct body and nested body structure
-        if isinstance(event.get('body'), str):
-            body = json.loads(event.get('body', '{}'))
-        elif isinstance(event.get('body'), dict):
-            body = event.get('body', {})
-        else:
-            body = {}
+        # S3 event notifications keep the file metadata index current
+        if event.get('Records'):
+            return index_s3_events(event['Records'])
 
-        # Get user_id from authorizer context (handles both AWS and AWS_PROXY integration types)
-        try:
-            # AWS_PROXY integration type
-            user_id = event['requestContext']['authorizer']['claims']['sub']
-        except (KeyError, TypeError):
-            # AWS integration type - authorizer context is in different location
-            user_id = event['requestContext']['authorizer'].get('sub') or event['requestContext']['authorizer'].get('principalId')
+        # Direct invocation (never an API request): index files uploaded before UserFiles existed
+        if event.get('action') == 'backfill_index' and 'httpMethod' not in event:
+            return backfill_file_index(event.get('start_token'), context)
+
+        # Parse request body and user_id (handles both AWS and AWS_PROXY integration types)
+        body = parse_body(event)
+        user_id = get_user_id(event)
 
         if not user_id:
-            return {'error': 'Unauthorized - missing user ID'}
+            return error_response(401, 'Unauthorized - missing user ID')
+
+        # Batch mode: presign several files in one call
+        if 'files' in body:
+            return create_batch_upload_urls(user_id, body.get('files'))
+
+        # Multipart mode: create / resume / complete / abort a resumable upload
+        action = body.get('action', '')
+        if action == 'create_multipart':
+            return create_multipart_upload(user_id, body)
+        elif action == 'resume_multipart':
+            return resume_multipart_upload(user_id, body)
+        elif action == 'complete_multipart':
+            return complete_multipart_upload(user_id, body)
+        elif action == 'abort_multipart':
+            return abort_multipart_upload(user_id, body)
+        elif action == 'list_files':
+            return list_user_files(user_id, body)
+        elif action:
+            return {'error': f'Unknown action: {action}'}
 
         file_type = body.get('file_type', 'image').strip()  # 'image', 'document', 'medical-record'
         file_name = body.get('file_name', '').strip()
@@ -45,31 +91,28 @@ def lambda_handler(event, context):
             return {'error': 'file_name is required'}
 
         # Security: only allow certain file types
-        allowed_types = ['image/jpeg', 'image/png', 'application/pdf', 'image/webp']
         content_type = body.get('content_type', 'image/jpeg').strip()
-        if content_type not in allowed_types:
-            return {'error': f'Content type not allowed. Allowed: {", ".join(allowed_types)}'}
+        if content_type not in ALLOWED_CONTENT_TYPES:
+            return {'error': f'Content type not allowed. Allowed: {", ".join(ALLOWED_CONTENT_TYPES)}'}
         
         # Generate S3 key with user isolation
-        file_extension = file_name.split('.')[-1] if '.' in file_name else ''
-        unique_id = str(uuid.uuid4())[:8]
-        s3_key = f"prescriptions/{user_id}/{file_type}/{unique_id}.{file_extension}"
+        s3_key = build_s3_key(user_id, file_type, file_name)
         
         # Generate presigned POST (for browser uploads)
         presigned_post = generate_presigned_post(
             s3_key=s3_key,
             content_type=content_type,
-            max_file_size=5 * 1024 * 1024  # 5MB max
+            max_file_size=MAX_UPLOAD_SIZE
         )
         
         # Also generate presigned GET URL for retrieval (1 hour expiry)
         presigned_get = s3.generate_presigned_url(
             'get_object',
             Params={
-                'Bucket': 'beaumed-prescriptions',
+                'Bucket': BUCKET_NAME,
                 'Key': s3_key
             },
-            ExpiresIn=3600  # 1 hour
+            ExpiresIn=URL_EXPIRY_SECONDS
         )
 
         # For AWS integration type, return data directly
@@ -82,7 +125,7 @@ def lambda_handler(event, context):
 
     except Exception as e:
         print(f"Error: {str(e)}")
-        return {'error': str(e)}
+        return error_response(500, str(e))
 
 
 def generate_presigned_post(s3_key, content_type, max_file_size):
@@ -92,7 +135,7 @@ def generate_presigned_post(s3_key, content_type, max_file_size):
     """
     try:
         response = s3.generate_presigned_post(
-            Bucket='beaumed-prescriptions',
+            Bucket=BUCKET_NAME,
             Key=s3_key,
             Fields={
                 'Content-Type': content_type
@@ -101,7 +144,7 @@ def generate_presigned_post(s3_key, content_type, max_file_size):
                 ['content-length-range', 0, max_file_size],
                 {'Content-Type': content_type}
             ],
-            ExpiresIn=3600  # 1 hour expiry
+            ExpiresIn=URL_EXPIRY_SECONDS
         )
         return response
     
@@ -110,6 +153,538 @@ def generate_presigned_post(s3_key, content_type, max_file_size):
         raise
 
 
+def create_batch_upload_urls(user_id, files):
+    """
+    Generate presigned POST + GET pairs for several files in one request
+    Expected files: [{file_name, content_type, file_type}, ...]
+    All files are signed locally with a single derived SigV4 signing key
+    """
+    if not isinstance(files, list) or not files:
+        return {'error': 'files must be a non-empty list'}
+    if len(files) > MAX_BATCH_FILES:
+        return {'error': f'Too many files. Maximum is {MAX_BATCH_FILES}'}
+
+    signer = get_signer()
+    results = []
+
+    for file in files:
+        if not isinstance(file, dict):
+            results.append({'error': 'Each file must be an object'})
+            continue
+
+        file_type = str(file.get('file_type', 'image')).strip()
+        file_name = str(file.get('file_name', '')).strip()
+        content_type = str(file.get('content_type', 'image/jpeg')).strip()
+
+        if not file_name:
+            results.append({'error': 'file_name is required'})
+            continue
+        if content_type not in ALLOWED_CONTENT_TYPES:
+            results.append({
+                'file_name': file_name,
+                'error': f'Content type not allowed. Allowed: {", ".join(ALLOWED_CONTENT_TYPES)}'
+            })
+            continue
+
+        s3_key = build_s3_key(user_id, file_type, file_name)
+        results.append({
+            'file_name': file_name,
+            's3_key': s3_key,
+            'presigned_post': signer.presign_post(s3_key, content_type, MAX_UPLOAD_SIZE),
+            'presigned_get': signer.presign_get(s3_key)
+        })
+
+    # For AWS integration type, return data directly
+    return {
+        'files': results,
+        'count': len(results),
+        'message': f'Presigned URLs generated for {len(results)} files'
+    }
+
+
+def build_s3_key(user_id, file_type, file_name):
+    """
+    Helper: Build a unique S3 key under the user's prefix
+    """
+    file_extension = file_name.split('.')[-1] if '.' in file_name else ''
+    unique_id = str(uuid.uuid4())[:8]
+    return f"prescriptions/{user_id}/{file_type}/{unique_id}.{file_extension}"
+
+
+def get_signer():
+    """
+    Helper: Create a signer for the prescriptions bucket bound to the current credentials and time
+    """
+    return create_signer(BUCKET_NAME, S3_REGION, URL_EXPIRY_SECONDS)
+
+
+def create_multipart_upload(user_id, body):
+    """
+    Start a multipart upload and presign a PUT URL for every part
+    Expected body: {action, file_name, content_type, file_type, file_size}
+    """
+    try:
+        file_type = str(body.get('file_type', 'document')).strip()
+        file_name = str(body.get('file_name', '')).strip()
+        content_type = str(body.get('content_type', 'application/pdf')).strip()
+
+        if not file_name:
+            return {'error': 'file_name is required'}
+        if content_type not in ALLOWED_CONTENT_TYPES:
+            return {'error': f'Content type not allowed. Allowed: {", ".join(ALLOWED_CONTENT_TYPES)}'}
+
+        part_count, error = get_part_count(body.get('file_size'))
+        if error:
+            return {'error': error}
+
+        s3_key = build_s3_key(user_id, file_type, file_name)
+        response = s3.create_multipart_upload(
+            Bucket=BUCKET_NAME,
+            Key=s3_key,
+            ContentType=content_type
+        )
+        upload_id = response['UploadId']
+
+        signer = get_signer()
+        parts = [
+            {'part_number': part_number, 'url': signer.presign_upload_part(s3_key, upload_id, part_number)}
+            for part_number in range(1, part_count + 1)
+        ]
+
+        # For AWS integration type, return data directly
+        return {
+            's3_key': s3_key,
+            'upload_id': upload_id,
+            'part_size': MULTIPART_PART_SIZE,
+            'parts': parts,
+            'message': f'Multipart upload started for {file_name} ({part_count} parts)'
+        }
+
+    except Exception as e:
+        print(f"Multipart create error: {str(e)}")
+        return error_response(500, str(e))
+
+
+def resume_multipart_upload(user_id, body):
+    """
+    Report which parts S3 already has and presign URLs for the missing ones
+    Expected body: {action, s3_key, upload_id, file_size}
+    """
+    try:
+        s3_key = str(body.get('s3_key', '')).strip()
+        upload_id = str(body.get('upload_id', '')).strip()
+
+        if not s3_key or not upload_id:
+            return {'error': 's3_key and upload_id are required'}
+        if not verify_file_ownership(user_id, s3_key):
+            return {'error': 'Forbidden - file does not belong to user'}
+
+        part_count, error = get_part_count(body.get('file_size'))
+        if error:
+            return {'error': error}
+
+        uploaded = list_uploaded_parts(s3_key, upload_id)
+        uploaded_numbers = {part['PartNumber'] for part in uploaded}
+
+        signer = get_signer()
+        missing = [
+            {'part_number': part_number, 'url': signer.presign_upload_part(s3_key, upload_id, part_number)}
+            for part_number in range(1, part_count + 1)
+            if part_number not in uploaded_numbers
+        ]
+
+        return {
+            's3_key': s3_key,
+            'upload_id': upload_id,
+            'part_size': MULTIPART_PART_SIZE,
+            'uploaded_parts': [
+                {'part_number': part['PartNumber'], 'etag': part['ETag'], 'size': part['Size']}
+                for part in uploaded
+            ],
+            'parts': missing,
+            'message': f'{len(missing)} of {part_count} parts remaining'
+        }
+
+    except Exception as e:
+        print(f"Multipart resume error: {str(e)}")
+        return error_response(500, str(e))
+
+
+def complete_multipart_upload(user_id, body):
+    """
+    Complete a multipart upload from the parts S3 has recorded
+    Expected body: {action, s3_key, upload_id, file_size} (or part_count when the size isn't known)
+    Only completes when parts 1..N are all present, every part but the last is MULTIPART_PART_SIZE
+    and the sizes add up to file_size - S3 would otherwise accept a gap and store a truncated file
+    """
+    try:
+        s3_key = str(body.get('s3_key', '')).strip()
+        upload_id = str(body.get('upload_id', '')).strip()
+
+        if not s3_key or not upload_id:
+            return {'error': 's3_key and upload_id are required'}
+        if not verify_file_ownership(user_id, s3_key):
+            return {'error': 'Forbidden - file does not belong to user'}
+
+        file_size = body.get('file_size')
+        if file_size is not None or body.get('part_count') is None:
+            part_count, error = get_part_count(file_size)
+        else:
+            part_count, error = get_declared_part_count(body.get('part_count'))
+        if error:
+            return {'error': error}
+
+        # Use S3's own part list so sizes and ETags can't be spoofed by the client
+        uploaded = list_uploaded_parts(s3_key, upload_id)
+        if not uploaded:
+            return {'error': 'No parts have been uploaded'}
+
+        total_size = sum(part['Size'] for part in uploaded)
+        if total_size > MAX_MULTIPART_UPLOAD_SIZE:
+            s3.abort_multipart_upload(Bucket=BUCKET_NAME, Key=s3_key, UploadId=upload_id)
+            return {'error': f'File too large. Maximum is {MAX_MULTIPART_UPLOAD_SIZE // (1024 * 1024)}MB'}
+
+        uploaded_by_number = {part['PartNumber']: part for part in uploaded}
+        missing = [number for number in range(1, part_count + 1) if number not in uploaded_by_number]
+        invalid = sorted(
+            number for number, part in uploaded_by_number.items()
+            if number > part_count or (number < part_count and part['Size'] != MULTIPART_PART_SIZE)
+        )
+        if missing or invalid:
+            return {
+                'error': 'Upload is incomplete - upload the missing parts (see resume) before completing',
+                'missing_parts': missing,
+                'invalid_parts': invalid
+            }
+        if file_size is not None and total_size != int(file_size):
+            return {
+                'error': f'Uploaded parts total {total_size} bytes, expected {int(file_size)}',
+                'missing_parts': [],
+                'invalid_parts': [part_count]
+            }
+
+        s3.complete_multipart_upload(
+            Bucket=BUCKET_NAME,
+            Key=s3_key,
+            UploadId=upload_id,
+            MultipartUpload={
+                'Parts': [
+                    {'PartNumber': number, 'ETag': uploaded_by_number[number]['ETag']}
+                    for number in range(1, part_count + 1)
+                ]
+            }
+        )
+
+        return {
+            's3_key': s3_key,
+            'size': total_size,
+            'presigned_get': get_signer().presign_get(s3_key),
+            'message': 'Multipart upload completed'
+        }
+
+    except Exception as e:
+        print(f"Multipart complete error: {str(e)}")
+        return error_response(500, str(e))
+
+
+def abort_multipart_upload(user_id, body):
+    """
+    Abort a multipart upload and discard its uploaded parts
+    Expected body: {action, s3_key, upload_id}
+    """
+    try:
+        s3_key = str(body.get('s3_key', '')).strip()
+        upload_id = str(body.get('upload_id', '')).strip()
+
+        if not s3_key or not upload_id:
+            return {'error': 's3_key and upload_id are required'}
+        if not verify_file_ownership(user_id, s3_key):
+            return {'error': 'Forbidden - file does not belong to user'}
+
+        s3.abort_multipart_upload(Bucket=BUCKET_NAME, Key=s3_key, UploadId=upload_id)
+        return {'message': 'Multipart upload aborted'}
+
+    except Exception as e:
+        print(f"Multipart abort error: {str(e)}")
+        return error_response(500, str(e))
+
+
+def get_part_count(file_size):
+    """
+    Helper: Validate a declared file size and compute its part count
+    Returns: (part_count, error)
+    """
+    try:
+        file_size = int(file_size)
+    except (TypeError, ValueError):
+        return None, 'file_size is required'
+
+    if file_size <= 0:
+        return None, 'file_size must be positive'
+    if file_size > MAX_MULTIPART_UPLOAD_SIZE:
+        return None, f'File too large. Maximum is {MAX_MULTIPART_UPLOAD_SIZE // (1024 * 1024)}MB'
+
+    return math.ceil(file_size / MULTIPART_PART_SIZE), None
+
+
+def get_declared_part_count(part_count):
+    """
+    Helper: Validate a declared part count (completion without a file_size)
+    Returns: (part_count, error)
+    """
+    try:
+        part_count = int(part_count)
+    except (TypeError, ValueError):
+        return None, 'part_count must be a number'
+
+    max_parts = math.ceil(MAX_MULTIPART_UPLOAD_SIZE / MULTIPART_PART_SIZE)
+    if not 1 <= part_count <= max_parts:
+        return None, f'part_count must be between 1 and {max_parts}'
+    return part_count, None
+
+
+def list_uploaded_parts(s3_key, upload_id):
+    """
+    Helper: List every part S3 has received for a multipart upload
+    """
+    parts = []
+    paginator = s3.get_paginator('list_parts')
+    for page in paginator.paginate(Bucket=BUCKET_NAME, Key=s3_key, UploadId=upload_id):
+        parts.extend(page.get('Parts', []))
+    return parts
+
+
+def list_user_files(user_id, body):
+    """
+    List a user's files one page at a time
+    Expected body: {action, limit, cursor}
+    Served from the UserFiles index in one query; falls back to S3 prefix listing when the index
+    can't be read or has no entries for the user (files uploaded before the index existed)
+    """
+    try:
+        try:
+            limit = min(max(int(body.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        except (TypeError, ValueError):
+            return {'error': 'limit must be a number'}
+
+        cursor = decode_cursor(body.get('cursor'))
+        if cursor is False:
+            return {'error': 'Invalid cursor'}
+
+        if cursor:
+            # Continue in the source the previous page came from (restarting elsewhere would repeat files)
+            if cursor['source'] == 'index':
+                return list_files_from_index(user_id, limit, cursor)
+            return list_files_from_s3(user_id, limit, cursor)
+
+        try:
+            page = list_files_from_index(user_id, limit, None)
+            if page['files']:
+                return page
+            print(f"No indexed files for {user_id}, falling back to S3 listing")
+        except Exception as e:
+            print(f"File index error, falling back to S3 listing: {str(e)}")
+
+        return list_files_from_s3(user_id, limit, None)
+
+    except Exception as e:
+        print(f"List files error: {str(e)}")
+        return error_response(500, str(e))
+
+
+def list_files_from_index(user_id, limit, cursor):
+    """
+    Helper: One page of file metadata from the UserFiles table
+    """
+    query_args = {
+        'KeyConditionExpression': 'userId = :uid',
+        'ExpressionAttributeValues': {':uid': user_id},
+        'Limit': limit
+    }
+    if cursor:
+        query_args['ExclusiveStartKey'] = {'userId': user_id, 's3Key': cursor['key']}
+
+    response = user_files_table.query(**query_args)
+
+    files = [
+        {
+            's3_key': item['s3Key'],
+            'size': int(item.get('size', 0)),
+            'content_type': item.get('contentType', ''),
+            'last_modified': item.get('lastModified', '')
+        }
+        for item in response.get('Items', [])
+    ]
+
+    last_key = response.get('LastEvaluatedKey')
+    next_cursor = encode_cursor({'source': 'index', 'key': last_key['s3Key']}) if last_key else None
+
+    return {
+        'files': files,
+        'count': len(files),
+        'cursor': next_cursor
+    }
+
+
+def list_files_from_s3(user_id, limit, cursor):
+    """
+    Helper: One page of file metadata from a bulk S3 prefix listing
+    (content type is not part of the listing, so it is inferred from the extension)
+    """
+    list_args = {
+        'Bucket': BUCKET_NAME,
+        'Prefix': f"prescriptions/{user_id}/",
+        'MaxKeys': limit
+    }
+    if cursor and cursor.get('source') == 's3':
+        list_args['ContinuationToken'] = cursor['token']
+
+    response = s3.list_objects_v2(**list_args)
+
+    files = [
+        {
+            's3_key': obj['Key'],
+            'size': obj['Size'],
+            'content_type': guess_content_type(obj['Key']),
+            'last_modified': obj['LastModified'].isoformat()
+        }
+        for obj in response.get('Contents', [])
+    ]
+
+    token = response.get('NextContinuationToken')
+    next_cursor = encode_cursor({'source': 's3', 'token': token}) if token else None
+
+    return {
+        'files': files,
+        'count': len(files),
+        'cursor': next_cursor
+    }
+
+
+def index_s3_events(records):
+    """
+    Keep the UserFiles index in sync with S3 ObjectCreated / ObjectRemoved events
+    """
+    indexed = 0
+
+    for record in records:
+        if record.get('eventSource') != 'aws:s3':
+            continue
+
+        s3_key = unquote_plus(record['s3']['object']['key'])
+        key_parts = s3_key.split('/')
+        if len(key_parts) < 3 or key_parts[0] != 'prescriptions':
+            continue
+        user_id = key_parts[1]
+
+        try:
+            if record['eventName'].startswith('ObjectRemoved'):
+                user_files_table.delete_item(Key={'userId': user_id, 's3Key': s3_key})
+            else:
+                metadata = get_s3_object_metadata(s3_key) or {
+                    'size': record['s3']['object'].get('size', 0),
+                    'last_modified': record.get('eventTime', ''),
+                    'content_type': guess_content_type(s3_key)
+                }
+                user_files_table.put_item(
+                    Item={
+                        'userId': user_id,
+                        's3Key': s3_key,
+                        'size': metadata['size'],
+                        'contentType': metadata['content_type'],
+                        'lastModified': metadata['last_modified']
+                    }
+                )
+            indexed += 1
+
+        except Exception as e:
+            print(f"Index error for {s3_key}: {str(e)}")
+
+    return {'indexed': indexed}
+
+
+def backfill_file_index(start_token, context):
+    """
+    Add every object under prescriptions/ that UserFiles doesn't have yet (one-off; resumable)
+    Items written by upload events are kept (they carry the real content type)
+    Returns: {'indexed', 'start_token'} - invoke again with start_token until it is None
+    """
+    list_args = {'Bucket': BUCKET_NAME, 'Prefix': 'prescriptions/', 'MaxKeys': BACKFILL_PAGE_SIZE}
+    indexed = 0
+
+    while True:
+        if start_token:
+            list_args['ContinuationToken'] = start_token
+        response = s3.list_objects_v2(**list_args)
+
+        for obj in response.get('Contents', []):
+            key_parts = obj['Key'].split('/')
+            if len(key_parts) < 3:
+                continue
+            try:
+                user_files_table.put_item(
+                    Item={
+                        'userId': key_parts[1],
+                        's3Key': obj['Key'],
+                        'size': obj['Size'],
+                        'contentType': guess_content_type(obj['Key']),
+                        'lastModified': obj['LastModified'].isoformat()
+                    },
+                    ConditionExpression='attribute_not_exists(s3Key)'
+                )
+                indexed += 1
+            except Exception as e:
+                if (getattr(e, 'response', None) or {}).get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                    raise
+
+        start_token = response.get('NextContinuationToken')
+        if not start_token:
+            break
+        if context is not None and context.get_remaining_time_in_millis() < BACKFILL_RESERVE_MS:
+            break
+
+    print(f"Backfilled {indexed} files into UserFiles")
+    return {'indexed': indexed, 'start_token': start_token}
+
+
+def encode_cursor(cursor):
+    """
+    Helper: Opaque pagination cursor for the client
+    """
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode('utf-8')).decode('utf-8')
+
+
+def decode_cursor(cursor):
+    """
+    Helper: Decode a pagination cursor (None if absent, False if malformed)
+    """
+    if not cursor:
+        return None
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8')))
+        if decoded.get('source') == 'index' and decoded.get('key'):
+            return decoded
+        if decoded.get('source') == 's3' and decoded.get('token'):
+            return decoded
+    except Exception:
+        pass
+    return False
+
+
+def guess_content_type(s3_key):
+    """
+    Helper: Map an uploaded file's extension back to its content type
+    """
+    extension = s3_key.rsplit('.', 1)[-1].lower()
+    return {
+        'jpg': 'image/jpeg',
+        'jpeg': 'image/jpeg',
+        'png': 'image/png',
+        'pdf': 'application/pdf',
+        'webp': 'image/webp'
+    }.get(extension, 'application/octet-stream')
+
+
 def verify_file_ownership(user_id, s3_key):
     """
     Helper: Verify that an S3 key belongs to the requesting user
@@ -122,11 +697,11 @@ def verify_file_ownership(user_id, s3_key):
 def get_s3_object_metadata(s3_key):
     """
     Helper: Get metadata about an S3 object (size, date uploaded, etc.)
-    Useful for listing user files
+    Used when indexing new uploads - listing reads the UserFiles index instead
     """
     try:
         response = s3.head_object(
-            Bucket='beaumed-prescriptions',
+            Bucket=BUCKET_NAME,
             Key=s3_key
         )
         return {
@@ -0,0 +1,137 @@
+"""
+Shared module: s3_signing
+Purpose: Local SigV4 presigning of S3 POST policies and query-string URLs
+Avoids a botocore request-signer round trip per URL: the signing key is derived once per day and
+reused for every URL in a request (verified byte-for-byte against botocore's s3v4 presigner)
+Package this file alongside lambda_function.py in each deployment zip
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+from datetime import datetime, timedelta
+from functools import lru_cache
+from urllib.parse import quote
+from aws_clients import get_session
+
+
+def create_signer(bucket_name, region, expires_in):
+    """
+    Create a signer for a bucket bound to the current credentials and time
+    Credentials come from the shared session, resolved once per container
+    """
+    credentials = get_session().get_credentials().get_frozen_credentials()
+    return LocalSigner(credentials, datetime.utcnow(), bucket_name, region, expires_in)
+
+
+@lru_cache(maxsize=8)
+def derive_signing_key(secret_key, date_stamp, region, service):
+    """
+    Helper: Derive the SigV4 signing key (cached per day/region/service)
+    """
+    key = hmac.new(f'AWS4{secret_key}'.encode('utf-8'), date_stamp.encode('utf-8'), hashlib.sha256).digest()
+    key = hmac.new(key, region.encode('utf-8'), hashlib.sha256).digest()
+    key = hmac.new(key, service.encode('utf-8'), hashlib.sha256).digest()
+    return hmac.new(key, b'aws4_request', hashlib.sha256).digest()
+
+
+class LocalSigner:
+    """
+    Local SigV4 presigner for S3 POST policies and query-string URLs
+    Derives the signing key once and reuses it for every URL in a request
+    """
+
+    def __init__(self, credentials, now, bucket_name, region, expires_in):
+        self.access_key = credentials.access_key
+        self.token = credentials.token
+        self.bucket_name = bucket_name
+        self.host = f'{bucket_name}.s3.{region}.amazonaws.com'
+        self.expires_in = expires_in
+        self.amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        self.expiration = (now + timedelta(seconds=expires_in)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+        date_stamp = now.strftime('%Y%m%d')
+        self.scope = f'{date_stamp}/{region}/s3/aws4_request'
+        self.credential = f'{self.access_key}/{self.scope}'
+        self.signing_key = derive_signing_key(credentials.secret_key, date_stamp, region, 's3')
+
+    def sign(self, string_to_sign):
+        return hmac.new(self.signing_key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def presign_post(self, s3_key, content_type, max_file_size):
+        """
+        Build a presigned POST (same shape as boto3's generate_presigned_post)
+        """
+        fields = {
+            'key': s3_key,
+            'Content-Type': content_type,
+            'x-amz-algorithm': 'AWS4-HMAC-SHA256',
+            'x-amz-credential': self.credential,
+            'x-amz-date': self.amz_date
+        }
+        if self.token:
+            fields['x-amz-security-token'] = self.token
+
+        conditions = [
+            {'bucket': self.bucket_name},
+            ['content-length-range', 0, max_file_size]
+        ]
+        conditions.extend({name: value} for name, value in fields.items())
+
+        policy = json.dumps({'expiration': self.expiration, 'conditions': conditions})
+        fields['policy'] = base64.b64encode(policy.encode('utf-8')).decode('utf-8')
+        fields['x-amz-signature'] = self.sign(fields['policy'])
+
+        return {
+            'url': f'https://{self.host}/',
+            'fields': fields
+        }
+
+    def presign_get(self, s3_key, extra_params=None):
+        """
+        Build a presigned GET URL (extra_params e.g. {'response-content-disposition': ...})
+        """
+        return self.presign_url('GET', s3_key, extra_params)
+
+    def presign_upload_part(self, s3_key, upload_id, part_number):
+        """
+        Build a presigned PUT URL for one part of a multipart upload
+        """
+        return self.presign_url('PUT', s3_key, {'partNumber': str(part_number), 'uploadId': upload_id})
+
+    def presign_url(self, method, s3_key, extra_params=None):
+        """
+        Build a presigned URL (query-string SigV4, host header only)
+        """
+        params = dict(extra_params or {})
+        params.update({
+            'X-Amz-Algorithm': 'AWS4-HMAC-SHA256',
+            'X-Amz-Credential': self.credential,
+            'X-Amz-Date': self.amz_date,
+            'X-Amz-Expires': str(self.expires_in),
+            'X-Amz-SignedHeaders': 'host'
+        })
+        if self.token:
+            params['X-Amz-Security-Token'] = self.token
+
+        canonical_uri = '/' + quote(s3_key, safe='/~')
+        canonical_query = '&'.join(
+            f"{quote(name, safe='~')}={quote(value, safe='~')}" for name, value in sorted(params.items())
+        )
+        canonical_request = '\n'.join([
+            method,
+            canonical_uri,
+            canonical_query,
+            f'host:{self.host}\n',
+            'host',
+            'UNSIGNED-PAYLOAD'
+        ])
+        string_to_sign = '\n'.join([
+            'AWS4-HMAC-SHA256',
+            self.amz_date,
+            self.scope,
+            hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+        ])
+
+        return f'https://{self.host}{canonical_uri}?{canonical_query}&X-Amz-Signature={self.sign(string_to_sign)}'
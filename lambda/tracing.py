@@ -0,0 +1,179 @@
+"""
+Shared module: tracing
+Purpose: Per-invocation latency spans and CloudWatch embedded metrics (EMF) for every Lambda
+Times each downstream call (DynamoDB, Bedrock, Textract, S3, Secrets Manager, Yelp, JWKS),
+records cold vs warm starts and replaces full-payload prints with sampled verbose logging
+Package this file alongside lambda_function.py in each deployment zip
+"""
+
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# CloudWatch metrics namespace and verbose-log sample rate (0.0 - 1.0)
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'BeauMED')
+VERBOSE_LOG_SAMPLE_RATE = float(os.environ.get('VERBOSE_LOG_SAMPLE_RATE', '0.01'))
+
+# Container state: the first invocation after import is a cold start
+container_started_at = time.time()
+cold_start = True
+
+# Per-invocation state (reset by trace_handler)
+current_function = None
+current_spans = []
+current_values = []
+invocation_depth = 0
+
+
+def trace_handler(function_name):
+    """
+    Decorator for lambda_handler: times the invocation and emits one EMF log line with
+    duration, cold start flag and aggregated downstream call latencies
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(event, context):
+            global cold_start, current_function, current_spans, current_values, invocation_depth
+
+            # Nested handlers (e.g. a router calling a route handler) share the outer trace
+            if invocation_depth > 0:
+                return handler(event, context)
+
+            is_cold_start = cold_start
+            cold_start = False
+            current_function = function_name
+            current_spans = []
+            current_values = []
+            invocation_depth += 1
+            start = time.perf_counter()
+
+            try:
+                return handler(event, context)
+            finally:
+                duration_ms = (time.perf_counter() - start) * 1000
+                invocation_depth -= 1
+                init_ms = (time.time() - container_started_at) * 1000 - duration_ms if is_cold_start else None
+                emit_metrics(function_name, duration_ms, is_cold_start, init_ms, current_spans, current_values)
+                current_spans = []
+                current_values = []
+
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def span(name):
+    """
+    Time a block of work as a named span, e.g. `with span('Yelp.Search'):`
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, (time.perf_counter() - start) * 1000)
+
+
+def record_span(name, duration_ms):
+    """
+    Add a finished span to the current invocation (thread-safe append)
+    """
+    current_spans.append((name, duration_ms))
+
+
+def record_value(name, value, unit='Count'):
+    """
+    Add a non-latency metric (e.g. token counts) to the current invocation; values with the same name are summed
+    """
+    current_values.append((name, value, unit))
+
+
+def instrument_client(client):
+    """
+    Time every API call made through a boto3 client using botocore's event hooks
+    Span names are '<Service>.<Operation>', e.g. 'DynamoDB.Query'
+    """
+    events = client.meta.events
+    events.register('before-call.*.*', start_call_span)
+    events.register('after-call.*.*', finish_call_span)
+    events.register('after-call-error.*.*', finish_call_span)
+    return client
+
+
+def start_call_span(model=None, context=None, **kwargs):
+    if context is not None:
+        context['tracing_start'] = time.perf_counter()
+
+
+def finish_call_span(model=None, context=None, **kwargs):
+    if context is None or 'tracing_start' not in context:
+        return
+    start = context.pop('tracing_start')
+    service = model.service_model.service_id.replace(' ', '') if model else 'AWS'
+    operation = model.name if model else 'Call'
+    record_span(f'{service}.{operation}', (time.perf_counter() - start) * 1000)
+
+
+def emit_metrics(function_name, duration_ms, is_cold_start, init_ms, spans, values=()):
+    """
+    Print one CloudWatch Embedded Metric Format record for the invocation
+    Spans with the same name are summed, with a matching '.Count' metric
+    """
+    record = {
+        'Function': function_name,
+        'ColdStart': 1 if is_cold_start else 0,
+        'Duration': round(duration_ms, 2)
+    }
+    metrics = [
+        {'Name': 'Duration', 'Unit': 'Milliseconds'},
+        {'Name': 'ColdStart', 'Unit': 'Count'}
+    ]
+
+    if init_ms is not None:
+        record['InitDuration'] = round(init_ms, 2)
+        metrics.append({'Name': 'InitDuration', 'Unit': 'Milliseconds'})
+
+    totals = {}
+    for name, span_ms in spans:
+        total, count = totals.get(name, (0.0, 0))
+        totals[name] = (total + span_ms, count + 1)
+
+    for name, (total, count) in totals.items():
+        record[name] = round(total, 2)
+        record[f'{name}.Count'] = count
+        metrics.append({'Name': name, 'Unit': 'Milliseconds'})
+        metrics.append({'Name': f'{name}.Count', 'Unit': 'Count'})
+
+    value_totals = {}
+    for name, value, unit in values:
+        total, _ = value_totals.get(name, (0, unit))
+        value_totals[name] = (total + value, unit)
+
+    for name, (total, unit) in value_totals.items():
+        record[name] = total
+        metrics.append({'Name': name, 'Unit': unit})
+
+    record['_aws'] = {
+        'Timestamp': int(time.time() * 1000),
+        'CloudWatchMetrics': [{
+            'Namespace': METRICS_NAMESPACE,
+            'Dimensions': [['Function']],
+            'Metrics': metrics
+        }]
+    }
+    print(json.dumps(record))
+
+
+def log_sampled(message, payload):
+    """
+    Log a full payload for a sample of invocations only
+    The payload is only serialized when the invocation is sampled
+    """
+    if random.random() < VERBOSE_LOG_SAMPLE_RATE:
+        print(json.dumps({
+            'Function': current_function,
+            'message': message,
+            'payload': payload
+        }, default=str))